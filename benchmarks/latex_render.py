@@ -0,0 +1,105 @@
+"""Time LaTeX renders: cold path vs warm worker pool, and each rasterizer.
+
+Needs pdflatex (with mylatexformat) and at least one rasterizer on PATH.
+Run from the repository root:
+
+    python -m benchmarks.latex_render -n 20
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+from utils.latex import (
+    DPI,
+    RASTERIZERS,
+    SCRATCH_DIR,
+    TexWorkerPool,
+    build_format,
+    compile_pdf,
+    latex_document,
+    render_latex,
+)
+
+SOURCES = [
+    r"$e^{i\pi} + 1 = 0$",
+    r"\[ \int_0^\infty e^{-x^2}\,dx = \frac{\sqrt{\pi}}{2} \]",
+    r"\begin{align*} F &= ma \\ \nabla \cdot \mathbf{E} &= \frac{\rho}{\varepsilon_0} \end{align*}",
+]
+
+
+def _time(fn, runs: int) -> list[float]:
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(SOURCES[i % len(SOURCES)])
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float], extra: str = ""):
+    print(
+        f"{label:<24} median {statistics.median(timings):7.1f} ms   "
+        f"min {min(timings):7.1f} ms   max {max(timings):7.1f} ms{extra}"
+    )
+
+
+def _rasterizers(pdf: bytes, dpi: int, runs: int):
+    for rasterizer in RASTERIZERS:
+        if not rasterizer.available:
+            print(f"{rasterizer.name:<24} not installed")
+            continue
+        size = len(rasterizer.rasterize(pdf, dpi))
+        _report(
+            rasterizer.name,
+            _time(lambda s: rasterizer.rasterize(pdf, dpi), runs),
+            f"   {size / 1024:6.1f} KiB",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    parser.add_argument("-w", "--workers", type=int, default=2)
+    parser.add_argument("--dpi", type=int, default=DPI)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as tmp:
+        fmt_path = build_format(tmp)
+        if fmt_path is None:
+            raise SystemExit("Could not build the preamble format; see the log above.")
+
+        pool = TexWorkerPool(fmt_path, args.workers)
+        # let the pre-spawned workers finish loading the format
+        time.sleep(1)
+
+        try:
+            _report(
+                "pdflatex cold",
+                _time(lambda s: compile_pdf(latex_document(s)), args.runs),
+            )
+            _report(
+                "pdflatex warm",
+                _time(lambda s: pool.compile(latex_document(s)), args.runs),
+            )
+            _report(
+                "full render cold",
+                _time(lambda s: render_latex(s, dpi=args.dpi), args.runs),
+            )
+            _report(
+                "full render warm",
+                _time(
+                    lambda s: render_latex(s, pool, dpi=args.dpi), args.runs
+                ),
+            )
+
+            print(f"\nrasterizing one PDF at {args.dpi} dpi:")
+            pdf = compile_pdf(latex_document(SOURCES[-1]))
+            _rasterizers(pdf, args.dpi, args.runs)
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ import os
 import asyncio
 import logging
 import datetime
+import time
 from typing import Optional
 from logging.handlers import RotatingFileHandler
 
@@ -15,6 +16,8 @@ from termcolor import colored
 from discord.ext import commands
 
 from utils.text_format import spaced_padding, CustomFormatter
+from utils.cache import CustomCache
+from utils.levels import LevelTable
 from services.xp_service import XPService
 import config as bot_config
 
@@ -32,6 +35,14 @@ DAILY_POST_HOUR = getattr(bot_config, "DAILY_POST_HOUR", None)
 DAILY_POST_MINUTE = getattr(bot_config, "DAILY_POST_MINUTE", None)
 DAILY_POST_TIMEZONE = getattr(bot_config, "DAILY_POST_TIMEZONE", "UTC")
 
+XP_WRITE_BEHIND = getattr(bot_config, "XP_WRITE_BEHIND", False)
+XP_FLUSH_INTERVAL = getattr(bot_config, "XP_FLUSH_INTERVAL", 2.0)
+XP_FLUSH_THRESHOLD = getattr(bot_config, "XP_FLUSH_THRESHOLD", 500)
+XP_CACHE_TTL = getattr(bot_config, "XP_CACHE_TTL", 300)
+XP_CACHE_SIZE = getattr(bot_config, "XP_CACHE_SIZE", 10_000)
+XP_LEDGER = getattr(bot_config, "XP_LEDGER", False)
+XP_COMPACT_INTERVAL = getattr(bot_config, "XP_COMPACT_INTERVAL", 30.0)
+
 
 INITIAL_EXTENSIONS = [
     "jishaku",
@@ -45,11 +56,6 @@ INITIAL_EXTENSIONS = [
 ]
 
 
-class CustomCache:
-    """ """
-    pass
-
-
 class BaseBot(commands.AutoShardedBot):
     """Base Class for the bot"""
 
@@ -75,6 +81,9 @@ class BaseBot(commands.AutoShardedBot):
         self._codeblock = "```"
         self.pool: asyncpg.Pool
         self.cache = CustomCache()
+        self.level_table = LevelTable.from_config(bot_config)
+        # ext name -> milliseconds its last (re)load took
+        self.extension_load_times: dict[str, float] = {}
 
     async def dispatch_log(
         self,
@@ -160,18 +169,32 @@ class BaseBot(commands.AutoShardedBot):
             await self.pool.execute(schema)
             self.logger.info("Database schema initialized.")
 
-        self.xp_service = XPService(self.pool)
+        self.xp_service = XPService(
+            self.pool,
+            write_behind=XP_WRITE_BEHIND,
+            flush_interval=XP_FLUSH_INTERVAL,
+            flush_threshold=XP_FLUSH_THRESHOLD,
+            cache=self.cache.namespace(
+                "xp", ttl=XP_CACHE_TTL, maxsize=XP_CACHE_SIZE
+            ),
+            ledger=XP_LEDGER,
+            compact_interval=XP_COMPACT_INTERVAL,
+        )
+        self.xp_service.start()
 
         ## ------ Load Extensions ----- ##
 
         loaded_exts = []
         for ext in INITIAL_EXTENSIONS:
+            started = time.perf_counter()
             try:
                 await self.load_extension(ext)
             except commands.ExtensionError as exc:
                 print(colored(f"Failed to load extension {ext}: {exc}", "red"))
             else:
-                loaded_exts.append(ext)
+                elapsed = (time.perf_counter() - started) * 1000
+                self.extension_load_times[ext] = elapsed
+                loaded_exts.append(f"{ext} ({elapsed:.0f} ms)")
 
         print(
             colored(
@@ -288,10 +311,14 @@ class BaseBot(commands.AutoShardedBot):
 
     async def close(self):
         try:
-            ...
+            # write out buffered XP while the pool is still open
+            await self.xp_service.close()
             # await self.pool.close()
         except AttributeError:
             pass
+        except Exception:
+            # still disconnect from Discord if the final flush fails
+            self.logger.exception("Failed to write out buffered XP on shutdown.")
 
         await super().close()
 
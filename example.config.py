@@ -20,6 +20,13 @@ GOOGLE_API_SCOPES = [
 ]  # usually not changed
 GOOGLE_SHEET_ID = "your_sheet_id_here"  # Google Sheet ID
 GOOGLE_SHEET_RANGE = "Sheet1!A1:O"
+GOOGLE_SHEET_CACHE_TTL = 300  # seconds the parsed question bank is reused
+GOOGLE_SHEET_FULL_REFRESH = 3600  # seconds between full re-reads; appended rows are read every TTL
+GOOGLE_SHEET_TIMEOUT = 10  # socket timeout (seconds) for one Sheets request
+GOOGLE_SHEET_DEADLINE = 30  # seconds a request may take in total, retries included
+GOOGLE_SHEET_RETRIES = 3  # retries for timeouts, 429s and 5xx responses
+QUESTION_SOURCE = "sheets"  # "offline" runs QOTD from the /qotd_export file, no Google needed
+OFFLINE_QUESTION_BANK_PATH = "data/questions.sqlite3"
 
 # ===== Daily Ques Post Config =====
 DAILY_CHANNEL_ID = 000000000000000000  # channel to post daily questions
@@ -34,3 +41,34 @@ XP_THRESHOLDS = {
     500: ("Level 2 Title", "Short 2"),
     1000: ("Level 3 Title", "Short 3"),
 }  # customize thresholds and titles
+
+# write-behind: buffer XP grants in memory and flush them in batches; removals
+# are still written straight away
+XP_WRITE_BEHIND = False
+XP_FLUSH_INTERVAL = 2.0  # seconds between flushes
+XP_FLUSH_THRESHOLD = 500  # pending users that force an early flush
+
+# per-user XP read cache, kept in sync by every XP change
+XP_CACHE_TTL = 300  # seconds
+XP_CACHE_SIZE = 10000  # max cached users
+
+# ledger: append XP changes to xp_events and fold them into users.xp in the
+# background; leaderboard/rank lag by up to XP_COMPACT_INTERVAL
+XP_LEDGER = False
+XP_COMPACT_INTERVAL = 30.0  # seconds between compactions
+
+# ===== LaTeX Config =====
+# rendered images are cached by content hash in memory and on disk
+LATEX_CACHE_SIZE = 256  # images kept in memory
+LATEX_CACHE_DIR = "data/latex_cache"
+LATEX_CACHE_MAX_BYTES = 256 * 1024 * 1024  # on-disk cap; least recently used go first
+LATEX_WORKERS = 2  # pdflatex processes kept warm with the precompiled preamble; 0 renders cold
+LATEX_RASTERIZER = None  # "pdftoppm", "ghostscript" or "magick"; None picks the fastest installed
+LATEX_DPI = 300  # resolution of the PNG sent to Discord
+LATEX_RENDER_THREADS = 2  # renders running at once, on their own threads
+LATEX_RENDER_QUEUE = 8  # renders allowed to wait; more are turned away
+LATEX_TIMEOUT = 15  # wall-clock seconds per pdflatex/rasterizer process
+LATEX_CPU_SECONDS = 10  # CPU rlimit per process
+LATEX_MEMORY_MB = 512  # address space rlimit per process
+LATEX_USER_RATE = 3  # renders each user may request...
+LATEX_USER_PER = 30  # ...per this many seconds
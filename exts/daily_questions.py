@@ -1,3 +1,5 @@
+import asyncio
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta
 
 import discord
@@ -5,13 +7,20 @@ from discord import app_commands
 from discord.ext import commands, tasks
 import pytz
 
+import config
 from config import (
     DAILY_CHANNEL_ID,
     DAILY_POST_HOUR,
     DAILY_POST_MINUTE,
     DAILY_POST_TIMEZONE,
 )
-from services.gsheets_service import GSheetService
+from services.gsheets_service import GSheetService, QuestionSnapshot, SheetUnavailableError
+from services.offline_questions import OfflineQuestionSource, export_snapshot
+from services.question_bank import QuestionBank
+from services.question_dedup import DuplicateCluster, DuplicateDetector
+from services.question_search import QuestionSearchIndex
+from utils.question_views import QuestionSearchPaginator
+from utils.questions import Question
 
 
 DIFFICULTY_COLORS = {
@@ -20,6 +29,86 @@ DIFFICULTY_COLORS = {
     "Hard": 0xFF0000,
 }
 
+# "sheets" reads Google Sheets; "offline" reads an export made by /qotd_export.
+QUESTION_SOURCE = getattr(config, "QUESTION_SOURCE", "sheets")
+OFFLINE_QUESTION_BANK_PATH = getattr(config, "OFFLINE_QUESTION_BANK_PATH", "data/questions.sqlite3")
+
+# How often the question bank is re-imported from the sheet into Postgres.
+QUESTION_SYNC_MINUTES = 30
+
+# Upcoming days whose embeds are built ahead of the post, and how often.
+PREFETCH_DAYS = 3
+PREFETCH_MINUTES = 60
+
+# https://discord.com/developers/docs/resources/message#embed-object-embed-limits
+EMBED_TITLE_LIMIT = 256
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELD_NAME_LIMIT = 256
+EMBED_FIELD_VALUE_LIMIT = 1024
+EMBED_FOOTER_LIMIT = 2048
+EMBED_TOTAL_LIMIT = 6000
+
+EMBED_FOOTER = "Physics Club Daily Challenge"
+
+
+@dataclass
+class PreparedQuestion:
+    """A question row turned into its post embed, plus anything wrong with it"""
+
+    number: str
+    embed: discord.Embed
+    problems: list[str] = field(default_factory=list)
+
+    @classmethod
+    def build(cls, question: Question) -> "PreparedQuestion":
+        number = question.number
+        statement = question.statement
+        difficulty = question.difficulty.title() or "Medium"
+
+        title = f"Daily Physics Question #{number or '?'}"
+        fields = [
+            ("Genre", question.genre or "General", True),
+            ("Difficulty", difficulty, True),
+            ("Curator", question.curator or "Anonymous", True),
+        ]
+
+        hints = "\n".join(question.visible_hints)
+        if hints:
+            fields.append(("Hints (click to reveal)", f"||{hints}||", False))
+
+        problems = []
+        if not number:
+            problems.append("missing Number")
+        if not statement:
+            problems.append("missing Problem Statement")
+        if len(title) > EMBED_TITLE_LIMIT:
+            problems.append(f"title over {EMBED_TITLE_LIMIT} characters")
+        if len(statement) > EMBED_DESCRIPTION_LIMIT:
+            problems.append(f"statement over {EMBED_DESCRIPTION_LIMIT} characters")
+        for name, value, _ in fields:
+            if len(value) > EMBED_FIELD_VALUE_LIMIT:
+                problems.append(f"{name} over {EMBED_FIELD_VALUE_LIMIT} characters")
+
+        total = len(title) + len(statement) + len(EMBED_FOOTER)
+        total += sum(len(name) + len(value) for name, value, _ in fields)
+        if total > EMBED_TOTAL_LIMIT:
+            problems.append(f"embed over {EMBED_TOTAL_LIMIT} characters in total")
+
+        embed = discord.Embed(
+            title=title[:EMBED_TITLE_LIMIT],
+            description=statement[:EMBED_DESCRIPTION_LIMIT] or "No statement.",
+            color=DIFFICULTY_COLORS.get(difficulty, 0x3498DB),
+        )
+        for name, value, inline in fields:
+            embed.add_field(
+                name=name[:EMBED_FIELD_NAME_LIMIT],
+                value=value[:EMBED_FIELD_VALUE_LIMIT],
+                inline=inline,
+            )
+        embed.set_footer(text=EMBED_FOOTER[:EMBED_FOOTER_LIMIT])
+
+        return cls(number=number or "?", embed=embed, problems=problems)
+
 
 class DailyQuestions(commands.Cog):
     """Automated daily question posting and moderation utilities."""
@@ -27,10 +116,23 @@ class DailyQuestions(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.sheet_service = GSheetService()
+        if QUESTION_SOURCE == "offline":
+            self.question_source = OfflineQuestionSource(OFFLINE_QUESTION_BANK_PATH)
+        else:
+            self.question_source = self.sheet_service
+        self.question_bank = QuestionBank(bot.pool, self.question_source)
+        self.search_index = QuestionSearchIndex()
+        self.duplicates = DuplicateDetector()
+        self._reported_duplicates: set[tuple[str, ...]] = set()
+        self._prepared: dict[date, PreparedQuestion] = {}
+        self.question_sync.start()
+        self.prefetch_questions.start()
         self.daily_question.start()
 
     def cog_unload(self):
         self.daily_question.cancel()
+        self.prefetch_questions.cancel()
+        self.question_sync.cancel()
 
     def _schedule_context(self, now_utc: datetime | None = None) -> tuple[datetime, date, datetime]:
         """Return schedule context as (now_utc, local_day_key, today's scheduled post time in UTC)."""
@@ -67,6 +169,117 @@ class DailyQuestions(commands.Cog):
     async def before_daily(self):
         await self.bot.wait_until_ready()
 
+    @tasks.loop(minutes=QUESTION_SYNC_MINUTES)
+    async def question_sync(self):
+        try:
+            await self.question_bank.sync()
+        except Exception:
+            self.bot.logger.exception("Question bank sync failed")
+
+        try:
+            await self.refresh_question_indexes()
+        except Exception:
+            self.bot.logger.exception("Question index refresh failed")
+
+    async def refresh_question_indexes(self, force: bool = False):
+        """Bring the search index up to date and report new duplicates."""
+        snapshot = await self.refresh_search_index(force)
+
+        clusters = await asyncio.to_thread(self.duplicates.find, snapshot.rows)
+        new = [c for c in clusters if c.numbers not in self._reported_duplicates]
+        self._reported_duplicates = {c.numbers for c in clusters}
+        if new:
+            await self.report_duplicates(new)
+
+    async def refresh_search_index(self, force: bool = False) -> QuestionSnapshot:
+        """Bring the search index up to date; returns the snapshot it read."""
+        snapshot = await self.question_source.get_snapshot(force=force)
+
+        indexed, removed = self.search_index.update(snapshot.rows)
+        if indexed or removed:
+            self.bot.logger.info(
+                "Question search index updated (indexed=%s, removed=%s, total=%s)",
+                indexed,
+                removed,
+                len(self.search_index),
+            )
+
+        return snapshot
+
+    def duplicates_embed(self, clusters: list[DuplicateCluster], title: str) -> discord.Embed:
+        embed = discord.Embed(title=title, color=0xFFBF00)
+        for cluster in clusters[:25]:
+            embed.add_field(
+                name=", ".join(f"#{n}" for n in cluster.numbers)[:256],
+                value=f"Similarity ≥ {cluster.similarity:.0%}",
+                inline=False,
+            )
+        if len(clusters) > 25:
+            embed.set_footer(text=f"{len(clusters) - 25} more clusters not shown")
+        return embed
+
+    async def report_duplicates(self, clusters: list[DuplicateCluster]):
+        self.bot.logger.warning(
+            "Possible duplicate questions: %s",
+            "; ".join(", ".join(c.numbers) for c in clusters),
+        )
+        try:
+            await self.bot.dispatch_log(
+                (self.duplicates_embed(clusters, "Possible duplicate questions"),)
+            )
+        except AttributeError:
+            # no logging channel configured; the log line above has it
+            pass
+
+    @question_sync.before_loop
+    async def before_question_sync(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=PREFETCH_MINUTES)
+    async def prefetch_questions(self):
+        try:
+            await self.prefetch_upcoming()
+        except Exception:
+            self.bot.logger.exception("Daily question prefetch failed")
+
+    @prefetch_questions.before_loop
+    async def before_prefetch(self):
+        await self.bot.wait_until_ready()
+
+    async def prefetch_upcoming(self, days: int = PREFETCH_DAYS) -> dict[date, PreparedQuestion]:
+        """Build and validate the embeds for the next `days` schedule days.
+
+        Valid ones are kept in `_prepared` so the post itself only sends;
+        invalid rows are logged now rather than at the scheduled minute.
+        """
+        _, local_day, _ = self._schedule_context()
+        upcoming = [local_day + timedelta(days=i) for i in range(days)]
+
+        questions = await self.question_bank.fetch_questions_for_dates(upcoming)
+
+        prepared: dict[date, PreparedQuestion] = {}
+        for day in upcoming:
+            question = questions.get(day)
+            if not question:
+                self.bot.logger.warning("No daily question scheduled for %s", day)
+                continue
+
+            item = PreparedQuestion.build(question)
+            if item.problems:
+                self.bot.logger.warning(
+                    "Daily question for %s is invalid (question_number=%s, problems=%s)",
+                    day,
+                    item.number,
+                    "; ".join(item.problems),
+                )
+                continue
+
+            prepared[day] = item
+
+        # replace wholesale so edits to the sheet and past days drop out
+        self._prepared = prepared
+        return prepared
+
     async def post_daily_question_if_due(self):
         timezone = pytz.timezone(DAILY_POST_TIMEZONE)
         now = datetime.now(pytz.utc)
@@ -107,62 +320,57 @@ class DailyQuestions(commands.Cog):
             self.bot.logger.error("Daily question channel not found.")
             return False
 
-        try:
-            question = await self.sheet_service.fetch_question_for_date(today_key)
-        except Exception:
-            self.bot.logger.exception(
-                "Daily question fetch stage failed "
-                "(date=%s, channel_id=%s)",
-                today_key,
-                channel_id,
-            )
-            return False
+        prepared = self._prepared.pop(today_key, None)
 
-        if not question:
-            self.bot.logger.warning(
-                "No daily question found; skipping "
-                "(date=%s, channel_id=%s)",
-                today_key,
-                channel_id,
-            )
-            return False
+        if prepared is None:
+            try:
+                question = await self.question_bank.fetch_question_for_date(today_key)
+            except Exception:
+                self.bot.logger.exception(
+                    "Daily question fetch stage failed "
+                    "(date=%s, channel_id=%s)",
+                    today_key,
+                    channel_id,
+                )
+                return False
 
-        question_number = str(question.get("Number", "?")).strip() or "?"
+            if not question:
+                self.bot.logger.warning(
+                    "No daily question found; skipping "
+                    "(date=%s, channel_id=%s)",
+                    today_key,
+                    channel_id,
+                )
+                return False
 
-        try:
-            difficulty = question.get("Difficulty", "Medium").strip().title()
-            color = DIFFICULTY_COLORS.get(difficulty, 0x3498DB)
-
-            embed = discord.Embed(
-                title=f"Daily Physics Question #{question.get('Number', '?')}",
-                description=question.get("Problem Statement", "No statement."),
-                color=color,
-                timestamp=posted_at,
-            )
-            embed.add_field(name="Genre", value=question.get("Genre", "General"), inline=True)
-            embed.add_field(name="Difficulty", value=difficulty, inline=True)
-            embed.add_field(name="Curator", value=question.get("Curator", "Anonymous"), inline=True)
-
-            hints = "\n".join(
-                question.get(f"Hint {i}", "").strip()
-                for i in range(1, 4)
-                if question.get(f"Hint {i}", "").strip()
-            )
-            if hints:
-                embed.add_field(name="Hints (click to reveal)", value=f"||{hints}||", inline=False)
+            try:
+                prepared = PreparedQuestion.build(question)
+            except Exception:
+                self.bot.logger.exception(
+                    "Daily question embed stage failed "
+                    "(question_number=%s, date=%s, channel_id=%s)",
+                    question.number or "?",
+                    today_key,
+                    channel_id,
+                )
+                return False
 
-            embed.set_footer(text="Physics Club Daily Challenge")
+        question_number = prepared.number
 
-        except Exception:
-            self.bot.logger.exception(
-                "Daily question embed stage failed "
-                "(question_number=%s, date=%s, channel_id=%s)",
+        if prepared.problems:
+            self.bot.logger.error(
+                "Daily question failed validation; skipping "
+                "(question_number=%s, date=%s, channel_id=%s, problems=%s)",
                 question_number,
                 today_key,
                 channel_id,
+                "; ".join(prepared.problems),
             )
             return False
 
+        embed = prepared.embed
+        embed.timestamp = posted_at
+
         try:
             async with self.bot.pool.acquire() as conn:
                 claimed_today = await conn.fetchval(
@@ -288,6 +496,25 @@ class DailyQuestions(commands.Cog):
         embed.add_field(name="Today's Scheduled UTC", value=post_time_utc.strftime("%Y-%m-%d %H:%M UTC"), inline=False)
         embed.add_field(name="Next Scheduled UTC", value=next_post_utc.strftime("%Y-%m-%d %H:%M UTC"), inline=False)
 
+        prepared = ", ".join(
+            f"`{day}` (#{item.number})" for day, item in sorted(self._prepared.items())
+        )
+        embed.add_field(name="Prepared", value=prepared or "Nothing prepared.", inline=False)
+
+        embed.add_field(name="Question Source", value=QUESTION_SOURCE, inline=True)
+
+        stats = self.sheet_service.stats
+        embed.add_field(
+            name="Sheets API",
+            value=(
+                f"Requests: `{stats.requests}` (failed `{stats.failures}`, retried `{stats.retries}`)\n"
+                f"Latency: last `{stats.last_latency * 1000:.0f} ms`, "
+                f"avg `{stats.avg_latency * 1000:.0f} ms`, max `{stats.max_latency * 1000:.0f} ms`\n"
+                f"Served from cache after a failure: `{stats.fallbacks}`"
+            ),
+            inline=False,
+        )
+
         if latest:
             embed.add_field(
                 name="Last Posted",
@@ -305,6 +532,131 @@ class DailyQuestions(commands.Cog):
 
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @app_commands.command(name="qotd_refresh", description="Sync the question bank from Google Sheets")
+    async def qotd_refresh(self, interaction: discord.Interaction):
+        if interaction.user.id not in getattr(self.bot, "owner_ids", []):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        try:
+            upserted, deleted, unchanged = await self.question_bank.sync(force=True)
+            await self.refresh_question_indexes()
+            await self.prefetch_upcoming()
+        except SheetUnavailableError as e:
+            self.bot.logger.warning("Question bank sync failed: %s", e)
+            await interaction.followup.send(
+                f"Could not read Google Sheets, nothing was synced: {e}", ephemeral=True
+            )
+            return
+        except Exception:
+            self.bot.logger.exception("Question bank sync failed")
+            await interaction.followup.send("Failed to sync the question bank. Check logs for details.", ephemeral=True)
+            return
+
+        await interaction.followup.send(
+            f"Synced question bank: {upserted} upserted, {deleted} deleted, {unchanged} unchanged.",
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="qotd_search", description="Search past questions by keyword, genre, difficulty or curator")
+    async def qotd_search(
+        self,
+        interaction: discord.Interaction,
+        query: str = "",
+        genre: str | None = None,
+        difficulty: str | None = None,
+        curator: str | None = None,
+    ):
+        if not len(self.search_index):
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            # search index only: duplicate reports are left to the scheduled
+            # and owner refreshes, not posted on a member's search
+            try:
+                await self.refresh_search_index()
+            except Exception:
+                self.bot.logger.exception("Question search index refresh failed")
+
+        hits = self.search_index.search(
+            query, genre=genre, difficulty=difficulty, curator=curator
+        )
+        send = (
+            interaction.followup.send
+            if interaction.response.is_done()
+            else interaction.response.send_message
+        )
+
+        if not hits:
+            await send("No matching questions found.", ephemeral=True)
+            return
+
+        filters = ", ".join(
+            f"{name}={value}"
+            for name, value in (("genre", genre), ("difficulty", difficulty), ("curator", curator))
+            if value
+        )
+        view = QuestionSearchPaginator(
+            query=" ".join(part for part in (query, filters and f"[{filters}]") if part) or "all",
+            entries=hits,
+            target=interaction,
+        )
+        await send(embed=await view.embed(), view=view, ephemeral=True)
+
+    @app_commands.command(name="qotd_duplicates", description="List near-duplicate questions in the bank")
+    async def qotd_duplicates(self, interaction: discord.Interaction):
+        if interaction.user.id not in getattr(self.bot, "owner_ids", []):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        try:
+            snapshot = await self.question_source.get_snapshot()
+            clusters = await asyncio.to_thread(self.duplicates.find, snapshot.rows)
+        except Exception:
+            self.bot.logger.exception("Duplicate question check failed")
+            await interaction.followup.send("Duplicate check failed. Check logs for details.", ephemeral=True)
+            return
+
+        if not clusters:
+            await interaction.followup.send("No near-duplicate questions found.", ephemeral=True)
+            return
+
+        await interaction.followup.send(
+            embed=self.duplicates_embed(clusters, f"{len(clusters)} near-duplicate clusters"),
+            ephemeral=True,
+        )
+
+    @app_commands.command(name="qotd_export", description="Snapshot the live sheet into the offline question bank")
+    async def qotd_export(self, interaction: discord.Interaction):
+        if interaction.user.id not in getattr(self.bot, "owner_ids", []):
+            await interaction.response.send_message("Not authorized.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        try:
+            snapshot = await self.sheet_service.get_snapshot(force=True)
+            rows = await asyncio.to_thread(export_snapshot, snapshot, OFFLINE_QUESTION_BANK_PATH)
+        except SheetUnavailableError as e:
+            self.bot.logger.warning("Offline question bank export failed: %s", e)
+            await interaction.followup.send(
+                f"Could not read Google Sheets, nothing was exported: {e}", ephemeral=True
+            )
+            return
+        except Exception:
+            self.bot.logger.exception("Offline question bank export failed")
+            await interaction.followup.send("Export failed. Check logs for details.", ephemeral=True)
+            return
+
+        if isinstance(self.question_source, OfflineQuestionSource):
+            self.question_source.invalidate()
+
+        await interaction.followup.send(
+            f"Exported {rows} rows to `{OFFLINE_QUESTION_BANK_PATH}`.", ephemeral=True
+        )
+
     @app_commands.command(name="qotd_post_now", description="Manually post QOTD for the schedule day")
     async def qotd_post_now(self, interaction: discord.Interaction):
         if interaction.user.id not in getattr(self.bot, "owner_ids", []):
@@ -3,6 +3,7 @@ Commands for developers only
 """
 
 import importlib
+import time
 from typing import Optional, Literal
 
 import discord
@@ -13,6 +14,7 @@ import config
 from bot import BaseBot
 from utils.constants import EMOJIS
 from utils.checks import is_super_admin
+from utils.levels import LevelTable
 from utils.views import ConfirmView
 
 
@@ -27,6 +29,11 @@ class Developer(commands.Cog, command_attrs=dict(hidden=True)):
             ctx.author.id == self.bot.owner_id
         )
 
+    def _record_load_time(self, ext: str, started: float) -> float:
+        elapsed = (time.perf_counter() - started) * 1000
+        self.bot.extension_load_times[ext] = elapsed
+        return elapsed
+
     @commands.group(name="dev", invoke_without_command=True)
     @commands.is_owner()
     async def dev(self, ctx: commands.Context):
@@ -45,8 +52,10 @@ class Developer(commands.Cog, command_attrs=dict(hidden=True)):
         """
         for ext in exts:
             try:
+                started = time.perf_counter()
                 await self.bot.load_extension(f"exts.{ext}")
-                await ctx.send(f"📥 `exts.{ext}`")
+                elapsed = self._record_load_time(f"exts.{ext}", started)
+                await ctx.send(f"📥 `exts.{ext}` ({elapsed:.0f} ms)")
             except commands.ExtensionError as e:
                 await ctx.send(
                     f"Error loading {e.name}" + "\n" + f"```py\n{str(e)}\n```"
@@ -81,20 +90,58 @@ class Developer(commands.Cog, command_attrs=dict(hidden=True)):
             exts: Extensions to reload"""
         for ext in exts:
             try:
+                started = time.perf_counter()
                 await self.bot.reload_extension(f"exts.{ext}")
-                await ctx.send(f"🔄 `exts.{ext}`")
+                elapsed = self._record_load_time(f"exts.{ext}", started)
+                await ctx.send(f"🔄 `exts.{ext}` ({elapsed:.0f} ms)")
             except commands.ExtensionError as e:
                 await ctx.send(
                     f"Error reloading {e.name}" + "\n" + f"```py\n{str(e)}\n```"
                 )
                 continue
 
+    @dev.command("cache", aliases=["c"])
+    @commands.is_owner()
+    async def cache(
+        self,
+        ctx: commands.Context,
+        action: Optional[Literal["clear"]] = None,
+        namespace: Optional[str] = None,
+    ):
+        """dev cache [clear] [namespace]: Show cache stats, or clear a namespace
+
+        Args:
+            action: `clear` to drop cached entries
+            namespace: Namespace to clear, all if omitted"""
+        if action == "clear":
+            if namespace is not None and namespace not in self.bot.cache:
+                await ctx.send(f"{EMOJIS['no']} Unknown cache namespace `{namespace}`")
+                return
+
+            self.bot.cache.invalidate(namespace)
+            await ctx.send(f"🧹 Cleared `{namespace or 'all namespaces'}`")
+            return
+
+        stats = self.bot.cache.stats()
+        if not stats:
+            await ctx.send("No cache namespaces registered.")
+            return
+
+        lines = [
+            f"{name:<16} size={s['size']}/{s['maxsize']} ttl={s['ttl']} "
+            f"hits={s['hits']} misses={s['misses']} rate={s['hit_rate']} "
+            f"evicted={s['evictions']} expired={s['expirations']}"
+            for name, s in stats.items()
+        ]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
     @app_commands.command(name="reload-config")
     @is_super_admin()
     async def reload_config(self, interaction: discord.Interaction):
         """Reloads the config file"""
         try:
             importlib.reload(config)
+            self.bot.level_table = LevelTable.from_config(config)
             await interaction.response.send_message(
                 f"{EMOJIS['yes']} Reloaded config file", ephemeral=True
             )
@@ -1,27 +1,233 @@
+import asyncio
+import io
+import shutil
+import subprocess
+import tempfile
+import time
+
 import discord
 from discord.ext import commands
 
+import config
 from bot import BaseBot
-from utils.latex import render_latex_jpg
+from utils.latex import (
+    LatexDiskCache,
+    LatexRenderError,
+    LatexTimeoutError,
+    RenderExecutor,
+    RenderLimits,
+    RenderQueueFull,
+    SCRATCH_DIR,
+    TexWorkerPool,
+    build_format,
+    render_key,
+    render_latex,
+    render_options,
+    select_rasterizer,
+)
+
+# Rendered images kept in memory, and the on-disk store behind them.
+LATEX_CACHE_SIZE = getattr(config, "LATEX_CACHE_SIZE", 256)
+LATEX_CACHE_DIR = getattr(config, "LATEX_CACHE_DIR", "data/latex_cache")
+LATEX_CACHE_MAX_BYTES = getattr(config, "LATEX_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+
+# pdflatex processes kept started with the precompiled preamble; 0 renders cold
+LATEX_WORKERS = getattr(config, "LATEX_WORKERS", 2)
+
+# PDF -> PNG backend ("pdftoppm", "ghostscript", "magick"); None picks the
+# fastest one installed
+LATEX_RASTERIZER = getattr(config, "LATEX_RASTERIZER", None)
+LATEX_DPI = getattr(config, "LATEX_DPI", 300)
+
+# Renders get their own threads: at most LATEX_RENDER_THREADS at once and
+# LATEX_RENDER_QUEUE waiting, anything past that is turned away.
+LATEX_RENDER_THREADS = getattr(config, "LATEX_RENDER_THREADS", 2)
+LATEX_RENDER_QUEUE = getattr(config, "LATEX_RENDER_QUEUE", 8)
+
+# Limits for each pdflatex/rasterizer process.
+LATEX_TIMEOUT = getattr(config, "LATEX_TIMEOUT", 15)
+LATEX_CPU_SECONDS = getattr(config, "LATEX_CPU_SECONDS", 10)
+LATEX_MEMORY_MB = getattr(config, "LATEX_MEMORY_MB", 512)
+
+# LATEX_USER_RATE renders per LATEX_USER_PER seconds for each user.
+LATEX_USER_RATE = getattr(config, "LATEX_USER_RATE", 3)
+LATEX_USER_PER = getattr(config, "LATEX_USER_PER", 30)
+
+# rendered once at cog load so the first real request is not the slow one
+WARMUP_SOURCE = r"$e^{i\pi} + 1 = 0$"
+
 
 class LaTeX(commands.Cog):
     def __init__(self, bot: BaseBot):
         self.bot = bot
+        # key -> image bytes; renders are content-addressed so never go stale
+        self.renders = bot.cache.namespace("latex", maxsize=LATEX_CACHE_SIZE)
+        self.disk = LatexDiskCache(LATEX_CACHE_DIR, LATEX_CACHE_MAX_BYTES)
+        self.rasterizer = select_rasterizer(LATEX_RASTERIZER)
+        self.options = render_options(
+            self.rasterizer.name if self.rasterizer else "", LATEX_DPI
+        )
+        self.limits = RenderLimits(
+            timeout=LATEX_TIMEOUT,
+            cpu_seconds=LATEX_CPU_SECONDS,
+            memory_bytes=LATEX_MEMORY_MB * 1024 * 1024,
+        )
+        self.executor = RenderExecutor(LATEX_RENDER_THREADS, LATEX_RENDER_QUEUE)
+        self.workers: TexWorkerPool | None = None
+        # holds the preamble format; on tmpfs like every render directory
+        self._format_dir = tempfile.mkdtemp(prefix="latex-format-", dir=SCRATCH_DIR)
+        self._warmup: asyncio.Task | None = None
+
+    async def cog_load(self):
+        # in the background, so a missing TeX install doesn't hold up startup
+        self._warmup = asyncio.create_task(self._warm_up())
+
+    async def cog_unload(self):
+        if self._warmup is not None:
+            self._warmup.cancel()
+        if self.workers is not None:
+            await asyncio.to_thread(self.workers.close)
+            self.workers = None
+        self.executor.shutdown()
+        shutil.rmtree(self._format_dir, ignore_errors=True)
+
+    async def _warm_up(self):
+        if LATEX_WORKERS > 0:
+            fmt_path = await asyncio.to_thread(build_format, self._format_dir)
+            if fmt_path is not None:
+                try:
+                    self.workers = await asyncio.to_thread(
+                        TexWorkerPool,
+                        fmt_path,
+                        LATEX_WORKERS,
+                        self.limits,
+                    )
+                except OSError:
+                    self.bot.logger.exception("Could not start LaTeX workers")
+
+        started = time.perf_counter()
+        try:
+            buf = await self.executor.run(
+                render_latex,
+                WARMUP_SOURCE,
+                self.workers,
+                self.rasterizer,
+                LATEX_DPI,
+                self.limits,
+            )
+        except (LatexRenderError, OSError, subprocess.SubprocessError):
+            self.bot.logger.exception("LaTeX warm-up render failed")
+            return
+
+        self.bot.logger.info(
+            "LaTeX warm-up render %s in %.0f ms (%s, %s at %d dpi).",
+            "succeeded" if buf is not None else "failed",
+            (time.perf_counter() - started) * 1000,
+            f"{LATEX_WORKERS} warm workers" if self.workers is not None else "cold path",
+            self.rasterizer.name,
+            LATEX_DPI,
+        )
+
+    async def render(self, latex_code: str) -> bytes | None:
+        """Rendered image for `latex_code`, from memory, disk, or a fresh render.
+
+        Failed renders return None and are not cached.
+
+        Raises:
+            LatexTimeoutError: The render ran past its time limit
+            RenderQueueFull: Too many renders are already waiting
+        """
+        key = render_key(latex_code, self.options)
+        try:
+            return await self.renders.get_or_fetch(
+                key, lambda: self._render_uncached(key, latex_code)
+            )
+        except LatexTimeoutError:
+            raise
+        except LatexRenderError:
+            return None
+
+    async def _render_uncached(self, key: str, latex_code: str) -> bytes:
+        data = await asyncio.to_thread(self.disk.get, key)
+        if data is not None:
+            return data
+
+        buf = await self.executor.run(
+            render_latex,
+            latex_code,
+            self.workers,
+            self.rasterizer,
+            LATEX_DPI,
+            self.limits,
+        )
+        if buf is None:
+            raise LatexRenderError(key)
+
+        data = buf.getvalue()
+        try:
+            await asyncio.to_thread(self.disk.put, key, data)
+        except OSError:
+            self.bot.logger.exception("Could not store LaTeX render %s", key)
+        return data
+
+    async def cog_command_error(self, ctx: commands.Context, error: commands.CommandError):
+        if isinstance(error, commands.CommandOnCooldown):
+            await ctx.send(
+                f"You're rendering too fast, try again in {error.retry_after:.0f}s.",
+                delete_after=10,
+            )
+            return
+
+        # a cog error handler stops discord.py's default logging
+        self.bot.logger.error(
+            "Error in command %s", ctx.command, exc_info=(type(error), error, error.__traceback__)
+        )
 
     @commands.command(name="latex", aliases=["tex"])
+    @commands.cooldown(LATEX_USER_RATE, LATEX_USER_PER, commands.BucketType.user)
     async def latex(self, ctx: commands.Context, *, latex_code: str):
         """Render LaTeX code as an image."""
 
-        loop = self.bot.loop
-        buf = await loop.run_in_executor(None, render_latex_jpg, latex_code, f"latex_{ctx.message.id}")
-        
-        if buf is None:
+        try:
+            data = await self.render(latex_code)
+        except RenderQueueFull:
+            await ctx.send("Too many renders in progress, please try again in a moment.")
+            return
+        except LatexTimeoutError:
+            await ctx.send(f"Rendering took longer than {LATEX_TIMEOUT}s and was stopped.")
+            return
+
+        if data is None:
             await ctx.send("Failed to render LaTeX. Please check your code.")
             return
 
-        file = discord.File(fp=buf, filename=f"latex_{ctx.message.id}.jpg")
+        file = discord.File(fp=io.BytesIO(data), filename=f"latex_{ctx.message.id}.png")
         await ctx.send(file=file)
 
+    @commands.command(name="texstats")
+    @commands.is_owner()
+    async def texstats(self, ctx: commands.Context):
+        """Show LaTeX render queue, worker and cache stats."""
+
+        e = self.executor.stats()
+        d = await asyncio.to_thread(self.disk.stats)
+        lines = [
+            f"executor  running={e['running']}/{e['concurrency']} "
+            f"queued={e['queued']}/{e['max_queue']} completed={e['completed']} "
+            f"failed={e['failed']} timeouts={e['timeouts']} rejected={e['rejected']}",
+            "workers   "
+            + (
+                f"warm={self.workers.size} renders={self.workers.warm} "
+                f"spawned={self.workers.spawned}"
+                if self.workers is not None
+                else "off (cold path)"
+            ),
+            f"raster    {self.rasterizer.name if self.rasterizer else 'none'} @ {LATEX_DPI} dpi",
+            f"disk      files={d['files']} bytes={d['bytes']}/{d['max_bytes']} "
+            f"hits={d['hits']} misses={d['misses']} evicted={d['evictions']}",
+        ]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
 
 async def setup(bot: BaseBot):
     await bot.add_cog(LaTeX(bot))
@@ -1,8 +1,94 @@
+import asyncio
+import re
+
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-import config
+from services.level_roles import LevelRoleReconciler
+from services.name_resolver import NameResolver
+from utils.constants import EMOJIS
+from utils.levels import LevelTable
+from utils.views import BaseView
+
+
+# snowflakes inside mentions (`<@123>`, `<@!123>`) or given as bare IDs
+MEMBER_ID_RE = re.compile(r"(?<!\d)\d{15,20}(?!\d)")
+BULK_SUMMARY_LIMIT = 25
+
+# names of users outside the guild (or deleted) shown on leaderboards
+NAME_CACHE_TTL = 60 * 60
+NAME_CACHE_SIZE = 5000
+
+
+class LeaderboardView(BaseView):
+    """Leaderboard browser that pages with keyset cursors instead of OFFSET"""
+
+    def __init__(self, cog: "XPCog", *, target, per_page: int = 10, timeout=180):
+        super().__init__(timeout=timeout, target=target)
+
+        self.cog = cog
+        self.per_page = per_page
+
+        # start cursor of every page visited so far; the last one is current
+        self._cursors: list[tuple[int, int] | None] = [None]
+        self._rows: list[tuple[int, int]] = []
+
+    @property
+    def page_index(self) -> int:
+        return len(self._cursors) - 1
+
+    async def load(self) -> discord.Embed | None:
+        """Fetch the current page and build its embed, None if it is empty."""
+
+        # one extra row tells us whether a next page exists
+        rows = await self.cog.xp_service.get_leaderboard_page(
+            after=self._cursors[-1], limit=self.per_page + 1
+        )
+        self._rows = rows[: self.per_page]
+
+        self.previous_page.disabled = self.page_index == 0
+        self.next_page.disabled = len(rows) <= self.per_page
+
+        if not self._rows:
+            return None
+
+        embed = await self.cog.leaderboard_embed(
+            self.target.guild,
+            self._rows,
+            start=self.page_index * self.per_page + 1,
+        )
+        embed.set_footer(text=f"Page {self.page_index + 1}")
+        return embed
+
+    @discord.ui.button(emoji=EMOJIS["arrow_left"], style=discord.ButtonStyle.gray)
+    async def previous_page(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ):
+        """Go to the previous page"""
+
+        if len(self._cursors) > 1:
+            self._cursors.pop()
+
+        embed = await self.load()
+        return await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(emoji=EMOJIS["arrow_right"], style=discord.ButtonStyle.gray)
+    async def next_page(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ):
+        """Go to the next page"""
+
+        user_id, xp = self._rows[-1]
+        self._cursors.append((xp, user_id))
+
+        embed = await self.load()
+        if embed is None:
+            # rows moved since this page was rendered; stay where we were
+            self._cursors.pop()
+            embed = await self.load()
+
+        return await interaction.response.edit_message(embed=embed, view=self)
 
 
 class XPCog(commands.GroupCog, group_name="levels"):
@@ -11,56 +97,52 @@ class XPCog(commands.GroupCog, group_name="levels"):
     def __init__(self, bot: commands.Bot, xp_service):
         self.bot = bot
         self.xp_service = xp_service
+        self.level_roles = LevelRoleReconciler(bot)
+        # background role syncs; referenced so they aren't garbage collected
+        self._sync_tasks: set[asyncio.Task] = set()
+        self.names = NameResolver(
+            bot,
+            bot.cache.namespace(
+                "display_names", ttl=NAME_CACHE_TTL, maxsize=NAME_CACHE_SIZE
+            ),
+        )
+
+    def cog_unload(self):
+        for task in self._sync_tasks:
+            task.cancel()
+
+    @property
+    def levels(self) -> LevelTable:
+        """Level table compiled from config, rebuilt by /reload-config"""
+        return self.bot.level_table
 
     # /levels xp
     @app_commands.command(name="xp", description="View your XP profile")
     async def xp(self, interaction: discord.Interaction):
         user = interaction.user
         current_xp = await self.xp_service.get_xp(user.id)
-
-        current_level = "Unranked"
-        next_threshold = 100
-        next_level = "Quantum Newbie"
-
-        if config.XP_THRESHOLDS:
-            for threshold, (level_name, _) in sorted(
-                config.XP_THRESHOLDS.items(), reverse=True
-            ):
-                if current_xp >= threshold:
-                    current_level = level_name
-                    higher = sorted(t for t in config.XP_THRESHOLDS if t > threshold)
-                    next_threshold = higher[0] if higher else threshold + 500
-                    next_level = config.XP_THRESHOLDS.get(
-                        next_threshold, ("Master", None)
-                    )[0]
-                    break
-            else:
-                next_threshold = sorted(config.XP_THRESHOLDS.keys())[0]
-
-        progress_percent = int((current_xp % next_threshold) / next_threshold * 100)
+        progress = self.levels.progress(current_xp)
 
         box_count = 15
-        filled_count = progress_percent // (100 // box_count)
+        filled_count = progress.percent // (100 // box_count)
         progress_bar = (
             "🟦 " * filled_count
             + "⬜ " * (box_count - filled_count)
-            + f"{progress_percent}%"
+            + f"{progress.percent}%"
         )
 
         embed = discord.Embed(
             title=f"{user.display_name}'s Physics XP Profile",
-            description=f"**Rank:** {current_level} **XP:** {current_xp}",
+            description=f"**Rank:** {progress.level} **XP:** {current_xp}",
             color=0x3498DB,
             timestamp=discord.utils.utcnow(),
         )
 
         embed.set_thumbnail(url=user.display_avatar.url)
 
-        remaining = next_threshold - (current_xp % next_threshold)
-
         embed.add_field(
             name="Progress to Next Rank",
-            value=f"{current_xp % next_threshold} / {next_threshold} XP ({remaining} remaining)",
+            value=f"{progress.into} / {progress.next_threshold} XP ({progress.remaining} remaining)",
             inline=False,
         )
 
@@ -68,7 +150,7 @@ class XPCog(commands.GroupCog, group_name="levels"):
 
         embed.add_field(
             name="Next Milestone",
-            value=f"**{next_level}** at {current_xp + remaining} XP",
+            value=f"**{progress.next_level}** at {current_xp + progress.remaining} XP",
             inline=False,
         )
 
@@ -89,15 +171,10 @@ class XPCog(commands.GroupCog, group_name="levels"):
             )
             return
 
-        await self.xp_service.update_xp(member.id, amount)
-        new_xp = await self.xp_service.get_xp(member.id)
+        _, new_xp = await self.xp_service.update_xp(member.id, amount)
 
-        # auto ole assignment
-        for threshold, (_, role_name) in config.XP_THRESHOLDS.items():
-            if new_xp >= threshold:
-                role = discord.utils.get(interaction.guild.roles, name=role_name)
-                if role and role not in member.roles:
-                    await member.add_roles(role)
+        # auto role assignment
+        await self.level_roles.reconcile(member, new_xp)
 
         embed = discord.Embed(
             title="XP Granted",
@@ -109,6 +186,87 @@ class XPCog(commands.GroupCog, group_name="levels"):
 
         await interaction.response.send_message(embed=embed)
 
+    # /levels add-xp-bulk
+    @app_commands.command(
+        name="add-xp-bulk",
+        description="Add XP to every member of a role and/or a mention list",
+    )
+    @app_commands.describe(
+        role="Grant XP to everyone with this role",
+        members="Mentions or IDs of members to grant XP to",
+    )
+    @app_commands.checks.has_role("Curator")
+    async def add_xp_bulk(
+        self,
+        interaction: discord.Interaction,
+        amount: int,
+        role: discord.Role | None = None,
+        members: str | None = None,
+    ):
+        if amount <= 0:
+            await interaction.response.send_message(
+                "❌ Amount must be positive.", ephemeral=True
+            )
+            return
+
+        guild = interaction.guild
+        targets: dict[int, discord.Member] = {}
+
+        if role:
+            targets.update((m.id, m) for m in role.members)
+
+        for user_id in map(int, MEMBER_ID_RE.findall(members or "")):
+            member = guild.get_member(user_id)
+            if member:
+                targets[member.id] = member
+
+        if not targets:
+            await interaction.response.send_message(
+                "❌ No members matched.", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(thinking=True)
+
+        totals = await self.xp_service.update_xp_many(
+            {user_id: amount for user_id in targets}
+        )
+
+        # auto role assignment, at most one role edit per member
+        role_failures = 0
+        for user_id, new_xp in totals.items():
+            try:
+                await self.level_roles.reconcile(targets[user_id], new_xp)
+            except discord.HTTPException:
+                self.bot.logger.warning(
+                    f"Level role update failed for {user_id}", exc_info=True
+                )
+                role_failures += 1
+
+        lines = [
+            f"{targets[user_id].mention} — {new_xp}"
+            for user_id, new_xp in sorted(totals.items(), key=lambda t: -t[1])
+        ]
+        if len(lines) > BULK_SUMMARY_LIMIT:
+            hidden = len(lines) - BULK_SUMMARY_LIMIT
+            lines = lines[:BULK_SUMMARY_LIMIT] + [f"… and {hidden} more"]
+
+        embed = discord.Embed(
+            title="XP Granted",
+            description=(
+                f"{interaction.user.mention} added **{amount} XP** to "
+                f"**{len(totals)}** members\n\n**New totals**\n" + "\n".join(lines)
+                + (
+                    f"\n\n⚠️ Level roles could not be updated for {role_failures} members."
+                    if role_failures
+                    else ""
+                )
+            ),
+            color=0x00FF00,
+        )
+
+        await interaction.followup.send(embed=embed)
+
     # /levels remove-xp
     @app_commands.command(name="remove-xp", description="Remove XP from a member")
     @app_commands.checks.has_role("Curator")
@@ -124,9 +282,7 @@ class XPCog(commands.GroupCog, group_name="levels"):
             )
             return
 
-        old_xp = await self.xp_service.get_xp(member.id)
-        await self.xp_service.update_xp(member.id, -amount)
-        new_xp = await self.xp_service.get_xp(member.id)
+        old_xp, new_xp = await self.xp_service.update_xp(member.id, -amount)
 
         removed = old_xp - new_xp
 
@@ -137,10 +293,7 @@ class XPCog(commands.GroupCog, group_name="levels"):
             return
 
         # auto role removal
-        for threshold, (_, role_name) in sorted(config.XP_THRESHOLDS.items()):
-            role = discord.utils.get(interaction.guild.roles, name=role_name)
-            if role and role in member.roles and new_xp < threshold:
-                await member.remove_roles(role)
+        await self.level_roles.reconcile(member, new_xp)
 
         embed = discord.Embed(
             title="XP Removed",
@@ -153,47 +306,122 @@ class XPCog(commands.GroupCog, group_name="levels"):
 
         await interaction.response.send_message(embed=embed)
 
+    # /levels sync-roles
+    @app_commands.command(
+        name="sync-roles", description="Re-sync every member's level roles with their XP"
+    )
+    @app_commands.checks.has_role("Curator")
+    async def sync_roles(self, interaction: discord.Interaction):
+        if self.level_roles.syncing:
+            await interaction.response.send_message(
+                "⏳ A level role sync is already running.", ephemeral=True
+            )
+            return
+
+        await interaction.response.send_message(
+            "🔄 Syncing level roles in the background, I'll post here when done."
+        )
+
+        async def _run():
+            try:
+                checked, edited, failed = await self.level_roles.resync_guild(
+                    interaction.guild
+                )
+            except Exception:
+                self.bot.logger.exception("Level role sync failed")
+                await interaction.channel.send("❌ Level role sync failed.")
+                return
+
+            await interaction.channel.send(
+                f"✅ Level roles synced: {checked} checked, {edited} updated, {failed} failed."
+            )
+
+        # may outlive the interaction token, so report via the channel
+        task = asyncio.create_task(_run())
+        self._sync_tasks.add(task)
+        task.add_done_callback(self._sync_tasks.discard)
+
+    # /levels rank
+    @app_commands.command(name="rank", description="View a member's leaderboard position")
+    async def rank(
+        self,
+        interaction: discord.Interaction,
+        member: discord.Member | None = None,
+    ):
+        member = member or interaction.user
+        result = await self.xp_service.get_rank(member.id)
+
+        if result is None:
+            await interaction.response.send_message(
+                f"📉 {member.mention} is not on the leaderboard yet.", ephemeral=True
+            )
+            return
+
+        rank, xp = result
+
+        embed = discord.Embed(
+            title=f"{member.display_name}'s Rank",
+            description=f"**#{rank}** with **{xp} XP**",
+            color=0xF1C40F,
+            timestamp=discord.utils.utcnow(),
+        )
+        embed.set_thumbnail(url=member.display_avatar.url)
+
+        await interaction.response.send_message(embed=embed)
+
     # /levels leaderboard
     @app_commands.command(name="leaderboard", description="View top XP holders")
     async def leaderboard(self, interaction: discord.Interaction):
-        top_data = await self.xp_service.get_leaderboard(10)
+        view = LeaderboardView(self, target=interaction)
+        embed = await view.load()
 
-        if not top_data:
+        if embed is None:
             await interaction.response.send_message(
                 "📉 Leaderboard is empty.", ephemeral=True
             )
             return
 
-        lines = []
+        await interaction.response.send_message(embed=embed, view=view)
 
-        for rank, (user_id, xp) in enumerate(top_data, 1):
+    async def leaderboard_embed(
+        self, guild: discord.Guild, rows: list[tuple[int, int]], start: int
+    ) -> discord.Embed:
+        """Build a leaderboard embed for `rows`, numbered from `start`."""
 
-            member = interaction.guild.get_member(user_id)
+        lines = []
+        names = await self.names.resolve_many(guild, [user_id for user_id, _ in rows])
 
-            if member:
-                display_name = member.display_name
-            else:
-                try:
-                    user = await self.bot.fetch_user(user_id)
-                    display_name = user.name
-                except discord.NotFound:
-                    display_name = f"Deleted User ({user_id})"
+        for rank, (user_id, xp) in enumerate(rows, start):
+            display_name = names[user_id]
 
             prefix = {1: "🥇", 2: "🥈", 3: "🥉"}.get(rank, f"{rank}.")
             lines.append(f"`{prefix}` **{display_name}** — `{xp} XP`")
 
-        embed = discord.Embed(
+        return discord.Embed(
             title="🏆 Physics Club Hall of Fame",
             description="\n".join(lines),
             color=0xF1C40F,
             timestamp=discord.utils.utcnow(),
         )
 
-        await interaction.response.send_message(embed=embed)
+    @commands.Cog.listener()
+    async def on_guild_role_create(self, role: discord.Role):
+        self.level_roles.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role: discord.Role):
+        self.level_roles.invalidate(role.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name:
+            self.level_roles.invalidate(after.guild.id)
 
     # todo: integrate with more modularity
     # Error handler for role check
     @add_xp.error
+    @add_xp_bulk.error
+    @sync_roles.error
     @remove_xp.error
     async def role_error(self, interaction: discord.Interaction, error):
         if isinstance(error, app_commands.errors.MissingRole):
@@ -202,9 +430,13 @@ class XPCog(commands.GroupCog, group_name="levels"):
             )
         else:
             self.bot.logger.error(error)
-            await interaction.response.send_message(
-                "❌ Unexpected error.", ephemeral=True
+            # bulk grants defer before doing any work
+            send = (
+                interaction.followup.send
+                if interaction.response.is_done()
+                else interaction.response.send_message
             )
+            await send("❌ Unexpected error.", ephemeral=True)
 
 
 async def setup(bot):
@@ -1,11 +1,15 @@
 import asyncio
 import logging
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import date, datetime
 import pytz
 
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-
+import config
+from utils.questions import Question, QuestionColumns
 from config import (
     GOOGLE_CREDENTIALS_PATH,
     GOOGLE_API_SCOPES,
@@ -16,73 +20,560 @@ from config import (
 
 logger = logging.getLogger("bot")
 
+GOOGLE_SHEET_CACHE_TTL = getattr(config, "GOOGLE_SHEET_CACHE_TTL", 300)
+# Between full reloads only appended rows are read, so edits to existing
+# rows show up after at most this many seconds.
+GOOGLE_SHEET_FULL_REFRESH = getattr(config, "GOOGLE_SHEET_FULL_REFRESH", 3600)
+# Socket timeout for one Sheets request, and the budget for it plus retries.
+GOOGLE_SHEET_TIMEOUT = getattr(config, "GOOGLE_SHEET_TIMEOUT", 10)
+GOOGLE_SHEET_DEADLINE = getattr(config, "GOOGLE_SHEET_DEADLINE", 30)
+GOOGLE_SHEET_RETRIES = getattr(config, "GOOGLE_SHEET_RETRIES", 3)
+
+# HTTP statuses worth another attempt; anything else fails straight away.
+_RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+_CELLS_RE = re.compile(r"(?P<c1>[A-Z]*)(?P<r1>\d*)(?::(?P<c2>[A-Z]*)(?P<r2>\d*))?")
+
+# SheetIndex table -> the Question field its keys come from
+_KEY_FIELDS = {"by_date": "date", "by_number": "number"}
+
+
+def column_letters(index: int) -> str:
+    """0-based column index to A1 letters (0 -> A, 26 -> AA)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    """A1 column letters to a 0-based index (A -> 0, AA -> 26)."""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - ord("A") + 1
+    return index - 1
+
+
+@dataclass(frozen=True)
+class SheetLayout:
+    """Where the question table sits, parsed from the A1 `GOOGLE_SHEET_RANGE`"""
+
+    sheet: str
+    first_col: int = 0
+    last_col: int = column_index("ZZ")
+    header_row: int = 1
+
+    @classmethod
+    def parse(cls, a1: str) -> "SheetLayout":
+        a1 = a1.strip()
+        if "!" not in a1:
+            return cls(sheet=a1)
+
+        sheet, _, cells = a1.rpartition("!")
+        match = _CELLS_RE.fullmatch(cells.upper())
+        if not match:
+            raise ValueError(f"Unsupported sheet range: {a1!r}")
+
+        first_col = match["c1"] or "A"
+        return cls(
+            sheet=sheet,
+            first_col=column_index(first_col),
+            last_col=column_index(match["c2"] or ("ZZ" if match["c2"] is not None else first_col)),
+            header_row=int(match["r1"] or 1),
+        )
+
+    def cells(
+        self,
+        first_row: int,
+        last_row: int | None = None,
+        first_col: int | None = None,
+        last_col: int | None = None,
+    ) -> str:
+        """A1 range for rows `first_row..last_row` (open-ended if None)."""
+        first = column_letters(self.first_col if first_col is None else first_col)
+        last = column_letters(self.last_col if last_col is None else last_col)
+        prefix = f"{self.sheet}!" if self.sheet else ""
+        return f"{prefix}{first}{first_row}:{last}{last_row or ''}"
+
+    def column(self, col: int, first_row: int) -> str:
+        return self.cells(first_row, first_col=col, last_col=col)
+
+
+@dataclass
+class QuestionSnapshot:
+    """Parsed copy of the question bank, indexed for O(1) lookups"""
+
+    headers: list[str]
+    rows: list[Question]
+    columns: QuestionColumns | None = None
+    by_date: dict[str, Question] = field(default_factory=dict)
+    by_number: dict[str, Question] = field(default_factory=dict)
+    # last sheet row read, so a refresh can ask for appended rows only
+    row_count: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+    full_loaded_at: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        if self.columns is None:
+            self.columns = QuestionColumns.from_headers(self.headers)
+
+    @classmethod
+    def from_values(cls, values: list[list[str]], header_row: int = 1) -> "QuestionSnapshot":
+        headers = values[0] if values else []
+        snapshot = cls(headers=headers, rows=[], row_count=header_row)
+        snapshot.extend(values[1:])
+        return snapshot
+
+    def extend(self, values: list[list[str]]):
+        """Add rows read after `row_count`."""
+        parse = self.columns.parse
+
+        for row in values:
+            question = parse(row)
+            self.rows.append(question)
+
+            # first row wins on duplicates, like the old linear scan
+            if question.date:
+                self.by_date.setdefault(question.date, question)
+            if question.number:
+                self.by_number.setdefault(question.number, question)
+
+        self.row_count += len(values)
+        self.loaded_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    def full_age(self) -> float:
+        return time.monotonic() - self.full_loaded_at
+
+
+@dataclass
+class SheetIndex:
+    """Sheet row of every Date and Number, read from just those two columns.
+
+    Whole rows are fetched on demand and kept in `rows` until the next full
+    reload.
+    """
+
+    headers: list[str]
+    columns: QuestionColumns
+    date_col: int | None
+    number_col: int | None
+    by_date: dict[str, int] = field(default_factory=dict)
+    by_number: dict[str, int] = field(default_factory=dict)
+    rows: dict[int, Question] = field(default_factory=dict)
+    row_count: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+    full_loaded_at: float = field(default_factory=time.monotonic)
+
+    def extend(self, dates: list[str], numbers: list[str]):
+        """Index the column values read after `row_count`."""
+        first_row = self.row_count + 1
+
+        for offset, value in enumerate(dates):
+            if value.strip():
+                self.by_date.setdefault(value.strip(), first_row + offset)
+
+        for offset, value in enumerate(numbers):
+            if value.strip():
+                self.by_number.setdefault(value.strip(), first_row + offset)
+
+        self.row_count += max(len(dates), len(numbers))
+        self.loaded_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    def full_age(self) -> float:
+        return time.monotonic() - self.full_loaded_at
+
+
+class SheetUnavailableError(Exception):
+    """Google Sheets could not be read within the deadline and there was no
+    earlier copy of the data to answer from."""
+
+
+@dataclass
+class SheetStats:
+    """Counters for Sheets requests, reported by /qotd_status"""
+
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    fallbacks: int = 0
+    last_latency: float = 0.0
+    max_latency: float = 0.0
+    total_latency: float = 0.0
+
+    def record(self, latency: float):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_latency += latency
+
+    @property
+    def avg_latency(self) -> float:
+        succeeded = self.requests - self.failures
+        return self.total_latency / succeeded if succeeded else 0.0
+
+
+def _is_retryable(exc: Exception) -> bool:
+    # googleapiclient.errors.HttpError carries the response as `resp`
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    if status is not None:
+        return int(status) in _RETRY_STATUSES
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+def _checked_columns(headers: list[str]) -> QuestionColumns:
+    """Resolve the header row, logging schema problems once per sheet read."""
+    columns = QuestionColumns.from_headers(headers)
+    if headers:
+        for problem in columns.problems:
+            logger.error(f"Question sheet schema: {problem}")
+    return columns
+
 
 class GSheetService:
+    # Class-level defaults so a bare instance (tests) still works.
+    _service = None
+    _credentials = None
+    _snapshot: QuestionSnapshot | None = None
+    _snapshot_lock = threading.Lock()
+    _index: SheetIndex | None = None
+    _index_lock = threading.Lock()
+    # after a failed refresh, cached data is served without retrying until then
+    _unavailable_until: float = 0.0
+    layout = SheetLayout.parse(GOOGLE_SHEET_RANGE)
+    snapshot_ttl: float = GOOGLE_SHEET_CACHE_TTL
+    full_refresh_interval: float = GOOGLE_SHEET_FULL_REFRESH
+    request_timeout: float = GOOGLE_SHEET_TIMEOUT
+    deadline: float = GOOGLE_SHEET_DEADLINE
+    max_retries: int = GOOGLE_SHEET_RETRIES
+    backoff_base: float = 0.5
+
+    _service_lock = threading.Lock()
+
+    _stats: SheetStats | None = None
+
     def __init__(self):
-        self._service = self._build_service()
+        # The client is built on first use; see `_get_service`.
+        self._service = None
+
+    @property
+    def stats(self) -> SheetStats:
+        if self._stats is None:
+            self._stats = SheetStats()
+        return self._stats
 
     def _build_service(self):
-        creds = Credentials.from_service_account_file(
+        # Imported here so loading the extension doesn't pay for googleapiclient.
+        from googleapiclient.discovery import build
+        from google.oauth2.service_account import Credentials
+
+        started = time.perf_counter()
+        self._credentials = Credentials.from_service_account_file(
             GOOGLE_CREDENTIALS_PATH,
             scopes=GOOGLE_API_SCOPES,
         )
-        logger.info("Google Sheets service initialized.")
-        return build("sheets", "v4", credentials=creds)
+        # The discovery document bundled with the library, no fetch or file cache.
+        service = build(
+            "sheets",
+            "v4",
+            # bounds every request so a hung call can't hold an executor thread
+            http=self._authorized_http(self.request_timeout),
+            static_discovery=True,
+            cache_discovery=False,
+        )
+        logger.info(
+            f"Google Sheets service initialized in {(time.perf_counter() - started) * 1000:.1f} ms."
+        )
+        return service
+
+    def _authorized_http(self, timeout: float):
+        """An authorized HTTP client whose requests time out after `timeout`."""
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+
+        return AuthorizedHttp(self._credentials, http=httplib2.Http(timeout=timeout))
 
-    async def fetch_question_for_date(self, question_date: date) -> dict[str, str] | None:
+    # Blocking, must be run in thread
+    def _get_service(self):
+        if self._service is None:
+            with self._service_lock:
+                if self._service is None:
+                    self._service = self._build_service()
+        return self._service
+
+    async def fetch_question_for_date(self, question_date: date) -> Question | None:
         """Fetch the question for a specific calendar date.
 
         Returns:
-            dict[str, str] | None: Dictionary of question data if found, else None
+            Question | None: The question if found, else None
+
+        Raises:
+            SheetUnavailableError: Sheets is down and nothing is cached
         """
         return await asyncio.to_thread(self._fetch_date_sync, question_date)
 
-    async def fetch_today_question(self) -> dict[str, str] | None:
+    async def fetch_questions_for_dates(
+        self, dates: list[date]
+    ) -> dict[date, Question]:
+        """Fetch several days with a single `batchGet`; missing days are left out."""
+        return await asyncio.to_thread(self._fetch_dates_sync, dates)
+
+    async def fetch_question_by_number(self, number: str | int) -> Question | None:
+        """Fetch a question by its `Number` column."""
+        return await asyncio.to_thread(self._fetch_number_sync, str(number).strip())
+
+    async def fetch_today_question(self) -> Question | None:
         """Backwards-compatible helper that fetches the UTC day's question."""
         return await self.fetch_question_for_date(datetime.now(pytz.utc).date())
 
+    async def get_snapshot(self, force: bool = False) -> QuestionSnapshot:
+        """Return the whole sheet, reading appended rows if stale and
+        everything again if `force`d or past the full refresh interval.
+
+        If Sheets can't be reached the last snapshot is returned as is, except
+        for a `force`d reload, which raises `SheetUnavailableError` instead.
+        """
+        return await asyncio.to_thread(self._get_snapshot_sync, force)
+
+    def invalidate(self):
+        """Drop cached data so the next lookup reads the sheet again."""
+        self._snapshot = None
+        self._index = None
+        self._unavailable_until = 0.0
+
     # Blocking, must be run in thread
-    def _fetch_date_sync(self, question_date: date) -> dict | None:
-        try:
-            range_name = GOOGLE_SHEET_RANGE
-
-            result = (
-                self._service.spreadsheets()
-                .values()
-                .get(
-                    spreadsheetId=GOOGLE_SHEET_ID,
-                    range=range_name,
+    def _values(self):
+        return self._get_service().spreadsheets().values()
+
+    def _execute(self, request) -> dict:
+        """Run a request, retrying transient failures with jittered
+        exponential backoff for as long as `deadline` allows."""
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            call_started = time.monotonic()
+            remaining = self.deadline - (call_started - started)
+            self.stats.requests += 1
+            try:
+                if remaining < self.request_timeout:
+                    # a full-length attempt would run past the deadline; the
+                    # client's own connection is kept for the common case
+                    result = request.execute(http=self._authorized_http(remaining))
+                else:
+                    result = request.execute()
+            except Exception as e:
+                self.stats.failures += 1
+                delay = random.uniform(0, self.backoff_base * 2**attempt)
+
+                if (
+                    not _is_retryable(e)
+                    or attempt >= self.max_retries
+                    or time.monotonic() - started + delay >= self.deadline
+                ):
+                    raise
+
+                attempt += 1
+                self.stats.retries += 1
+                logger.warning(
+                    f"Sheets request failed ({e!r}); retry {attempt}/{self.max_retries} in {delay:.2f}s"
                 )
-                .execute()
-            )
+                time.sleep(delay)
+            else:
+                self.stats.record(time.monotonic() - call_started)
+                return result
+
+    def _get(self, a1: str) -> list[list[str]]:
+        request = self._values().get(spreadsheetId=GOOGLE_SHEET_ID, range=a1)
+        return self._execute(request).get("values", [])
+
+    def _batch_get(self, ranges: list[str], major_dimension: str = "ROWS") -> list[list[list[str]]]:
+        request = self._values().batchGet(
+            spreadsheetId=GOOGLE_SHEET_ID,
+            ranges=ranges,
+            majorDimension=major_dimension,
+        )
+        result = self._execute(request)
+        return [value_range.get("values", []) for value_range in result.get("valueRanges", [])]
+
+    def _is_fresh(self, cached: QuestionSnapshot | SheetIndex | None) -> bool:
+        if cached is None:
+            return False
+        return cached.age() < self.snapshot_ttl or time.monotonic() < self._unavailable_until
+
+    def _fall_back(self, cached, error: Exception, what: str):
+        """Serve `cached` after a failed refresh, or raise if there is none."""
+        if cached is None:
+            raise SheetUnavailableError(f"Could not load the {what}: {error!r}") from error
+
+        self.stats.fallbacks += 1
+        # don't make every lookup wait out the deadline again
+        self._unavailable_until = time.monotonic() + min(self.snapshot_ttl, 60)
+        logger.warning(
+            f"Sheets unavailable ({error!r}); using the {what} from {cached.age():.0f}s ago."
+        )
+        return cached
+
+    # Blocking, must be run in thread
+    def _get_snapshot_sync(self, force: bool = False) -> QuestionSnapshot:
+        snapshot = self._snapshot
+        if not force and self._is_fresh(snapshot):
+            return snapshot
 
-            values = result.get("values", [])
-            if not values:
-                logger.warning("Sheet empty.")
-                return None
+        with self._snapshot_lock:
+            # another thread may have refreshed while we waited
+            snapshot = self._snapshot
+            if not force and self._is_fresh(snapshot):
+                return snapshot
 
-            headers = values[0]
-            target_date = question_date.strftime("%Y-%m-%d")
+            try:
+                if force or snapshot is None or snapshot.full_age() >= self.full_refresh_interval:
+                    values = self._get(GOOGLE_SHEET_RANGE)
+                    snapshot = QuestionSnapshot(
+                        headers=values[0] if values else [],
+                        rows=[],
+                        columns=_checked_columns(values[0] if values else []),
+                        row_count=self.layout.header_row,
+                    )
+                    snapshot.extend(values[1:])
+                    self._snapshot = snapshot
+                    logger.info(f"Loaded question bank snapshot ({len(snapshot.rows)} rows).")
+                else:
+                    appended = self._get(self.layout.cells(snapshot.row_count + 1))
+                    snapshot.extend(appended)
+                    if appended:
+                        logger.info(f"Read {len(appended)} appended question rows.")
+            except Exception as e:
+                if force:
+                    # the caller asked for the live sheet, not the copy it replaces
+                    raise SheetUnavailableError(
+                        f"Could not reload the question bank snapshot: {e!r}"
+                    ) from e
+                return self._fall_back(self._snapshot, e, "question bank snapshot")
+
+        return snapshot
+
+    # Blocking, must be run in thread
+    def _get_index_sync(self) -> SheetIndex:
+        index = self._index
+        if self._is_fresh(index):
+            return index
 
-            for row in values[1:]:
-                if len(row) < len(headers):
-                    row += [""] * (len(headers) - len(row))
+        with self._index_lock:
+            index = self._index
+            if self._is_fresh(index):
+                return index
 
-                row_dict = dict(zip(headers, row))
+            layout = self.layout
 
-                if row_dict.get("Date", "").strip() == target_date:
-                    logger.info(
-                        f"Found question #{row_dict.get('Number', '?')} for {target_date}"
+            try:
+                if index is None or index.full_age() >= self.full_refresh_interval:
+                    header = self._get(layout.cells(layout.header_row, layout.header_row))
+                    headers = header[0] if header else []
+                    columns = _checked_columns(headers)
+
+                    def _col(i: int | None) -> int | None:
+                        return None if i is None else layout.first_col + i
+
+                    index = SheetIndex(
+                        headers=headers,
+                        columns=columns,
+                        date_col=_col(columns.date),
+                        number_col=_col(columns.number),
+                        row_count=layout.header_row,
                     )
-                    return row_dict
 
-            logger.warning(f"No question found for {target_date}")
-            return None
+                dates, numbers = self._read_columns(index, index.row_count + 1)
+            except Exception as e:
+                return self._fall_back(self._index, e, "sheet index")
+
+            index.extend(dates, numbers)
+            self._index = index
+
+        return index
+
+    def _read_columns(self, index: SheetIndex, first_row: int) -> tuple[list[str], list[str]]:
+        """Read the Date and Number columns from `first_row` down in one batchGet."""
+        cols = [c for c in (index.date_col, index.number_col) if c is not None]
+        if not cols:
+            return [], []
+
+        columns = self._batch_get(
+            [self.layout.column(col, first_row) for col in cols],
+            major_dimension="COLUMNS",
+        )
+        values = {col: (data[0] if data else []) for col, data in zip(cols, columns)}
+        return values.get(index.date_col, []), values.get(index.number_col, [])
+
+    def _fetch_rows_sync(self, index: SheetIndex, row_numbers: list[int]) -> dict[int, Question]:
+        """Return the given sheet rows, reading uncached ones in one batchGet."""
+        missing = sorted({r for r in row_numbers if r not in index.rows})
+
+        if missing:
+            fetched = self._batch_get([self.layout.cells(r, r) for r in missing])
+            for row_number, data in zip(missing, fetched):
+                index.rows[row_number] = index.columns.parse(data[0] if data else [])
+
+        return {r: index.rows[r] for r in row_numbers if r in index.rows}
 
+    # Blocking, must be run in thread
+    def _lookup_sync(self, keys: list[str], by: str) -> dict[str, Question]:
+        """Look `keys` up in the index's `by_date`/`by_number` and read the
+        rows, answering from the last full snapshot if Sheets is down.
+
+        Rows inserted or deleted above the data shift everything below them,
+        so each row read is checked against its key; on a mismatch the index
+        is rebuilt once before giving up on it.
+        """
+        key_field = _KEY_FIELDS[by]
+        try:
+            for _ in range(2):
+                index = self._get_index_sync()
+                table = getattr(index, by)
+                wanted = {key: table[key] for key in keys if key in table}
+                rows = self._fetch_rows_sync(index, list(wanted.values()))
+                found = {key: rows[r] for key, r in wanted.items() if r in rows}
+                if all(getattr(q, key_field) == key for key, q in found.items()):
+                    return found
+
+                logger.warning("Sheet rows moved since the index was read; rebuilding it.")
+                with self._index_lock:
+                    if self._index is index:
+                        self._index = None
+            raise LookupError(f"sheet rows keep moving under the {by} index")
         except Exception as e:
-            logger.error(f"Sheet fetch error: {e}")
-            return None
+            snapshot = self._fall_back(self._snapshot, e, "question bank snapshot")
+            table = getattr(snapshot, by)
+            return {key: table[key] for key in keys if key in table}
+
+    # Blocking, must be run in thread
+    def _fetch_date_sync(self, question_date: date) -> Question | None:
+        target_date = question_date.strftime("%Y-%m-%d")
+        question = self._lookup_sync([target_date], "by_date").get(target_date)
+
+        if question is not None:
+            logger.info(f"Found question #{question.number or '?'} for {target_date}")
+            return question
+
+        logger.warning(f"No question found for {target_date}")
+        return None
+
+    # Blocking, must be run in thread
+    def _fetch_dates_sync(self, dates: list[date]) -> dict[date, Question]:
+        keys = {d: d.strftime("%Y-%m-%d") for d in dates}
+        found = self._lookup_sync(list(keys.values()), "by_date")
+        return {d: found[key] for d, key in keys.items() if key in found}
+
+    # Blocking, must be run in thread
+    def _fetch_number_sync(self, number: str) -> Question | None:
+        return self._lookup_sync([number], "by_number").get(number)
 
     # Backwards-compatibility for existing tests/callers.
-    def _fetch_today_sync(self) -> dict | None:
+    def _fetch_today_sync(self) -> Question | None:
         return self._fetch_date_sync(datetime.now(pytz.utc).date())
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+import discord
+
+from utils.levels import LevelTable
+
+logger = logging.getLogger("bot")
+
+
+class LevelRoleReconciler:
+    """Keeps members' level roles in line with their XP.
+
+    Each member is brought to its target role set with at most one
+    `member.edit(roles=...)` call, using a cached name -> role map per guild.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._role_maps: dict[int, tuple[LevelTable, dict[str, discord.Role]]] = {}
+        self._sync_lock = asyncio.Lock()
+
+    @property
+    def levels(self) -> LevelTable:
+        return self.bot.level_table
+
+    @property
+    def syncing(self) -> bool:
+        return self._sync_lock.locked()
+
+    def role_map(self, guild: discord.Guild) -> dict[str, discord.Role]:
+        """Level role name -> role for `guild`, built once until invalidated."""
+
+        levels = self.levels
+        cached = self._role_maps.get(guild.id)
+
+        # a rebuilt level table (/reload-config) may manage different roles
+        if cached is None or cached[0] is not levels:
+            roles = {r.name: r for r in guild.roles if r.name in levels.managed_roles}
+            cached = self._role_maps[guild.id] = (levels, roles)
+
+        return cached[1]
+
+    def invalidate(self, guild_id: int | None = None):
+        """Forget cached role maps, e.g. after roles or config change."""
+
+        if guild_id is None:
+            self._role_maps.clear()
+        else:
+            self._role_maps.pop(guild_id, None)
+
+    def target_roles(self, member: discord.Member, xp: int) -> list[discord.Role] | None:
+        """Full role list `member` should have for `xp`, None if already correct."""
+
+        roles = self.role_map(member.guild)
+        managed = self.levels.managed_roles
+
+        current = [r for r in member.roles if not r.is_default()]
+        target = [r for r in current if r.name not in managed]
+        target += [roles[name] for name in self.levels.roles_for(xp) if name in roles]
+
+        if {r.id for r in target} == {r.id for r in current}:
+            return None
+
+        return target
+
+    async def reconcile(
+        self, member: discord.Member, xp: int, *, reason: str | None = None
+    ) -> bool:
+        """Apply the level role diff for `member` in one edit.
+
+        Returns:
+            bool: Whether an edit was made
+        """
+
+        target = self.target_roles(member, xp)
+        if target is None:
+            return False
+
+        await member.edit(roles=target, reason=reason or "Level roles update")
+        return True
+
+    async def resync_guild(
+        self, guild: discord.Guild, *, delay: float = 1.0
+    ) -> tuple[int, int, int]:
+        """Re-sync the level roles of every member of `guild`.
+
+        Edits are paced by `delay` seconds on top of discord.py's own rate
+        limit handling, so a full sync doesn't starve other requests.
+
+        Returns:
+            tuple[int, int, int]: `(checked, edited, failed)` member counts
+        """
+
+        async with self._sync_lock:
+            self.invalidate(guild.id)
+
+            if not guild.chunked:
+                await guild.chunk()
+
+            members = [m for m in guild.members if not m.bot]
+            totals = await self.bot.xp_service.get_xp_many([m.id for m in members])
+
+            edited = failed = 0
+            for member in members:
+                try:
+                    changed = await self.reconcile(
+                        member, totals.get(member.id, 0), reason="Level roles sync"
+                    )
+                except discord.HTTPException:
+                    logger.warning(f"Level role sync failed for {member.id}", exc_info=True)
+                    failed += 1
+                    continue
+
+                if changed:
+                    edited += 1
+                    await asyncio.sleep(delay)
+
+        logger.info(
+            f"Level role sync for {guild.id}: {len(members)} checked, "
+            f"{edited} edited, {failed} failed."
+        )
+        return len(members), edited, failed
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+import discord
+
+from utils.cache import CacheNamespace
+
+logger = logging.getLogger("bot")
+
+
+class NameResolver:
+    """Resolves user IDs to display names with as few REST calls as possible.
+
+    Order of lookups: guild member cache, the name cache, one gateway member
+    query for everything still missing, then bounded concurrent
+    `fetch_user` calls for users that have left the guild. Fetched and
+    deleted users are remembered in `cache`.
+    """
+
+    def __init__(self, bot, cache: CacheNamespace, *, concurrency: int = 5):
+        self.bot = bot
+        self.cache = cache
+        self._fetch_limit = asyncio.Semaphore(concurrency)
+
+    async def resolve_many(
+        self, guild: discord.Guild | None, user_ids: list[int]
+    ) -> dict[int, str]:
+        names: dict[int, str] = {}
+        missing: list[int] = []
+
+        for user_id in user_ids:
+            member = guild.get_member(user_id) if guild else None
+            if member:
+                names[user_id] = member.display_name
+                continue
+
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                names[user_id] = cached
+            else:
+                missing.append(user_id)
+
+        if missing and guild:
+            for member in await self._query_members(guild, missing):
+                names[member.id] = member.display_name
+
+            missing = [uid for uid in missing if uid not in names]
+
+        if missing:
+            fetched = await asyncio.gather(*(self._fetch_name(uid) for uid in missing))
+            names.update(zip(missing, fetched))
+
+        return names
+
+    async def _query_members(
+        self, guild: discord.Guild, user_ids: list[int]
+    ) -> list[discord.Member]:
+        members: list[discord.Member] = []
+
+        # the gateway accepts at most 100 IDs per request
+        for i in range(0, len(user_ids), 100):
+            chunk = user_ids[i : i + 100]
+            try:
+                members += await guild.query_members(
+                    user_ids=chunk, limit=len(chunk), cache=True
+                )
+            except (asyncio.TimeoutError, discord.ClientException):
+                logger.debug("Member query failed; falling back to fetch_user", exc_info=True)
+                break
+
+        return members
+
+    async def _fetch_name(self, user_id: int) -> str:
+        async with self._fetch_limit:
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.NotFound:
+                name = f"Deleted User ({user_id})"
+            except discord.HTTPException:
+                # transient failure, don't remember it
+                return f"Unknown User ({user_id})"
+            else:
+                name = user.name
+
+        self.cache.set(user_id, name)
+        return name
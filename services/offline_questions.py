@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone
+
+from services.gsheets_service import QuestionSnapshot, SheetUnavailableError
+from utils.questions import Question, QuestionColumns
+
+logger = logging.getLogger("bot")
+
+# Bytes of the file SQLite maps into memory instead of read() calls.
+MMAP_SIZE = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE questions (
+    row INTEGER PRIMARY KEY,
+    number TEXT NOT NULL,
+    date TEXT NOT NULL,
+    cells TEXT NOT NULL
+);
+CREATE INDEX questions_date_idx ON questions (date, row);
+CREATE INDEX questions_number_idx ON questions (number, row);
+"""
+
+
+def export_snapshot(snapshot: QuestionSnapshot, path: str) -> int:
+    """Write `snapshot` to an offline question bank file at `path`.
+
+    The file is built next to `path` and moved into place, so a running
+    `OfflineQuestionSource` never sees a half-written bank.
+
+    Returns:
+        int: Number of rows written
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    os.close(fd)
+
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(_SCHEMA)
+            conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("headers", json.dumps(snapshot.headers, ensure_ascii=False)),
+                    ("exported_at", datetime.now(timezone.utc).isoformat()),
+                ],
+            )
+            conn.executemany(
+                "INSERT INTO questions (row, number, date, cells) VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        i,
+                        question.number,
+                        question.date,
+                        json.dumps(
+                            snapshot.columns.to_row(question, len(snapshot.headers)),
+                            ensure_ascii=False,
+                        ),
+                    )
+                    for i, question in enumerate(snapshot.rows)
+                ),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    return len(snapshot.rows)
+
+
+class OfflineQuestionSource:
+    """Question bank read from a file written by `export_snapshot`.
+
+    Offers the same lookups as `GSheetService`, so it can replace it when
+    the bot has to run without Google. The file is opened read-only and
+    memory-mapped, and dates and numbers are found through SQLite indexes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._columns: QuestionColumns | None = None
+        self._headers: list[str] = []
+        self._lock = threading.Lock()
+
+    async def fetch_question_for_date(self, question_date: date) -> Question | None:
+        return await asyncio.to_thread(self._fetch_date_sync, question_date)
+
+    async def fetch_questions_for_dates(
+        self, dates: list[date]
+    ) -> dict[date, Question]:
+        return await asyncio.to_thread(self._fetch_dates_sync, dates)
+
+    async def fetch_question_by_number(self, number: str | int) -> Question | None:
+        return await asyncio.to_thread(self._fetch_number_sync, str(number).strip())
+
+    async def get_snapshot(self, force: bool = False) -> QuestionSnapshot:
+        """Return the whole bank; `force` reopens the file first."""
+        if force:
+            self.invalidate()
+        return await asyncio.to_thread(self._get_snapshot_sync)
+
+    def invalidate(self):
+        """Close the file so the next lookup opens the current export."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._columns = None
+
+    # Blocking, must be run in thread
+    def _open(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if not os.path.exists(self.path):
+                raise SheetUnavailableError(f"No offline question bank at {self.path!r}")
+
+            started = time.perf_counter()
+            conn = sqlite3.connect(
+                f"file:{os.path.abspath(self.path)}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+            conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+            headers = json.loads(
+                conn.execute("SELECT value FROM meta WHERE key = 'headers'").fetchone()[0]
+            )
+
+            self._conn = conn
+            self._headers = headers
+            self._columns = QuestionColumns.from_headers(headers)
+            logger.info(
+                f"Opened offline question bank {self.path} in "
+                f"{(time.perf_counter() - started) * 1000:.1f} ms."
+            )
+        return self._conn
+
+    def _query(
+        self, sql: str, params: tuple = ()
+    ) -> tuple[list[str], QuestionColumns, list[tuple]]:
+        """Rows for `sql`, with the headers and columns of the file they were
+        read from; `invalidate` may reset both as soon as the lock is free."""
+        with self._lock:
+            rows = self._open().execute(sql, params).fetchall()
+            return self._headers, self._columns, rows
+
+    def _first(self, column: str, value: str) -> Question | None:
+        # first row wins on duplicates, like the sheet lookups
+        _, columns, rows = self._query(
+            f"SELECT cells FROM questions WHERE {column} = ? ORDER BY row LIMIT 1", (value,)
+        )
+        return columns.parse(json.loads(rows[0][0])) if rows else None
+
+    def _fetch_date_sync(self, question_date: date) -> Question | None:
+        return self._first("date", question_date.strftime("%Y-%m-%d"))
+
+    def _fetch_dates_sync(self, dates: list[date]) -> dict[date, Question]:
+        keys = {d.strftime("%Y-%m-%d"): d for d in dates}
+        if not keys:
+            return {}
+
+        _, columns, rows = self._query(
+            f"SELECT date, cells FROM questions WHERE date IN ({','.join('?' * len(keys))}) "
+            "ORDER BY row",
+            tuple(keys),
+        )
+
+        found: dict[date, Question] = {}
+        for key, cells in rows:
+            found.setdefault(keys[key], columns.parse(json.loads(cells)))
+        return found
+
+    def _fetch_number_sync(self, number: str) -> Question | None:
+        return self._first("number", number)
+
+    def _get_snapshot_sync(self) -> QuestionSnapshot:
+        headers, _, rows = self._query("SELECT cells FROM questions ORDER BY row")
+        return QuestionSnapshot.from_values(
+            [headers] + [json.loads(cells) for (cells,) in rows]
+        )
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+from datetime import date, datetime
+
+import asyncpg
+
+from services.gsheets_service import GSheetService
+from utils.questions import Question
+
+logger = logging.getLogger("bot")
+
+
+_UPSERT_QUESTIONS_SQL = """
+INSERT INTO questions (
+    number, date, genre, difficulty, curator, data, content_hash, position, synced_at
+)
+SELECT
+    q.number, q.date, q.genre, q.difficulty, q.curator, q.data::JSONB, q.content_hash,
+    q.position, now()
+FROM UNNEST(
+    $1::TEXT[], $2::DATE[], $3::TEXT[], $4::TEXT[], $5::TEXT[], $6::TEXT[], $7::TEXT[],
+    $8::INTEGER[]
+) AS q(number, date, genre, difficulty, curator, data, content_hash, position)
+ON CONFLICT (number) DO UPDATE SET
+    date = EXCLUDED.date,
+    genre = EXCLUDED.genre,
+    difficulty = EXCLUDED.difficulty,
+    curator = EXCLUDED.curator,
+    data = EXCLUDED.data,
+    content_hash = EXCLUDED.content_hash,
+    position = EXCLUDED.position,
+    synced_at = EXCLUDED.synced_at
+"""
+
+
+def _parse_date(value: str) -> date | None:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _content_hash(row: dict[str, str]) -> str:
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """Question bank stored in Postgres and synced from Google Sheets.
+
+    Posting reads from the `questions` table so it doesn't wait on Google;
+    `sync()` imports the sheet, writing only rows whose content changed.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, sheet_service: GSheetService):
+        self.pool = pool
+        self.sheet_service = sheet_service
+
+    async def fetch_question_for_date(self, question_date: date) -> Question | None:
+        """Fetch the question for a date, falling back to the sheet if it
+        hasn't been synced yet."""
+
+        async with self.pool.acquire() as conn:
+            data = await conn.fetchval(
+                # several rows may share a date; the first in the sheet wins,
+                # as in the sheet and offline lookups
+                "SELECT data FROM questions WHERE date = $1 ORDER BY position LIMIT 1",
+                question_date,
+            )
+
+        if data is not None:
+            return Question.from_dict(json.loads(data))
+
+        logger.info(f"No synced question for {question_date}; asking the sheet.")
+        return await self.sheet_service.fetch_question_for_date(question_date)
+
+    async def fetch_questions_for_dates(
+        self, dates: list[date]
+    ) -> dict[date, Question]:
+        """Fetch several days at once; days missing from Postgres are looked
+        up in the sheet and left out if it doesn't have them either."""
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT DISTINCT ON (date) date, data
+                FROM questions
+                WHERE date = ANY($1::DATE[])
+                ORDER BY date, position
+                """,
+                dates,
+            )
+
+        questions = {r["date"]: Question.from_dict(json.loads(r["data"])) for r in rows}
+
+        missing = [d for d in dates if d not in questions]
+        if missing:
+            questions.update(await self.sheet_service.fetch_questions_for_dates(missing))
+
+        return questions
+
+    async def sync(self, force: bool = False) -> tuple[int, int, int]:
+        """Import the sheet into `questions` with a diff-and-upsert.
+
+        The snapshot only re-reads rows appended since the last read unless
+        `force`d or due a full refresh, so edits can lag behind appends.
+
+        Returns:
+            tuple[int, int, int]: `(upserted, deleted, unchanged)` row counts
+        """
+
+        snapshot = await self.sheet_service.get_snapshot(force=force)
+
+        questions: dict[str, Question] = {}
+        positions: dict[str, int] = {}
+        for position, question in enumerate(snapshot.rows):
+            if question.number and question.number not in questions:
+                questions[question.number] = question
+                positions[question.number] = position
+
+        if not questions:
+            # never wipe the table because of an empty or broken sheet
+            logger.warning("Question sync skipped: sheet has no numbered rows.")
+            return 0, 0, 0
+
+        rows = {number: q.to_dict() for number, q in questions.items()}
+        hashes = {number: _content_hash(row) for number, row in rows.items()}
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                existing = {
+                    r["number"]: (r["content_hash"], r["position"])
+                    for r in await conn.fetch(
+                        "SELECT number, content_hash, position FROM questions"
+                    )
+                }
+
+                # a row that only moved is rewritten too, for its position
+                changed = [
+                    n for n, h in hashes.items() if existing.get(n) != (h, positions[n])
+                ]
+                removed = [n for n in existing if n not in rows]
+
+                if changed:
+                    await conn.execute(
+                        _UPSERT_QUESTIONS_SQL,
+                        changed,
+                        [_parse_date(questions[n].date) for n in changed],
+                        [questions[n].genre or None for n in changed],
+                        [questions[n].difficulty.title() or None for n in changed],
+                        [questions[n].curator or None for n in changed],
+                        [json.dumps(rows[n], ensure_ascii=False) for n in changed],
+                        [hashes[n] for n in changed],
+                        [positions[n] for n in changed],
+                    )
+
+                if removed:
+                    await conn.execute(
+                        "DELETE FROM questions WHERE number = ANY($1::TEXT[])", removed
+                    )
+
+        unchanged = len(rows) - len(changed)
+        logger.info(
+            f"Question sync: {len(changed)} upserted, {len(removed)} deleted, {unchanged} unchanged."
+        )
+        return len(changed), len(removed), unchanged
@@ -0,0 +1,186 @@
+import hashlib
+from collections import defaultdict
+from dataclasses import dataclass
+
+from services.question_search import tokenize
+from utils.questions import Question
+
+# Statements are compared as sets of overlapping word triples.
+SHINGLE_SIZE = 3
+# One reworded word in a 25-word statement changes three shingles, which
+# is already ~0.77 Jaccard, so 0.7 still means "the same problem".
+DUPLICATE_THRESHOLD = 0.7
+# 16 bands of 4 rows: a pair at 0.7 Jaccard shares a band with chance
+# 1 - (1 - 0.7**4)**16 ~ 99%, a pair at 0.3 only ~12%.
+NUM_PERM = 64
+BANDS = 16
+
+# added per bin skipped while densifying; above any real bin value (< 2**58)
+_ROTATION_OFFSET = 1 << 58
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> frozenset[int]:
+    """64-bit hashes of the word `size`-grams of `text`."""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        grams = [" ".join(tokens)] if tokens else []
+    else:
+        grams = [" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)]
+
+    return frozenset(
+        int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big")
+        for g in grams
+    )
+
+
+def jaccard(a: frozenset[int], b: frozenset[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass(frozen=True, slots=True)
+class DuplicateCluster:
+    """Questions whose statements are near-identical"""
+
+    numbers: tuple[str, ...]
+    # lowest similarity among the pairs that joined the cluster
+    similarity: float
+
+
+class DuplicateDetector:
+    """Finds near-duplicate problem statements with MinHash and LSH.
+
+    Each statement gets a `NUM_PERM`-slot MinHash signature. Signatures are
+    cut into `BANDS` bands and only questions sharing a band bucket are
+    compared, so the cost grows with the number of questions rather than
+    the number of pairs. Candidates are confirmed with the exact Jaccard
+    similarity of their shingles. Signatures are kept per question and
+    reused while the statement is unchanged.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float = DUPLICATE_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # number -> (statement, shingles, LSH bucket keys)
+        self._cache: dict[str, tuple[str, frozenset[int], tuple[int, ...]]] = {}
+
+    def signature(self, shingle_set: frozenset[int]) -> tuple[int, ...]:
+        """One-permutation MinHash: each shingle hash lands in one of
+        `num_perm` bins and every bin keeps its minimum, so a signature
+        costs one pass over the shingles instead of one per slot. Empty
+        bins borrow from the next filled bin to the right (rotation
+        densification) so short statements still fill every slot."""
+        if not shingle_set:
+            return ()
+
+        k = self.num_perm
+        bins: list[int | None] = [None] * k
+        for h in shingle_set:
+            slot, value = h % k, h // k
+            current = bins[slot]
+            if current is None or value < current:
+                bins[slot] = value
+
+        signature = []
+        for slot in range(k):
+            distance = 0
+            while bins[(slot + distance) % k] is None:
+                distance += 1
+            signature.append(bins[(slot + distance) % k] + distance * _ROTATION_OFFSET)
+        return tuple(signature)
+
+    def band_keys(self, signature: tuple[int, ...]) -> tuple[int, ...]:
+        """One LSH bucket key per band; equal keys make a candidate pair."""
+        rows = self.rows
+        return tuple(
+            hash((band, signature[band * rows : (band + 1) * rows]))
+            for band in range(self.bands if signature else 0)
+        )
+
+    def _prepare(self, question: Question) -> tuple[frozenset[int], tuple[int, ...]]:
+        cached = self._cache.get(question.number)
+        if cached is not None and cached[0] == question.statement:
+            return cached[1], cached[2]
+
+        shingle_set = shingles(question.statement)
+        keys = self.band_keys(self.signature(shingle_set))
+        self._cache[question.number] = (question.statement, shingle_set, keys)
+        return shingle_set, keys
+
+    def find(self, questions: list[Question]) -> list[DuplicateCluster]:
+        """Group near-duplicate statements, largest clusters first."""
+        docs: dict[str, tuple[frozenset[int], tuple[int, ...]]] = {}
+        for question in questions:
+            if question.number and question.statement and question.number not in docs:
+                docs[question.number] = self._prepare(question)
+
+        # forget questions that left the bank
+        for number in self._cache.keys() - docs.keys():
+            del self._cache[number]
+
+        buckets: dict[int, list[str]] = defaultdict(list)
+        for number, (_, keys) in docs.items():
+            for key in keys:
+                buckets[key].append(number)
+
+        parent: dict[str, str] = {}
+        worst: dict[str, float] = {}
+
+        def find_root(n: str) -> str:
+            while parent[n] != n:
+                parent[n] = parent[parent[n]]
+                n = parent[n]
+            return n
+
+        checked: set[tuple[str, str]] = set()
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1 :]:
+                    pair = (a, b) if a < b else (b, a)
+                    if pair in checked:
+                        continue
+                    checked.add(pair)
+
+                    similarity = jaccard(docs[a][0], docs[b][0])
+                    if similarity < self.threshold:
+                        continue
+
+                    parent.setdefault(a, a)
+                    parent.setdefault(b, b)
+                    root_a, root_b = find_root(a), find_root(b)
+                    low = min(similarity, worst.get(root_a, 1.0), worst.get(root_b, 1.0))
+                    if root_a != root_b:
+                        parent[root_b] = root_a
+                    worst[root_a] = low
+
+        groups: dict[str, list[str]] = defaultdict(list)
+        for number in parent:
+            groups[find_root(number)].append(number)
+
+        clusters = [
+            DuplicateCluster(
+                numbers=tuple(sorted(members, key=_number_key)),
+                similarity=worst.get(root, 1.0),
+            )
+            for root, members in groups.items()
+        ]
+        clusters.sort(key=lambda c: (-len(c.numbers), _number_key(c.numbers[0])))
+        return clusters
+
+
+def _number_key(number: str) -> tuple[int, int | str]:
+    return (0, int(number)) if number.isdigit() else (1, number)
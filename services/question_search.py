@@ -0,0 +1,176 @@
+import bisect
+import math
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from utils.questions import Question
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the "
+    "this to was what when which with".split()
+)
+
+# Metadata matches count for more than a word somewhere in the statement.
+STATEMENT_WEIGHT = 1
+METADATA_WEIGHT = 3
+# Query words at least this long also match longer words they start
+# ("therm" finds "thermal" and "thermodynamics").
+MIN_PREFIX = 3
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN_RE.findall(text.casefold()) if t not in _STOPWORDS]
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    question: Question
+    score: float
+
+
+class QuestionSearchIndex:
+    """In-memory inverted index over the question bank.
+
+    Documents are keyed by question number. `update()` diffs a fresh
+    snapshot against what is indexed, so a refresh only re-tokenizes
+    questions that were added or edited.
+    """
+
+    def __init__(self):
+        self._docs: dict[str, Question] = {}
+        self._lengths: dict[str, float] = {}
+        # token -> {number: weighted term frequency}
+        self._postings: dict[str, dict[str, int]] = defaultdict(dict)
+        self._vocabulary: list[str] = []
+        self._vocabulary_dirty = False
+        # (field, casefolded value) -> numbers, for exact filters
+        self._facets: dict[tuple[str, str], set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def update(self, questions: list[Question]) -> tuple[int, int]:
+        """Sync the index with `questions`; first row wins on duplicate numbers.
+
+        Returns:
+            tuple[int, int]: `(indexed, removed)` document counts
+        """
+        current: dict[str, Question] = {}
+        for question in questions:
+            if question.number:
+                current.setdefault(question.number, question)
+
+        removed = [n for n, q in self._docs.items() if current.get(n) != q]
+        for number in removed:
+            self._remove(number)
+
+        added = [q for n, q in current.items() if n not in self._docs]
+        for question in added:
+            self._add(question)
+
+        gone = sum(1 for n in removed if n not in current)
+        return len(added), gone
+
+    def search(
+        self,
+        query: str = "",
+        *,
+        genre: str | None = None,
+        difficulty: str | None = None,
+        curator: str | None = None,
+        limit: int | None = None,
+    ) -> list[SearchHit]:
+        """Rank questions matching every filter by tf-idf against `query`.
+
+        With an empty query all filtered questions are returned, newest first.
+        """
+        candidates: set[str] | None = None
+        for field, value in (("genre", genre), ("difficulty", difficulty), ("curator", curator)):
+            if value:
+                matches = self._facets.get((field, value.strip().casefold()), set())
+                candidates = matches if candidates is None else candidates & matches
+
+        tokens = tokenize(query)
+        if not tokens:
+            numbers = self._docs if candidates is None else candidates
+            hits = [SearchHit(self._docs[n], 0.0) for n in numbers]
+            hits.sort(key=lambda h: h.question.date, reverse=True)
+            return hits[:limit]
+
+        total = len(self._docs)
+        scores: Counter[str] = Counter()
+
+        for token in tokens:
+            for term in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + total / len(postings))
+                # exact words outrank prefix matches
+                boost = 1.0 if term == token else 0.5
+                for number, tf in postings.items():
+                    if candidates is None or number in candidates:
+                        scores[number] += tf * idf * boost
+
+        hits = [
+            SearchHit(self._docs[n], score / self._lengths[n])
+            for n, score in scores.items()
+        ]
+        hits.sort(key=lambda h: (-h.score, h.question.date))
+        return hits[:limit]
+
+    def _expand(self, token: str) -> list[str]:
+        terms = [token] if token in self._postings else []
+        if len(token) < MIN_PREFIX:
+            return terms
+
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+
+        i = bisect.bisect_right(self._vocabulary, token)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(token):
+            terms.append(self._vocabulary[i])
+            i += 1
+        return terms
+
+    def _terms(self, question: Question) -> Counter[str]:
+        terms: Counter[str] = Counter()
+        for token in tokenize(question.statement):
+            terms[token] += STATEMENT_WEIGHT
+        for text in (question.genre, question.difficulty, question.curator, question.number):
+            for token in tokenize(text):
+                terms[token] += METADATA_WEIGHT
+        return terms
+
+    def _add(self, question: Question):
+        number = question.number
+        terms = self._terms(question)
+
+        for term, tf in terms.items():
+            if term not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[term][number] = tf
+
+        self._docs[number] = question
+        self._lengths[number] = math.sqrt(sum(terms.values())) or 1.0
+        for field in ("genre", "difficulty", "curator"):
+            value = getattr(question, field).casefold()
+            if value:
+                self._facets[(field, value)].add(number)
+
+    def _remove(self, number: str):
+        question = self._docs.pop(number)
+        self._lengths.pop(number)
+
+        for term in self._terms(question):
+            postings = self._postings[term]
+            postings.pop(number, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+
+        for field in ("genre", "difficulty", "curator"):
+            value = getattr(question, field).casefold()
+            if value:
+                self._facets[(field, value)].discard(number)
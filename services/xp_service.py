@@ -1,65 +1,593 @@
+import asyncio
 import logging
+
 import asyncpg
 
+from utils.cache import CacheNamespace
+
 logger = logging.getLogger("bot")
 
 
+# Applies a batch of deltas in two set-based statements. Missing rows are
+# created at 0 first (only for positive deltas, a removal from nothing is a
+# no-op), then every delta is folded in with the clamp-at-zero rule.
+_ENSURE_USERS_SQL = """
+INSERT INTO users (user_id, xp)
+SELECT d.user_id, 0
+FROM UNNEST($1::BIGINT[], $2::INTEGER[]) AS d(user_id, delta)
+WHERE d.delta > 0
+ON CONFLICT (user_id) DO NOTHING
+"""
+
+_APPLY_DELTAS_SQL = """
+UPDATE users AS u
+SET xp = GREATEST(0, u.xp + d.delta)
+FROM UNNEST($1::BIGINT[], $2::INTEGER[]) AS d(user_id, delta)
+WHERE u.user_id = d.user_id
+RETURNING u.user_id, u.xp
+"""
+
+# Single round trip upsert that also reports the previous total. Removing XP
+# from a user without a row does not create one. FOR UPDATE makes concurrent
+# calls for the same user queue up and each read the total the previous one
+# left; if the row is created concurrently (no `old`, insert conflicts), the
+# delta is positive and unclamped, so the previous total is new - $2.
+_ADJUST_XP_SQL = """
+WITH old AS (
+    SELECT xp FROM users WHERE user_id = $1 FOR UPDATE
+), upsert AS (
+    INSERT INTO users (user_id, xp)
+    SELECT $1, GREATEST(0, $2::INTEGER)
+    WHERE $2 > 0 OR EXISTS (SELECT 1 FROM old)
+    ON CONFLICT (user_id) DO UPDATE SET xp = GREATEST(0, users.xp + $2)
+    RETURNING xp
+)
+SELECT
+    COALESCE((SELECT xp FROM old), (SELECT xp - $2 FROM upsert), 0) AS old_xp,
+    COALESCE((SELECT xp FROM upsert), (SELECT xp FROM old), 0) AS new_xp
+"""
+
+_XP_MANY_SQL = """
+SELECT user_id, xp
+FROM users
+WHERE user_id = ANY($1::BIGINT[])
+"""
+
+# Ledger mode: XP changes are appended to xp_events and folded into users.xp
+# by compact(). A user's current total is users.xp plus every event past the
+# compaction watermark.
+_LEDGER_XP_SQL = """
+SELECT GREATEST(
+    0,
+    COALESCE((SELECT xp FROM users WHERE user_id = $1), 0)
+    + COALESCE((
+        SELECT SUM(delta)
+        FROM xp_events
+        WHERE user_id = $1
+          AND id > (SELECT last_event_id FROM xp_compaction)
+    ), 0)
+)::INTEGER AS xp
+"""
+
+# Appends clamp against the user's current total, so two appends for one
+# user must not read it at the same time or both removals pass the clamp.
+# The lock is its own statement so the append's snapshot, taken after it,
+# sees what the previous holder committed; sorted so batches can't deadlock.
+_LEDGER_LOCK_SQL = """
+SELECT pg_advisory_xact_lock(d.user_id)
+FROM (
+    SELECT user_id FROM UNNEST($1::BIGINT[]) AS u(user_id) ORDER BY user_id
+) AS d
+"""
+
+# Appends one clamped event per user and reports totals, in one statement.
+# Run after _LEDGER_LOCK_SQL in the same transaction.
+_LEDGER_APPEND_SQL = """
+WITH d AS (
+    SELECT * FROM UNNEST($1::BIGINT[], $2::INTEGER[]) AS d(user_id, delta)
+), cur AS (
+    SELECT
+        d.user_id,
+        d.delta,
+        GREATEST(0, COALESCE(u.xp, 0) + COALESCE(e.pending, 0))::INTEGER AS xp
+    FROM d
+    LEFT JOIN users AS u ON u.user_id = d.user_id
+    LEFT JOIN LATERAL (
+        SELECT SUM(x.delta) AS pending
+        FROM xp_events AS x
+        WHERE x.user_id = d.user_id
+          AND x.id > (SELECT last_event_id FROM xp_compaction)
+    ) AS e ON TRUE
+), ins AS (
+    INSERT INTO xp_events (user_id, delta)
+    SELECT user_id, GREATEST(-xp, delta)
+    FROM cur
+    WHERE GREATEST(-xp, delta) <> 0
+)
+SELECT user_id, xp AS old_xp, xp + GREATEST(-xp, delta) AS new_xp
+FROM cur
+"""
+
+_LEDGER_XP_MANY_SQL = """
+SELECT
+    d.user_id,
+    GREATEST(0, COALESCE(u.xp, 0) + COALESCE(e.pending, 0))::INTEGER AS xp
+FROM UNNEST($1::BIGINT[]) AS d(user_id)
+LEFT JOIN users AS u ON u.user_id = d.user_id
+LEFT JOIN LATERAL (
+    SELECT SUM(x.delta) AS pending
+    FROM xp_events AS x
+    WHERE x.user_id = d.user_id
+      AND x.id > (SELECT last_event_id FROM xp_compaction)
+) AS e ON TRUE
+"""
+
+_LEDGER_PENDING_SQL = """
+SELECT user_id, SUM(delta)::INTEGER AS delta, MAX(id) AS last_id
+FROM xp_events
+WHERE id > (SELECT last_event_id FROM xp_compaction)
+GROUP BY user_id
+"""
+
+# Leaderboard order is (xp DESC, user_id) to match users_xp_rank_idx; ties are
+# broken by user_id so keyset cursors are stable.
+_LEADERBOARD_FIRST_PAGE_SQL = """
+SELECT user_id, xp
+FROM users
+ORDER BY xp DESC, user_id
+LIMIT $1
+"""
+
+_LEADERBOARD_NEXT_PAGE_SQL = """
+SELECT user_id, xp
+FROM users
+WHERE xp <= $1 AND (xp < $1 OR user_id > $2)
+ORDER BY xp DESC, user_id
+LIMIT $3
+"""
+
+_RANK_SQL = """
+SELECT
+    u.xp,
+    1 + (
+        SELECT COUNT(*)
+        FROM users AS o
+        WHERE o.xp >= u.xp AND (o.xp > u.xp OR o.user_id < u.user_id)
+    ) AS rank
+FROM users AS u
+WHERE u.user_id = $1
+"""
+
+
 class XPService:
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        write_behind: bool = False,
+        flush_interval: float = 2.0,
+        flush_threshold: int = 500,
+        cache: CacheNamespace | None = None,
+        ledger: bool = False,
+        compact_interval: float = 30.0,
+    ):
         self.pool = pool
 
+        # Optional read-through cache of stored XP per user. Every mutation
+        # below writes the new total through, so it never serves stale values.
+        self.cache = cache
+
+        # Write-behind mode: grants are summed per user in memory and written
+        # in one batch every `flush_interval` seconds, or as soon as
+        # `flush_threshold` distinct users are pending. Removals are written
+        # straight away so each is clamped against the real total.
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+
+        self._pending: dict[int, int] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+        # Ledger mode: writes only append to xp_events, so grants never wait
+        # on a users row lock. users.xp (and with it the leaderboard and
+        # ranks) catches up every `compact_interval` seconds.
+        self.ledger = ledger
+        self.compact_interval = compact_interval
+
+        self._compact_lock = asyncio.Lock()
+        self._compact_task: asyncio.Task | None = None
+
+    def start(self):
+        """Start the background flusher and compactor for the enabled modes."""
+
+        if self.write_behind and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        if self.ledger and self._compact_task is None:
+            self._compact_task = asyncio.create_task(self._compact_loop())
+
+    async def close(self):
+        """Stop background jobs and write out anything still pending."""
+
+        for task in (self._flush_task, self._compact_task):
+            if task is None:
+                continue
+
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+        self._flush_task = self._compact_task = None
+
+        await self.flush()
+        await self.compact()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("XP write-behind flush failed; will retry.")
+
+    async def _compact_loop(self):
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            try:
+                await self.compact()
+            except Exception:
+                logger.exception("XP ledger compaction failed; will retry.")
+
     async def get_xp(self, user_id: int) -> int:
-        query = "SELECT xp FROM users WHERE user_id = $1"
+        if self.cache is not None:
+            current = await self.cache.get_or_fetch(
+                user_id, lambda: self._fetch_xp(user_id)
+            )
+        else:
+            current = await self._fetch_xp(user_id)
+
+        # Only grants are buffered, so nothing pending can hit the clamp and
+        # this is what the row will hold once the buffer is written.
+        pending = self._pending.get(user_id)
+        if pending:
+            return current + pending
+
+        return current
+
+    async def _fetch_xp(self, user_id: int) -> int:
+        if self.ledger:
+            query = _LEDGER_XP_SQL
+        else:
+            query = "SELECT xp FROM users WHERE user_id = $1"
 
         async with self.pool.acquire() as conn:
             row = await conn.fetchrow(query, user_id)
 
         return row["xp"] if row else 0
 
-    async def update_xp(self, user_id: int, delta: int):
-        """Add XP (positive/negative), clamp to minimum 0"""
+    async def get_xp_many(self, user_ids: list[int]) -> dict[int, int]:
+        """Current XP for many users in one query.
 
-        if delta == 0:
-            return
+        Users without a row are omitted, except in ledger mode, which returns
+        every user asked for.
+        """
+
+        query = _LEDGER_XP_MANY_SQL if self.ledger else _XP_MANY_SQL
 
         async with self.pool.acquire() as conn:
-            async with conn.transaction():
+            rows = await conn.fetch(query, user_ids)
 
-                # Lock row FOR UPDATE to avoid race conditions
-                row = await conn.fetchrow(
-                    "SELECT xp FROM users WHERE user_id = $1 FOR UPDATE", user_id
-                )
+        totals = {r["user_id"]: r["xp"] for r in rows}
+        for user_id in user_ids:
+            pending = self._pending.get(user_id)
+            if pending:
+                totals[user_id] = totals.get(user_id, 0) + pending
 
-                current = row["xp"] if row else 0
-                new_xp = max(0, current + delta)
-                delta = new_xp - current
-
-                if delta == 0:
-                    logger.info(f"No change for {user_id} (clamped).")
-                    return
-
-                await conn.execute(
-                    """
-                    INSERT INTO users (user_id, xp)
-                    VALUES ($1, $2)
-                    ON CONFLICT (user_id)
-                    DO UPDATE SET xp = EXCLUDED.xp
-                """,
-                    user_id,
-                    new_xp,
-                )
+        return totals
+
+    async def update_xp(self, user_id: int, delta: int) -> tuple[int, int]:
+        """Add XP (positive/negative), clamp to minimum 0
+
+        Buffered in write-behind mode, otherwise the same as `adjust_xp`.
+
+        Returns:
+            tuple[int, int]: The user's XP before and after the change
+        """
+
+        # A buffered sum is clamped once, so -20 then +5 on 10 XP would flush
+        # as 0 rather than 5; removals go to the database with anything
+        # already buffered for the user folded in first.
+        if self.write_behind and delta > 0:
+            old_xp = await self.get_xp(user_id)
+            self._pending[user_id] = self._pending.get(user_id, 0) + delta
+
+            if len(self._pending) >= self.flush_threshold:
+                await self.flush()
+            return old_xp, old_xp + delta
+
+        return await self.adjust_xp(user_id, delta)
+
+    async def adjust_xp(self, user_id: int, delta: int) -> tuple[int, int]:
+        """Apply a clamped delta in a single statement.
+
+        Returns:
+            tuple[int, int]: The user's XP before and after the change
+        """
+
+        # Fold in anything still buffered for this user so the returned
+        # totals match what will be stored. Buffered deltas are grants, so
+        # adding them first is the same as having written them already.
+        pending = self._pending.pop(user_id, 0)
+        delta += pending
+
+        if delta == 0:
+            current = await self.get_xp(user_id)
+            return current, current
+
+        committed = False
+        try:
+            async with self.pool.acquire() as conn:
+                if self.ledger:
+                    async with conn.transaction():
+                        (row,) = await self._append_events(conn, {user_id: delta})
+                else:
+                    row = await conn.fetchrow(_ADJUST_XP_SQL, user_id, delta)
+            committed = True
+        finally:
+            if not committed and pending:
+                # the buffered amount was never written; keep it for the flush
+                self._restore_pending({user_id: pending})
+
+        old_xp = max(0, row["old_xp"] + pending)
+        new_xp = row["new_xp"]
+
+        if self.cache is not None:
+            self.cache.set(user_id, new_xp)
+
+        if old_xp == new_xp:
+            logger.info(f"No change for {user_id} (clamped).")
+        else:
+            logger.info(f"Adjusted {new_xp - old_xp} XP for {user_id} (new: {new_xp}).")
+
+        return old_xp, new_xp
+
+    async def update_xp_many(self, deltas: dict[int, int]) -> dict[int, int]:
+        """Apply many deltas in one transaction with set-based SQL.
+
+        In write-behind mode grants are buffered as in `update_xp` and only
+        removals are written here.
+
+        Returns:
+            dict[int, int]: New total for every user in `deltas`
+        """
+
+        if not self.write_behind:
+            return await self._write_many(deltas)
+
+        grants = {uid: d for uid, d in deltas.items() if d > 0}
+        totals = await self._write_many(
+            {uid: d for uid, d in deltas.items() if uid not in grants}
+        )
+
+        if grants:
+            before = await self.get_xp_many(list(grants))
+            for user_id, delta in grants.items():
+                self._pending[user_id] = self._pending.get(user_id, 0) + delta
+                totals[user_id] = before.get(user_id, 0) + delta
+
+            if len(self._pending) >= self.flush_threshold:
+                await self.flush()
+
+        return totals
+
+    async def _write_many(self, deltas: dict[int, int]) -> dict[int, int]:
+        """Write `deltas` in one transaction, folding in buffered grants."""
+
+        batch = dict(deltas)
+        pending: dict[int, int] = {}
+        for user_id in batch:
+            if user_id in self._pending:
+                pending[user_id] = self._pending.pop(user_id)
+                batch[user_id] += pending[user_id]
+
+        batch = {uid: d for uid, d in batch.items() if d != 0}
+        totals: dict[int, int] = {}
+
+        if batch:
+            committed = False
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        totals = await self._apply_deltas(conn, batch)
+                committed = True
+            finally:
+                if not committed:
+                    # as in flush(): buffered amounts stay queued
+                    self._restore_pending(pending)
+
+            self._cache_totals(batch, totals)
+            logger.info(f"Adjusted XP for {len(batch)} users in one batch.")
+
+        return {
+            uid: totals.get(uid, 0) if uid in batch else await self.get_xp(uid)
+            for uid in deltas
+        }
+
+    async def flush(self) -> int:
+        """Write all buffered deltas in one transaction.
+
+        Returns:
+            int: Number of users written
+        """
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            batch = {uid: d for uid, d in batch.items() if d != 0}
+            if not batch:
+                return 0
+
+            committed = False
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        totals = await self._apply_deltas(conn, batch)
+                committed = True
+            finally:
+                if not committed:
+                    # Put the batch back so nothing is lost, also when the
+                    # flush is cancelled (e.g. by close()); newer deltas that
+                    # arrived meanwhile are merged on top.
+                    self._restore_pending(batch)
+
+            self._cache_totals(batch, totals)
+
+        logger.info(f"Flushed buffered XP for {len(batch)} users.")
+        return len(batch)
+
+    def _restore_pending(self, deltas: dict[int, int]):
+        """Merge deltas that were taken for a write which did not commit."""
+
+        for uid, d in deltas.items():
+            self._pending[uid] = self._pending.get(uid, 0) + d
+
+    async def _apply_deltas(
+        self, conn: asyncpg.Connection, deltas: dict[int, int]
+    ) -> dict[int, int]:
+        """Apply `deltas` set-based; must be called inside a transaction.
+
+        Returns:
+            dict[int, int]: New totals for every user that has a row
+        """
+
+        if self.ledger:
+            rows = await self._append_events(conn, deltas)
+            return {r["user_id"]: r["new_xp"] for r in rows}
+
+        return await self._apply_to_users(conn, deltas)
+
+    @staticmethod
+    async def _append_events(conn: asyncpg.Connection, deltas: dict[int, int]):
+        """Lock the users and append their clamped ledger events; must be
+        called inside a transaction.
+
+        Returns:
+            list: `(user_id, old_xp, new_xp)` rows
+        """
 
-        logger.info(f"Adjusted {delta} XP for {user_id} (new: {new_xp}).")
+        user_ids = list(deltas)
+
+        await conn.execute(_LEDGER_LOCK_SQL, user_ids)
+        return await conn.fetch(
+            _LEDGER_APPEND_SQL, user_ids, [deltas[uid] for uid in user_ids]
+        )
+
+    @staticmethod
+    async def _apply_to_users(
+        conn: asyncpg.Connection, deltas: dict[int, int]
+    ) -> dict[int, int]:
+        """Fold `deltas` straight into users.xp, returning the new totals."""
+
+        user_ids = list(deltas)
+        amounts = [deltas[uid] for uid in user_ids]
+
+        await conn.execute(_ENSURE_USERS_SQL, user_ids, amounts)
+        rows = await conn.fetch(_APPLY_DELTAS_SQL, user_ids, amounts)
+
+        return {r["user_id"]: r["xp"] for r in rows}
+
+    async def compact(self) -> int:
+        """Fold ledger events past the watermark into users.xp.
+
+        Returns:
+            int: Number of users updated
+        """
+
+        if not self.ledger:
+            return 0
+
+        async with self._compact_lock:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    # Waits for in-flight inserts and holds new ones until
+                    # commit, so no uncommitted event can sit below the new
+                    # watermark. Also keeps two compactions from overlapping.
+                    await conn.execute(
+                        "LOCK TABLE xp_events IN SHARE ROW EXCLUSIVE MODE"
+                    )
+
+                    rows = await conn.fetch(_LEDGER_PENDING_SQL)
+                    if not rows:
+                        return 0
+
+                    deltas = {r["user_id"]: r["delta"] for r in rows if r["delta"]}
+                    if deltas:
+                        await self._apply_to_users(conn, deltas)
+
+                    await conn.execute(
+                        "UPDATE xp_compaction SET last_event_id = $1",
+                        max(r["last_id"] for r in rows),
+                    )
+
+        logger.info(f"Compacted XP ledger for {len(rows)} users.")
+        return len(rows)
+
+    def _cache_totals(self, deltas: dict[int, int], totals: dict[int, int]):
+        """Write batch results through to the cache."""
+
+        if self.cache is None:
+            return
+
+        # users missing from `totals` had nothing to remove from and stay at 0
+        for user_id in deltas:
+            self.cache.set(user_id, totals.get(user_id, 0))
 
     async def get_leaderboard(self, limit: int = 10):
-        query = """
-        SELECT user_id, xp
-        FROM users
-        ORDER BY xp DESC
-        LIMIT $1
+        return await self.get_leaderboard_page(limit=limit)
+
+    async def get_leaderboard_page(
+        self, after: tuple[int, int] | None = None, limit: int = 10
+    ) -> list[tuple[int, int]]:
+        """Fetch one leaderboard page using keyset pagination.
+
+        Args:
+            after: `(xp, user_id)` of the last row on the previous page,
+                or None for the first page
+            limit: Page size
+
+        Returns:
+            list[tuple[int, int]]: `(user_id, xp)` rows in rank order
         """
 
+        if self._pending:
+            await self.flush()
+
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, limit)
+            if after is None:
+                rows = await conn.fetch(_LEADERBOARD_FIRST_PAGE_SQL, limit)
+            else:
+                rows = await conn.fetch(
+                    _LEADERBOARD_NEXT_PAGE_SQL, after[0], after[1], limit
+                )
 
         return [(r["user_id"], r["xp"]) for r in rows]
+
+    async def get_rank(self, user_id: int) -> tuple[int, int] | None:
+        """Get a user's leaderboard position.
+
+        Returns:
+            tuple[int, int] | None: `(rank, xp)`, or None if the user has no row
+        """
+
+        if self._pending:
+            await self.flush()
+
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(_RANK_SQL, user_id)
+
+        return (row["rank"], row["xp"]) if row else None
@@ -3,6 +3,27 @@ CREATE TABLE IF NOT EXISTS users (
     xp INTEGER DEFAULT 0
 );
 
+-- leaderboard order; serves rank counts and keyset pages without sorting
+CREATE INDEX IF NOT EXISTS users_xp_rank_idx ON users (xp DESC, user_id);
+
+-- append-only XP ledger (XP_LEDGER mode); folded into users.xp by compaction
+CREATE TABLE IF NOT EXISTS xp_events (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    delta INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS xp_events_user_idx ON xp_events (user_id, id);
+
+-- single row holding the last xp_events.id already folded into users.xp
+CREATE TABLE IF NOT EXISTS xp_compaction (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    last_event_id BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO xp_compaction DEFAULT VALUES ON CONFLICT DO NOTHING;
+
 CREATE TABLE IF NOT EXISTS daily_question_posts (
     date DATE PRIMARY KEY,
     message_id BIGINT,
@@ -10,3 +31,24 @@ CREATE TABLE IF NOT EXISTS daily_question_posts (
     channel_id BIGINT,
     posted_at TIMESTAMPTZ
 );
+
+-- question bank mirrored from Google Sheets by QuestionBank.sync()
+CREATE TABLE IF NOT EXISTS questions (
+    number TEXT PRIMARY KEY,
+    date DATE,
+    genre TEXT,
+    difficulty TEXT,
+    curator TEXT,
+    data JSONB NOT NULL,
+    content_hash TEXT NOT NULL,
+    -- order of the row in the sheet; the first row wins when dates repeat
+    position INTEGER,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- tables created before `position` existed; filled in by the next sync
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS position INTEGER;
+
+CREATE INDEX IF NOT EXISTS questions_date_idx ON questions (date);
+CREATE INDEX IF NOT EXISTS questions_genre_idx ON questions (genre);
+CREATE INDEX IF NOT EXISTS questions_difficulty_idx ON questions (difficulty);
@@ -0,0 +1,105 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from utils.cache import CacheNamespace, CustomCache
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CacheNamespaceTests(unittest.TestCase):
+    def test_hit_and_miss_counters(self):
+        ns = CacheNamespace("xp")
+        ns.set(1, 10)
+
+        self.assertEqual(10, ns.get(1))
+        self.assertIsNone(ns.get(2))
+        self.assertEqual((1, 1), (ns.hits, ns.misses))
+
+    def test_entries_expire_after_ttl(self):
+        clock = _Clock()
+        with patch("utils.cache.time.monotonic", clock):
+            ns = CacheNamespace("xp", ttl=5)
+            ns.set(1, 10)
+
+            clock.now += 4
+            self.assertEqual(10, ns.get(1))
+
+            clock.now += 2
+            self.assertIsNone(ns.get(1))
+
+        self.assertEqual(1, ns.expirations)
+        self.assertEqual(0, len(ns))
+
+    def test_lru_eviction_keeps_recently_used(self):
+        ns = CacheNamespace("xp", maxsize=2)
+        ns.set(1, "a")
+        ns.set(2, "b")
+        ns.get(1)
+        ns.set(3, "c")
+
+        self.assertIn(1, ns)
+        self.assertNotIn(2, ns)
+        self.assertEqual(1, ns.evictions)
+
+    def test_invalidate(self):
+        ns = CacheNamespace("xp")
+        ns.set(1, 10)
+
+        self.assertTrue(ns.invalidate(1))
+        self.assertFalse(ns.invalidate(1))
+
+
+class GetOrFetchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_misses_share_one_fetch(self):
+        ns = CacheNamespace("names")
+        gate = asyncio.Event()
+        fetch = AsyncMock()
+
+        async def _fetch():
+            await fetch()
+            await gate.wait()
+            return "alice"
+
+        tasks = [asyncio.create_task(ns.get_or_fetch(1, _fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+
+        self.assertEqual(["alice"] * 3, await asyncio.gather(*tasks))
+        fetch.assert_awaited_once()
+        self.assertEqual("alice", ns.get(1))
+
+    async def test_failed_fetch_is_not_cached(self):
+        ns = CacheNamespace("names")
+
+        async def _fetch():
+            raise LookupError
+
+        with self.assertRaises(LookupError):
+            await ns.get_or_fetch(1, _fetch)
+
+        self.assertNotIn(1, ns)
+
+
+class CustomCacheTests(unittest.TestCase):
+    def test_namespace_is_reused_with_new_limits(self):
+        cache = CustomCache()
+        ns = cache.namespace("xp", ttl=10, maxsize=5)
+        ns.set(1, 10)
+
+        again = cache.namespace("xp", ttl=20, maxsize=50)
+
+        self.assertIs(ns, again)
+        self.assertEqual((20, 50), (again.ttl, again.maxsize))
+        self.assertEqual(10, again.get(1))
+        self.assertIn("xp", cache.stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
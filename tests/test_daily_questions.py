@@ -20,6 +20,13 @@ if "config" not in sys.modules:
     config.GOOGLE_SHEET_RANGE = "Sheet1!A:Z"
     sys.modules["config"] = config
 
+# Minimal asyncpg stub; QuestionBank only uses it for type hints.
+if "asyncpg" not in sys.modules:
+    asyncpg = types.ModuleType("asyncpg")
+    asyncpg.Pool = object
+    asyncpg.Connection = object
+    sys.modules["asyncpg"] = asyncpg
+
 # Minimal google stubs because exts.daily_questions imports GSheetService.
 if "googleapiclient.discovery" not in sys.modules:
     discovery = types.ModuleType("googleapiclient.discovery")
@@ -108,7 +115,15 @@ if "discord" not in sys.modules:
     sys.modules["discord.ext.commands"] = commands
     sys.modules["discord.ext.tasks"] = tasks
 
-from exts.daily_questions import DailyQuestions
+# The search paginator pulls in bot.py and discord.ui; not needed here.
+if "utils.question_views" not in sys.modules:
+    question_views = types.ModuleType("utils.question_views")
+    question_views.QuestionSearchPaginator = object
+    sys.modules["utils.question_views"] = question_views
+
+from exts.daily_questions import DailyQuestions, PreparedQuestion
+from services.question_search import QuestionSearchIndex
+from utils.questions import Question
 
 
 class _AcquireCtx:
@@ -150,8 +165,9 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
         cog = DailyQuestions.__new__(DailyQuestions)
         cog.bot = bot
         cog.sheet_service = Mock()
-        cog.sheet_service.fetch_question_for_date = AsyncMock(return_value=None)
-        cog.sheet_service.fetch_question_for_date = AsyncMock(return_value=None)
+        cog.question_bank = Mock()
+        cog.question_bank.fetch_question_for_date = AsyncMock(return_value=None)
+        cog._prepared = {}
         return cog
 
 
@@ -214,14 +230,14 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
         channel.send = AsyncMock(return_value=message)
 
         cog = self._make_cog(conn=conn, channel=channel)
-        cog.sheet_service.fetch_question_for_date = AsyncMock(
-            return_value={
-                "Number": "7",
-                "Difficulty": "Easy",
-                "Problem Statement": "Local day test",
-                "Genre": "Thermo",
-                "Curator": "Tester",
-            }
+        cog.question_bank.fetch_question_for_date = AsyncMock(
+            return_value=Question(
+                number="7",
+                difficulty="Easy",
+                statement="Local day test",
+                genre="Thermo",
+                curator="Tester",
+            )
         )
 
         with patch("exts.daily_questions.DAILY_POST_TIMEZONE", "Asia/Kolkata"):
@@ -231,7 +247,7 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
 
         expected_local_day = datetime(2025, 1, 2, 9, 1, tzinfo=pytz.utc).date()
         self.assertEqual(expected_local_day, conn.fetchval.await_args.args[1])
-        cog.sheet_service.fetch_question_for_date.assert_awaited_once_with(expected_local_day)
+        cog.question_bank.fetch_question_for_date.assert_awaited_once_with(expected_local_day)
 
     async def test_no_question_day_skips_send(self):
         conn = Mock()
@@ -243,7 +259,7 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
         channel.send = AsyncMock()
 
         cog = self._make_cog(conn=conn, channel=channel)
-        cog.sheet_service.fetch_question_for_date = AsyncMock(return_value=None)
+        cog.question_bank.fetch_question_for_date = AsyncMock(return_value=None)
 
         await cog.post_daily_question(
             today_key=datetime(2025, 1, 1, tzinfo=pytz.utc).date(),
@@ -267,14 +283,14 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
         channel.send = AsyncMock(return_value=message)
 
         cog = self._make_cog(conn=conn, channel=channel)
-        cog.sheet_service.fetch_question_for_date = AsyncMock(
-            return_value={
-                "Number": "42",
-                "Difficulty": "Hard",
-                "Problem Statement": "Test problem",
-                "Genre": "Mechanics",
-                "Curator": "Tester",
-            }
+        cog.question_bank.fetch_question_for_date = AsyncMock(
+            return_value=Question(
+                number="42",
+                difficulty="Hard",
+                statement="Test problem",
+                genre="Mechanics",
+                curator="Tester",
+            )
         )
 
         posted_at = datetime(2025, 1, 1, 9, 5, tzinfo=pytz.utc)
@@ -287,6 +303,97 @@ class DailyQuestionTests(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(message.id, update_call.args[1])
         self.assertIsNone(update_call.args[2])
 
+    async def test_prepared_question_is_sent_without_fetching(self):
+        conn = Mock()
+        conn.fetchval = AsyncMock(return_value=1)
+        conn.execute = AsyncMock()
+
+        message = Mock(id=321)
+        message.create_thread = AsyncMock(return_value=Mock(id=654))
+
+        channel = Mock()
+        channel.id = 12345
+        channel.send = AsyncMock(return_value=message)
+
+        cog = self._make_cog(conn=conn, channel=channel)
+        today_key = datetime(2025, 1, 1, tzinfo=pytz.utc).date()
+        cog._prepared[today_key] = PreparedQuestion.build(Question(number="3", statement="Prepared"))
+
+        posted_at = datetime(2025, 1, 1, 9, 0, tzinfo=pytz.utc)
+        self.assertTrue(await cog.post_daily_question(today_key=today_key, posted_at=posted_at))
+
+        cog.question_bank.fetch_question_for_date.assert_not_awaited()
+        embed = channel.send.await_args.kwargs["embed"]
+        self.assertEqual("Prepared", embed.description)
+        self.assertEqual(posted_at, embed.timestamp)
+        self.assertEqual({}, cog._prepared)
+
+    async def test_invalid_question_is_not_sent(self):
+        conn = Mock()
+        conn.fetchval = AsyncMock(return_value=1)
+
+        channel = Mock()
+        channel.id = 12345
+        channel.send = AsyncMock()
+
+        cog = self._make_cog(conn=conn, channel=channel)
+        cog.question_bank.fetch_question_for_date = AsyncMock(
+            return_value=Question(number="8", statement="x" * 5000)
+        )
+
+        ok = await cog.post_daily_question(
+            today_key=datetime(2025, 1, 1, tzinfo=pytz.utc).date(),
+            posted_at=datetime(2025, 1, 1, 9, 0, tzinfo=pytz.utc),
+        )
+
+        self.assertFalse(ok)
+        channel.send.assert_not_awaited()
+        conn.fetchval.assert_not_awaited()
+
+    async def test_prefetch_keeps_only_valid_upcoming_questions(self):
+        cog = self._make_cog()
+        day1 = datetime(2025, 1, 1, tzinfo=pytz.utc).date()
+        day2 = datetime(2025, 1, 2, tzinfo=pytz.utc).date()
+        cog.question_bank.fetch_questions_for_dates = AsyncMock(
+            return_value={
+                day1: Question(number="1", statement="Fine"),
+                day2: Question(number="2"),
+            }
+        )
+
+        _FixedDateTime.fixed_now = datetime(2025, 1, 1, 3, 0, tzinfo=pytz.utc)
+        with patch("exts.daily_questions.DAILY_POST_TIMEZONE", "UTC"), patch(
+            "exts.daily_questions.datetime", _FixedDateTime
+        ):
+            prepared = await cog.prefetch_upcoming(days=3)
+
+        self.assertEqual([day1], list(prepared))
+        self.assertIs(prepared, cog._prepared)
+        self.assertEqual(
+            ["missing Problem Statement"], PreparedQuestion.build(Question(number="2")).problems
+        )
+
+    async def test_search_on_empty_index_does_not_report_duplicates(self):
+        cog = self._make_cog()
+        cog.question_source = Mock()
+        cog.question_source.get_snapshot = AsyncMock(
+            return_value=types.SimpleNamespace(rows=[Question(number="1", statement="Optics")])
+        )
+        cog.search_index = QuestionSearchIndex()
+        cog.duplicates = Mock()
+        cog.report_duplicates = AsyncMock()
+        interaction = Mock()
+        interaction.response.defer = AsyncMock()
+        interaction.response.is_done = Mock(return_value=True)
+        interaction.followup.send = AsyncMock()
+
+        await cog.qotd_search(interaction, query="thermodynamics")
+
+        self.assertEqual(1, len(cog.search_index))
+        cog.duplicates.find.assert_not_called()
+        cog.report_duplicates.assert_not_awaited()
+        interaction.followup.send.assert_awaited_once()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,4 @@
+import re
 import sys
 import types
 import unittest
@@ -44,12 +45,27 @@ if "google.oauth2.service_account" not in sys.modules:
     sys.modules["google.oauth2"] = oauth2
     sys.modules["google.oauth2.service_account"] = service_account
 
-from services.gsheets_service import GSheetService
+from services.gsheets_service import (
+    GSheetService,
+    SheetLayout,
+    SheetUnavailableError,
+    column_letters,
+)
 
 
 class _FakeSheetsService:
+    """Serves A1 ranges out of an in-memory grid, trimming like the real API."""
+
+    _RANGE_RE = re.compile(r"(?:.*!)?([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?")
+
     def __init__(self, values):
         self._values = values
+        self.calls = 0
+        self.ranges = []
+        # `http` passed to each execute(), None for the client's own
+        self.https = []
+        # exceptions raised by the next execute() calls, in order
+        self.failures = []
 
     def spreadsheets(self):
         return self
@@ -58,10 +74,62 @@ class _FakeSheetsService:
         return self
 
     def get(self, spreadsheetId, range):
+        self._pending = {"values": self._read(range, "ROWS")}
         return self
 
-    def execute(self):
-        return {"values": self._values}
+    def batchGet(self, spreadsheetId, ranges, majorDimension="ROWS"):
+        self._pending = {
+            "valueRanges": [{"values": self._read(r, majorDimension)} for r in ranges]
+        }
+        return self
+
+    def execute(self, http=None):
+        self.calls += 1
+        self.https.append(http)
+        if self.failures:
+            raise self.failures.pop(0)
+        return self._pending
+
+    @staticmethod
+    def _col(letters, default):
+        if not letters:
+            return default
+        index = 0
+        for char in letters:
+            index = index * 26 + ord(char) - 64
+        return index - 1
+
+    def _read(self, a1, major):
+        self.ranges.append(a1)
+        c1, r1, c2, r2 = self._RANGE_RE.fullmatch(a1).groups()
+        first_col, last_col = self._col(c1, 0), self._col(c2, 10**6)
+        first_row = int(r1 or 1)
+        last_row = int(r2) if r2 else len(self._values)
+
+        rows = [
+            list(row[first_col : last_col + 1])
+            for row in self._values[first_row - 1 : last_row]
+        ]
+        if major == "COLUMNS":
+            width = max((len(r) for r in rows), default=0)
+            rows = [[r[i] if i < len(r) else "" for r in rows] for i in range(width)]
+
+        rows = [self._trim(r) for r in rows]
+        return self._trim(rows)
+
+    @staticmethod
+    def _trim(items):
+        while items and not items[-1]:
+            items = items[:-1]
+        return items
+
+
+class _HttpError(Exception):
+    """Shaped like googleapiclient.errors.HttpError."""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.resp = types.SimpleNamespace(status=status)
 
 
 class _FixedDateTime:
@@ -89,8 +157,8 @@ class GSheetServiceTests(unittest.TestCase):
             row = svc._fetch_today_sync()
 
         self.assertIsNotNone(row)
-        self.assertEqual("2025-01-02", row["Date"])
-        self.assertEqual("2", row["Number"])
+        self.assertEqual("2025-01-02", row.date)
+        self.assertEqual("2", row.number)
 
     def test_fetch_today_sync_returns_none_when_today_missing(self):
         values = [
@@ -106,6 +174,196 @@ class GSheetServiceTests(unittest.TestCase):
 
         self.assertIsNone(row)
 
+    def test_lookups_read_only_key_columns_and_matching_rows(self):
+        values = [
+            ["Date", "Number", "Problem Statement"],
+            ["2025-01-01", "1", "first"],
+            ["2025-01-02", "2", "second"],
+        ]
+        fake = _FakeSheetsService(values)
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+
+        first = svc._fetch_date_sync(datetime(2025, 1, 1).date())
+        second = svc._fetch_date_sync(datetime(2025, 1, 2).date())
+        by_number = svc._fetch_number_sync("2")
+
+        self.assertEqual("first", first.statement)
+        self.assertIs(second, by_number)
+        self.assertEqual(
+            ["Sheet1!A1:Z1", "Sheet1!A2:A", "Sheet1!B2:B", "Sheet1!A2:Z2", "Sheet1!A3:Z3"],
+            fake.ranges,
+        )
+
+    def test_batch_fetch_reads_all_rows_in_one_request(self):
+        fake = _FakeSheetsService(
+            [["Date", "Number"], ["2025-01-01", "1"], ["2025-01-02", "2"], ["2025-01-03", "3"]]
+        )
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+        svc._get_index_sync()
+        fake.calls = 0
+
+        days = [datetime(2025, 1, d).date() for d in (1, 3, 9)]
+        rows = svc._fetch_dates_sync(days)
+
+        self.assertEqual(["1", "3"], [rows[d].number for d in days[:2]])
+        self.assertEqual(1, fake.calls)
+
+    def test_stale_index_reads_only_appended_rows(self):
+        fake = _FakeSheetsService([["Date", "Number"], ["2025-01-01", "1"]])
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+        svc._get_index_sync()
+
+        fake._values = fake._values + [["2025-01-02", "2"]]
+        fake.ranges = []
+        svc._index.loaded_at -= svc.snapshot_ttl
+
+        index = svc._get_index_sync()
+
+        self.assertEqual(["Sheet1!A3:A", "Sheet1!B3:B"], fake.ranges)
+        self.assertEqual(3, index.by_date["2025-01-02"])
+
+    def test_row_inserted_above_the_data_rebuilds_the_index(self):
+        fake = _FakeSheetsService(
+            [["Date", "Number"], ["2025-01-01", "1"], ["2025-01-02", "2"]]
+        )
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+        svc._get_index_sync()
+
+        fake._values = [["Date", "Number"], ["2024-12-31", "0"]] + fake._values[1:]
+        row = svc._fetch_date_sync(datetime(2025, 1, 2).date())
+
+        self.assertEqual("2", row.number)
+        self.assertEqual(4, svc._index.by_date["2025-01-02"])
+
+    def test_stale_snapshot_reads_only_appended_rows(self):
+        fake = _FakeSheetsService([["Date", "Number"], ["2025-01-01", "1"]])
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+        svc._get_snapshot_sync()
+
+        fake._values = fake._values + [["2025-01-02", "2"]]
+        fake.ranges = []
+        svc._snapshot.loaded_at -= svc.snapshot_ttl
+
+        snapshot = svc._get_snapshot_sync()
+
+        self.assertEqual(["Sheet1!A3:Z"], fake.ranges)
+        self.assertEqual(["1", "2"], [r.number for r in snapshot.rows])
+
+    def test_client_is_built_lazily_once(self):
+        svc = GSheetService()
+        self.assertIsNone(svc._service)
+
+        fake = _FakeSheetsService([["Date", "Number"]])
+        with patch.object(GSheetService, "_build_service", return_value=fake) as build:
+            svc._get_snapshot_sync()
+            svc._fetch_number_sync("1")
+
+        build.assert_called_once()
+        self.assertIs(fake, svc._service)
+
+    def _flaky_service(self, values=None):
+        fake = _FakeSheetsService(values or [["Date", "Number"], ["2025-01-01", "1"]])
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+        return svc, fake
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_transient_failures_are_retried(self, sleep):
+        svc, fake = self._flaky_service()
+        fake.failures = [TimeoutError(), _HttpError(503)]
+
+        row = svc._fetch_number_sync("1")
+
+        self.assertEqual("2025-01-01", row.date)
+        self.assertEqual(2, sleep.call_count)
+        self.assertEqual(2, svc.stats.retries)
+        self.assertEqual(2, svc.stats.failures)
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_attempts_are_cut_short_by_the_deadline(self, sleep):
+        svc, fake = self._flaky_service()
+        svc.request_timeout, svc.deadline = 10, 4
+
+        with patch.object(svc, "_authorized_http", return_value="short") as http:
+            svc._get_snapshot_sync()
+
+        self.assertEqual(["short"], fake.https)
+        self.assertLessEqual(http.call_args.args[0], 4)
+
+        svc.deadline = 30
+        svc._get_snapshot_sync(force=True)
+        self.assertEqual(["short", None], fake.https)
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_client_errors_are_not_retried(self, sleep):
+        svc, fake = self._flaky_service()
+        fake.failures = [_HttpError(403)]
+
+        with self.assertRaises(SheetUnavailableError):
+            svc._fetch_number_sync("1")
+
+        sleep.assert_not_called()
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_outage_falls_back_to_last_snapshot(self, sleep):
+        svc, fake = self._flaky_service()
+        svc._get_snapshot_sync()
+        svc._snapshot.loaded_at -= svc.snapshot_ttl
+
+        fake.failures = [TimeoutError()] * 10
+        row = svc._fetch_date_sync(datetime(2025, 1, 1).date())
+        snapshot = svc._get_snapshot_sync()
+
+        self.assertEqual("1", row.number)
+        self.assertEqual(["1"], [r.number for r in snapshot.rows])
+        self.assertEqual(1 + svc.max_retries, svc.stats.failures)
+        self.assertGreaterEqual(svc.stats.fallbacks, 1)
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_outage_without_cached_data_raises(self, sleep):
+        svc, fake = self._flaky_service()
+        fake.failures = [TimeoutError()] * 10
+
+        with self.assertRaises(SheetUnavailableError):
+            svc._fetch_date_sync(datetime(2025, 1, 1).date())
+
+    @patch("services.gsheets_service.time.sleep")
+    def test_failed_forced_refresh_raises_instead_of_serving_the_old_copy(self, sleep):
+        svc, fake = self._flaky_service()
+        svc._get_snapshot_sync()
+
+        fake.failures = [TimeoutError()] * 10
+        with self.assertRaises(SheetUnavailableError):
+            svc._get_snapshot_sync(force=True)
+
+        # the old copy is still there for ordinary reads
+        self.assertEqual(["1"], [r.number for r in svc._get_snapshot_sync().rows])
+
+    def test_layout_parses_a1_ranges(self):
+        layout = SheetLayout.parse("'QOTD Bank'!B3:O")
+
+        self.assertEqual("'QOTD Bank'", layout.sheet)
+        self.assertEqual((1, 14, 3), (layout.first_col, layout.last_col, layout.header_row))
+        self.assertEqual("'QOTD Bank'!D10:D", layout.column(3, 10))
+        self.assertEqual("AA", column_letters(26))
+
+    def test_forced_refresh_reloads_snapshot(self):
+        fake = _FakeSheetsService([["Date", "Number"], ["2025-01-01", "1"]])
+        svc = GSheetService.__new__(GSheetService)
+        svc._service = fake
+
+        svc._get_snapshot_sync()
+        fake._values = [["Date", "Number"], ["2025-01-01", "9"]]
+        snapshot = svc._get_snapshot_sync(force=True)
+
+        self.assertEqual(2, fake.calls)
+        self.assertEqual("9", snapshot.by_date["2025-01-01"].number)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,303 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from utils import latex
+from utils.latex import (
+    LatexDiskCache,
+    LatexRenderError,
+    LatexTimeoutError,
+    RenderExecutor,
+    RenderLimits,
+    RenderQueueFull,
+    TexWorkerError,
+    compile_pdf,
+    latex_document,
+    RASTERIZERS,
+    normalize_latex,
+    render_key,
+    render_latex,
+    render_options,
+    select_rasterizer,
+)
+
+
+class RenderKeyTests(unittest.TestCase):
+    def test_equivalent_whitespace_shares_a_key(self):
+        a = "$x^2 +  y^2$\r\n\r\n\r\n\\[ E = mc^2 \\]  "
+        b = "  $x^2 + y^2$\n\n\\[\tE = mc^2 \\]"
+
+        self.assertEqual(normalize_latex(a), normalize_latex(b))
+        self.assertEqual(render_key(a), render_key(b))
+
+    def test_paragraph_break_is_kept(self):
+        self.assertNotEqual(render_key("a\nb"), render_key("a\n\nb"))
+
+    def test_options_change_the_key(self):
+        key = render_key("$x$")
+        self.assertNotEqual(key, render_key("$x$", render_options(dpi=150)))
+        self.assertNotEqual(key, render_key("$x$", render_options("magick")))
+
+    def test_key_is_sha256_hex(self):
+        key = render_key("$x$")
+        self.assertEqual(len(key), 64)
+        int(key, 16)
+
+
+class LatexDiskCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "latex")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _age(self, cache: LatexDiskCache, key: str, seconds: float):
+        then = time.time() - seconds
+        os.utime(cache._file(key), (then, then))
+
+    def test_round_trip_and_reload(self):
+        cache = LatexDiskCache(self.path, max_bytes=1024)
+        self.assertIsNone(cache.get("a"))
+
+        cache.put("a", b"image")
+        self.assertEqual(cache.get("a"), b"image")
+
+        # a new instance picks up what is already on disk
+        reopened = LatexDiskCache(self.path, max_bytes=1024)
+        self.assertEqual(reopened.get("a"), b"image")
+        self.assertEqual(reopened.total_bytes, 5)
+
+    def test_evicts_least_recently_used_past_the_cap(self):
+        cache = LatexDiskCache(self.path, max_bytes=20)
+        cache.put("a", b"x" * 8)
+        cache.put("b", b"x" * 8)
+        self._age(cache, "a", 30)
+        self._age(cache, "b", 20)
+
+        # reading "a" makes "b" the oldest
+        cache.get("a")
+        cache.put("c", b"x" * 8)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), b"x" * 8)
+        self.assertEqual(cache.get("c"), b"x" * 8)
+        self.assertEqual(cache.total_bytes, 16)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertFalse(os.path.exists(cache._file("b")))
+
+    def test_oversized_image_is_not_stored(self):
+        cache = LatexDiskCache(self.path, max_bytes=4)
+        cache.put("a", b"too large")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_file_removed_externally_is_a_miss(self):
+        cache = LatexDiskCache(self.path, max_bytes=1024)
+        cache.put("a", b"image")
+        os.unlink(cache._file("a"))
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["files"], 0)
+
+
+class RenderPathTests(unittest.TestCase):
+    def test_preamble_lines_come_before_the_body(self):
+        document = latex_document("$x$")
+        head, body = document.split("\\begin{document}\n")
+
+        self.assertTrue(head.startswith("\\documentclass"))
+        self.assertTrue(all(line.startswith("\\") for line in head.splitlines()))
+        self.assertEqual(body, "$x$\n\\end{document}\n")
+
+    def _rasterizer(self):
+        rasterizer = Mock()
+        rasterizer.rasterize.return_value = b"png"
+        return rasterizer
+
+    @patch.object(latex, "compile_pdf", return_value=b"pdf")
+    def test_warm_worker_skips_the_cold_path(self, compile_pdf):
+        pool, rasterizer = Mock(), self._rasterizer()
+        pool.compile.return_value = b"warm pdf"
+
+        buf = render_latex("$x$", pool, rasterizer, dpi=150)
+
+        self.assertEqual(buf.getvalue(), b"png")
+        rasterizer.rasterize.assert_called_once_with(b"warm pdf", 150, latex.DEFAULT_LIMITS)
+        compile_pdf.assert_not_called()
+
+    @patch.object(latex, "compile_pdf", return_value=b"pdf")
+    def test_broken_worker_falls_back_to_cold(self, compile_pdf):
+        pool, rasterizer = Mock(), self._rasterizer()
+        pool.compile.side_effect = TexWorkerError("exited early")
+
+        buf = render_latex("$x$", pool, rasterizer)
+
+        self.assertEqual(buf.getvalue(), b"png")
+        rasterizer.rasterize.assert_called_once_with(b"pdf", latex.DPI, latex.DEFAULT_LIMITS)
+
+    @patch.object(latex, "compile_pdf")
+    def test_compile_error_from_worker_is_not_retried_cold(self, compile_pdf):
+        pool, rasterizer = Mock(), self._rasterizer()
+        pool.compile.return_value = None
+
+        self.assertIsNone(render_latex("\\undefined", pool, rasterizer))
+        compile_pdf.assert_not_called()
+        rasterizer.rasterize.assert_not_called()
+
+
+class CompilePdfTests(unittest.TestCase):
+    def test_each_render_gets_its_own_scratch_directory(self):
+        seen = []
+
+        def fake_pdflatex(cmd, *, cwd, **kwargs):
+            seen.append(cwd)
+            with open(os.path.join(cwd, "render.pdf"), "wb") as f:
+                f.write(b"%PDF " + cwd.encode())
+            return Mock(returncode=0, stdout="")
+
+        with patch.object(latex.subprocess, "run", fake_pdflatex):
+            first = compile_pdf(latex_document("$x$"))
+            second = compile_pdf(latex_document("$x$"))
+
+        self.assertNotEqual(seen[0], seen[1])
+        self.assertEqual(first, b"%PDF " + seen[0].encode())
+        self.assertEqual(second, b"%PDF " + seen[1].encode())
+        for directory in seen:
+            self.assertFalse(os.path.exists(directory))
+            if latex.SCRATCH_DIR is not None:
+                self.assertEqual(os.path.dirname(directory), latex.SCRATCH_DIR)
+
+    def test_timeout_is_a_render_timeout(self):
+        def hang(cmd, **kwargs):
+            raise subprocess.TimeoutExpired(cmd, kwargs["timeout"])
+
+        with patch.object(latex.subprocess, "run", hang):
+            with self.assertRaises(LatexTimeoutError):
+                compile_pdf(latex_document("\\loop\\iftrue\\repeat"))
+
+
+class RasterizerTests(unittest.TestCase):
+    def _installed(self, *executables):
+        return patch.object(
+            latex.shutil, "which", lambda name: f"/usr/bin/{name}" if name in executables else None
+        )
+
+    def test_fastest_installed_backend_is_chosen(self):
+        with self._installed("gs", "magick"):
+            self.assertEqual(select_rasterizer().name, "ghostscript")
+
+    def test_preferred_backend_wins_when_installed(self):
+        with self._installed("pdftoppm", "magick"):
+            self.assertEqual(select_rasterizer("magick").name, "magick")
+            # not installed: fall back to the fastest one that is
+            self.assertEqual(select_rasterizer("ghostscript").name, "pdftoppm")
+
+    def test_nothing_installed(self):
+        with self._installed():
+            self.assertIsNone(select_rasterizer())
+            with self.assertRaises(LatexRenderError):
+                render_latex("$x$")
+
+    def test_every_backend_fills_in_the_dpi(self):
+        for rasterizer in RASTERIZERS:
+            command = rasterizer.command(144)
+            self.assertEqual(command[0], rasterizer.executable)
+            self.assertTrue(any("144" in arg for arg in command), rasterizer.name)
+            self.assertFalse(any("{" in arg for arg in command), rasterizer.name)
+
+
+class RenderExecutorTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.executor = RenderExecutor(concurrency=1, max_queue=1)
+        self.release = threading.Event()
+
+    async def asyncTearDown(self):
+        self.release.set()
+        self.executor.shutdown()
+
+    def _blocked(self):
+        self.release.wait(5)
+        return "done"
+
+    async def test_rejects_past_the_queue_and_counts(self):
+        running = asyncio.create_task(self.executor.run(self._blocked))
+        waiting = asyncio.create_task(self.executor.run(self._blocked))
+        await asyncio.sleep(0)
+
+        self.assertEqual((self.executor.running, self.executor.queued), (1, 1))
+        with self.assertRaises(RenderQueueFull):
+            await self.executor.run(self._blocked)
+
+        self.release.set()
+        self.assertEqual(await asyncio.gather(running, waiting), ["done", "done"])
+
+        stats = self.executor.stats()
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual((stats["running"], stats["queued"]), (0, 0))
+
+    async def test_cancelled_caller_keeps_its_slot_until_the_render_ends(self):
+        running = asyncio.create_task(self.executor.run(self._blocked))
+        await asyncio.sleep(0)
+        running.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await running
+
+        # the render thread is still busy, so the queue is not any longer
+        self.assertEqual(1, self.executor.running)
+        waiting = asyncio.create_task(self.executor.run(self._blocked))
+        await asyncio.sleep(0)
+        with self.assertRaises(RenderQueueFull):
+            await self.executor.run(self._blocked)
+
+        self.release.set()
+        self.assertEqual("done", await waiting)
+        self.assertEqual((0, 0), (self.executor.running, self.executor.queued))
+
+    async def test_timeouts_and_failures_are_counted(self):
+        def timeout():
+            raise LatexTimeoutError("pdflatex timed out")
+
+        def fail():
+            raise LatexRenderError("bad")
+
+        with self.assertRaises(LatexTimeoutError):
+            await self.executor.run(timeout)
+        with self.assertRaises(LatexRenderError):
+            await self.executor.run(fail)
+
+        stats = self.executor.stats()
+        self.assertEqual((stats["timeouts"], stats["failed"], stats["completed"]), (1, 1, 0))
+
+
+@unittest.skipIf(latex.resource is None, "rlimits are POSIX only")
+class RenderLimitsTests(unittest.TestCase):
+    def test_child_gets_the_rlimits(self):
+        limits = RenderLimits(timeout=10, cpu_seconds=7, memory_bytes=1024 * 1024 * 1024)
+        out = subprocess.run(
+            limits.wrap(
+                [
+                    sys.executable,
+                    "-c",
+                    "import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0],"
+                    " resource.getrlimit(resource.RLIMIT_AS)[0])",
+                ]
+            ),
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        ).stdout.split()
+
+        self.assertEqual(out, ["7", str(1024 * 1024 * 1024)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import types
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+
+# Minimal discord stub; other test modules may have installed a partial one.
+_own_stub = "discord" not in sys.modules
+discord = sys.modules.setdefault("discord", types.ModuleType("discord"))
+for _name in ("Member", "Role", "Guild"):
+    if not hasattr(discord, _name):
+        setattr(discord, _name, type(_name, (), {}))
+if not hasattr(discord, "HTTPException"):
+    discord.HTTPException = type("HTTPException", (Exception,), {})
+
+from services.level_roles import LevelRoleReconciler
+from utils.levels import LevelTable
+
+# Don't leak this bare stub into test modules that install a fuller one.
+if _own_stub:
+    del sys.modules["discord"]
+
+
+def _role(role_id, name, default=False):
+    role = Mock(id=role_id)
+    role.name = name
+    role.is_default.return_value = default
+    return role
+
+
+class LevelRoleReconcilerTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.everyone = _role(1, "@everyone", default=True)
+        self.level1 = _role(10, "Short 1")
+        self.level2 = _role(20, "Short 2")
+        self.other = _role(30, "Curator")
+
+        self.guild = Mock(id=99, roles=[self.everyone, self.level1, self.level2, self.other])
+
+        bot = Mock()
+        bot.level_table = LevelTable(
+            {100: ("Level 1", "Short 1"), 500: ("Level 2", "Short 2")}
+        )
+        self.reconciler = LevelRoleReconciler(bot)
+
+    def _member(self, *roles):
+        member = Mock(guild=self.guild, roles=[self.everyone, *roles])
+        member.edit = AsyncMock()
+        return member
+
+    async def test_whole_diff_applied_in_one_edit(self):
+        member = self._member(self.other)
+
+        changed = await self.reconciler.reconcile(member, 600)
+
+        self.assertTrue(changed)
+        member.edit.assert_awaited_once()
+        roles = member.edit.await_args.kwargs["roles"]
+        self.assertCountEqual([self.other, self.level1, self.level2], roles)
+
+    async def test_level_roles_above_xp_are_removed(self):
+        member = self._member(self.other, self.level1, self.level2)
+
+        await self.reconciler.reconcile(member, 150)
+
+        roles = member.edit.await_args.kwargs["roles"]
+        self.assertCountEqual([self.other, self.level1], roles)
+
+    async def test_no_edit_when_roles_already_match(self):
+        member = self._member(self.other, self.level1)
+
+        self.assertFalse(await self.reconciler.reconcile(member, 150))
+        member.edit.assert_not_awaited()
+
+    def test_role_map_is_cached_until_invalidated(self):
+        first = self.reconciler.role_map(self.guild)
+        self.guild.roles = []
+
+        self.assertIs(first, self.reconciler.role_map(self.guild))
+
+        self.reconciler.invalidate(self.guild.id)
+        self.assertEqual({}, self.reconciler.role_map(self.guild))
+
+
+if __name__ == "__main__":
+    unittest.main()
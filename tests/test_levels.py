@@ -0,0 +1,51 @@
+import types
+import unittest
+
+from utils.levels import LevelTable
+
+
+THRESHOLDS = {
+    500: ("Level 2 Title", "Short 2"),
+    100: ("Level 1 Title", "Short 1"),
+    1000: ("Level 3 Title", "Short 3"),
+}
+
+
+class LevelTableTests(unittest.TestCase):
+    def setUp(self):
+        self.table = LevelTable(THRESHOLDS)
+
+    def test_level_lookup_is_inclusive_of_threshold(self):
+        self.assertEqual("Unranked", self.table.level(99))
+        self.assertEqual("Level 1 Title", self.table.level(100))
+        self.assertEqual("Level 2 Title", self.table.level(999))
+        self.assertEqual("Level 3 Title", self.table.level(5000))
+
+    def test_next_threshold(self):
+        self.assertEqual((100, "Quantum Newbie"), self.table.next_threshold(0))
+        self.assertEqual((500, "Level 2 Title"), self.table.next_threshold(100))
+        self.assertEqual((1500, "Master"), self.table.next_threshold(1200))
+
+    def test_roles_split_at_current_level(self):
+        self.assertEqual(("Short 1", "Short 2"), self.table.roles_for(600))
+        self.assertEqual(("Short 3",), self.table.roles_above(600))
+        self.assertEqual((), self.table.roles_for(0))
+
+    def test_progress_matches_profile_maths(self):
+        progress = self.table.progress(600)
+
+        self.assertEqual("Level 2 Title", progress.level)
+        self.assertEqual(1000, progress.next_threshold)
+        self.assertEqual((600, 400, 60), (progress.into, progress.remaining, progress.percent))
+
+    def test_empty_table_uses_defaults(self):
+        table = LevelTable.from_config(types.SimpleNamespace())
+
+        progress = table.progress(40)
+
+        self.assertEqual("Unranked", progress.level)
+        self.assertEqual((100, "Quantum Newbie"), (progress.next_threshold, progress.next_level))
+
+
+if __name__ == "__main__":
+    unittest.main()
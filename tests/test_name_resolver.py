@@ -0,0 +1,84 @@
+import sys
+import types
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+
+# Minimal discord stub; other test modules may have installed a partial one.
+_own_stub = "discord" not in sys.modules
+discord = sys.modules.setdefault("discord", types.ModuleType("discord"))
+for _name in ("Member", "Guild"):
+    if not hasattr(discord, _name):
+        setattr(discord, _name, type(_name, (), {}))
+for _name in ("ClientException", "HTTPException"):
+    if not hasattr(discord, _name):
+        setattr(discord, _name, type(_name, (Exception,), {}))
+if not hasattr(discord, "NotFound"):
+    discord.NotFound = type("NotFound", (discord.HTTPException,), {})
+
+from services.name_resolver import NameResolver
+from utils.cache import CacheNamespace
+
+# Don't leak this bare stub into test modules that install a fuller one.
+if _own_stub:
+    del sys.modules["discord"]
+
+
+def _member(user_id, name):
+    member = Mock(id=user_id)
+    member.display_name = name
+    return member
+
+
+class NameResolverTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = Mock()
+        self.bot.fetch_user = AsyncMock()
+        self.cache = CacheNamespace("display_names")
+        self.resolver = NameResolver(self.bot, self.cache)
+
+        self.guild = Mock()
+        self.guild.get_member = Mock(return_value=None)
+        self.guild.query_members = AsyncMock(return_value=[])
+
+    async def test_cached_members_need_no_requests(self):
+        self.guild.get_member = Mock(side_effect=lambda uid: _member(uid, f"m{uid}"))
+
+        names = await self.resolver.resolve_many(self.guild, [1, 2])
+
+        self.assertEqual({1: "m1", 2: "m2"}, names)
+        self.guild.query_members.assert_not_awaited()
+        self.bot.fetch_user.assert_not_awaited()
+
+    async def test_missing_ids_use_one_member_query(self):
+        self.guild.query_members = AsyncMock(
+            return_value=[_member(1, "alice"), _member(2, "bob")]
+        )
+
+        names = await self.resolver.resolve_many(self.guild, [1, 2])
+
+        self.assertEqual({1: "alice", 2: "bob"}, names)
+        self.guild.query_members.assert_awaited_once()
+        self.assertEqual([1, 2], self.guild.query_members.await_args.kwargs["user_ids"])
+        self.bot.fetch_user.assert_not_awaited()
+
+    async def test_deleted_users_are_remembered(self):
+        self.bot.fetch_user = AsyncMock(side_effect=discord.NotFound())
+
+        first = await self.resolver.resolve_many(self.guild, [7])
+        second = await self.resolver.resolve_many(self.guild, [7])
+
+        self.assertEqual({7: "Deleted User (7)"}, first)
+        self.assertEqual(first, second)
+        self.bot.fetch_user.assert_awaited_once()
+
+    async def test_transient_errors_are_not_cached(self):
+        self.bot.fetch_user = AsyncMock(side_effect=discord.HTTPException())
+
+        await self.resolver.resolve_many(self.guild, [7])
+
+        self.assertNotIn(7, self.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
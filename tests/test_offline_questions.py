@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+import types
+import unittest
+from datetime import date
+
+
+# Minimal config for import-time constants.
+if "config" not in sys.modules:
+    config = types.ModuleType("config")
+    config.GOOGLE_CREDENTIALS_PATH = "/tmp/fake.json"
+    config.GOOGLE_API_SCOPES = ["scope"]
+    config.GOOGLE_SHEET_ID = "sheet-id"
+    config.GOOGLE_SHEET_RANGE = "Sheet1!A:Z"
+    sys.modules["config"] = config
+
+from services.gsheets_service import QuestionSnapshot, SheetUnavailableError
+from services.offline_questions import OfflineQuestionSource, export_snapshot
+
+
+VALUES = [
+    ["Date", "Number", "Problem Statement", "Hint 1", "Hint 3", "Answer"],
+    ["2025-01-01", "1", "first", "h1", "", "42"],
+    ["2025-01-02", "2", "second"],
+    ["2025-01-02", "3", "duplicate date"],
+]
+
+
+class OfflineQuestionSourceTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "bank", "questions.sqlite3")
+        self.snapshot = QuestionSnapshot.from_values(VALUES)
+        export_snapshot(self.snapshot, self.path)
+        self.source = OfflineQuestionSource(self.path)
+
+    def tearDown(self):
+        self.source.invalidate()
+        self.tmp.cleanup()
+
+    async def test_lookups_match_the_sheet(self):
+        first = await self.source.fetch_question_for_date(date(2025, 1, 1))
+        by_number = await self.source.fetch_question_by_number(3)
+        many = await self.source.fetch_questions_for_dates(
+            [date(2025, 1, 2), date(2025, 1, 9)]
+        )
+
+        self.assertEqual(self.snapshot.by_date["2025-01-01"], first)
+        self.assertEqual("duplicate date", by_number.statement)
+        self.assertEqual(["2"], [q.number for q in many.values()])
+
+    async def test_snapshot_round_trips(self):
+        snapshot = await self.source.get_snapshot()
+
+        self.assertEqual(VALUES[0], snapshot.headers)
+        self.assertEqual(self.snapshot.rows, snapshot.rows)
+
+    async def test_reexport_is_picked_up_after_invalidate(self):
+        await self.source.fetch_question_by_number(1)
+        export_snapshot(QuestionSnapshot.from_values(VALUES[:2]), self.path)
+
+        snapshot = await self.source.get_snapshot(force=True)
+
+        self.assertEqual(["1"], [q.number for q in snapshot.rows])
+
+    async def test_lookup_survives_invalidate_after_the_query(self):
+        query = self.source._query
+
+        def query_then_invalidate(*args):
+            # /qotd_export closing the file just as the lock is released
+            result = query(*args)
+            self.source.invalidate()
+            return result
+
+        self.source._query = query_then_invalidate
+
+        first = await self.source.fetch_question_for_date(date(2025, 1, 1))
+        many = await self.source.fetch_questions_for_dates([date(2025, 1, 2)])
+
+        self.assertEqual("first", first.statement)
+        self.assertEqual(["2"], [q.number for q in many.values()])
+
+    async def test_missing_file_is_unavailable(self):
+        source = OfflineQuestionSource(os.path.join(self.tmp.name, "missing.sqlite3"))
+
+        with self.assertRaises(SheetUnavailableError):
+            await source.fetch_question_by_number(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
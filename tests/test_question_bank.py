@@ -0,0 +1,167 @@
+import json
+import sys
+import types
+import unittest
+from datetime import date
+from unittest.mock import AsyncMock, Mock
+
+
+# Minimal config/google/asyncpg stubs for import-time dependencies.
+if "config" not in sys.modules:
+    config = types.ModuleType("config")
+    config.GOOGLE_CREDENTIALS_PATH = "/tmp/fake.json"
+    config.GOOGLE_API_SCOPES = ["scope"]
+    config.GOOGLE_SHEET_ID = "sheet-id"
+    config.GOOGLE_SHEET_RANGE = "Sheet1!A:Z"
+    sys.modules["config"] = config
+
+if "googleapiclient.discovery" not in sys.modules:
+    discovery = types.ModuleType("googleapiclient.discovery")
+    discovery.build = lambda *args, **kwargs: object()
+    googleapiclient = types.ModuleType("googleapiclient")
+    googleapiclient.discovery = discovery
+    sys.modules["googleapiclient"] = googleapiclient
+    sys.modules["googleapiclient.discovery"] = discovery
+
+if "google.oauth2.service_account" not in sys.modules:
+    service_account = types.ModuleType("google.oauth2.service_account")
+
+    class _Credentials:
+        @staticmethod
+        def from_service_account_file(*args, **kwargs):
+            return object()
+
+    service_account.Credentials = _Credentials
+    oauth2 = types.ModuleType("google.oauth2")
+    oauth2.service_account = service_account
+    google = types.ModuleType("google")
+    google.oauth2 = oauth2
+    sys.modules["google"] = google
+    sys.modules["google.oauth2"] = oauth2
+    sys.modules["google.oauth2.service_account"] = service_account
+
+if "asyncpg" not in sys.modules:
+    asyncpg = types.ModuleType("asyncpg")
+    asyncpg.Pool = object
+    asyncpg.Connection = object
+    sys.modules["asyncpg"] = asyncpg
+
+from services.gsheets_service import QuestionSnapshot
+from services.question_bank import QuestionBank, _content_hash
+from utils.questions import Question
+
+
+class _AsyncCtx:
+    def __init__(self, value=None):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Pool:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def acquire(self):
+        return _AsyncCtx(self._conn)
+
+
+HEADERS = ["Date", "Number", "Problem Statement", "Genre", "Difficulty"]
+
+
+def _bank(values, existing=()):
+    conn = Mock()
+    conn.transaction = Mock(return_value=_AsyncCtx())
+    conn.fetch = AsyncMock(return_value=list(existing))
+    conn.fetchval = AsyncMock(return_value=None)
+    conn.execute = AsyncMock()
+
+    sheet = Mock()
+    sheet.get_snapshot = AsyncMock(return_value=QuestionSnapshot.from_values(values))
+    sheet.fetch_question_for_date = AsyncMock(return_value=None)
+    return QuestionBank(_Pool(conn), sheet), conn, sheet
+
+
+class QuestionBankSyncTests(unittest.IsolatedAsyncioTestCase):
+    async def test_only_changed_rows_are_upserted(self):
+        values = [
+            HEADERS,
+            ["2025-01-01", "1", "Q1", "Optics", "easy"],
+            ["2025-01-02", "2", "Q2", "Thermo", "Hard"],
+        ]
+        unchanged = Question.from_dict(dict(zip(HEADERS, values[1]))).to_dict()
+        bank, conn, _ = _bank(
+            values,
+            existing=[
+                {"number": "1", "content_hash": _content_hash(unchanged), "position": 0},
+                {"number": "9", "content_hash": "stale", "position": 5},
+            ],
+        )
+
+        self.assertEqual((1, 1, 1), await bank.sync())
+
+        upsert, delete = conn.execute.await_args_list
+        self.assertEqual(["2"], upsert.args[1])
+        self.assertEqual([date(2025, 1, 2)], upsert.args[2])
+        self.assertEqual(["9"], delete.args[1])
+        self.assertEqual([1], upsert.args[8])
+
+    async def test_moved_row_is_rewritten_with_its_position(self):
+        values = [HEADERS, ["2025-01-01", "0", "Q0"], ["2025-01-01", "1", "Q1"]]
+        moved = Question.from_dict(dict(zip(HEADERS, values[2]))).to_dict()
+        bank, conn, _ = _bank(
+            values,
+            existing=[{"number": "1", "content_hash": _content_hash(moved), "position": 0}],
+        )
+
+        self.assertEqual((2, 0, 0), await bank.sync())
+
+        (upsert,) = conn.execute.await_args_list
+        self.assertEqual(["0", "1"], upsert.args[1])
+        self.assertEqual([0, 1], upsert.args[8])
+
+    async def test_empty_sheet_does_not_wipe_table(self):
+        bank, conn, _ = _bank([], existing=[{"number": "1", "content_hash": "x"}])
+
+        self.assertEqual((0, 0, 0), await bank.sync())
+        conn.execute.assert_not_awaited()
+
+
+class QuestionBankFetchTests(unittest.IsolatedAsyncioTestCase):
+    async def test_reads_from_postgres(self):
+        bank, conn, sheet = _bank([])
+        conn.fetchval = AsyncMock(return_value=json.dumps({"Number": "4"}))
+
+        question = await bank.fetch_question_for_date(date(2025, 1, 1))
+
+        self.assertEqual(Question(number="4"), question)
+        sheet.fetch_question_for_date.assert_not_awaited()
+        # "10" sorts before "9" as text; the sheet's own order decides
+        self.assertIn("ORDER BY position", conn.fetchval.await_args.args[0])
+
+    async def test_falls_back_to_sheet_when_not_synced(self):
+        bank, _, sheet = _bank([])
+        sheet.fetch_question_for_date = AsyncMock(return_value=Question(number="5"))
+
+        question = await bank.fetch_question_for_date(date(2025, 1, 1))
+
+        self.assertEqual(Question(number="5"), question)
+
+    async def test_batch_fetch_only_asks_sheet_for_missing_days(self):
+        bank, conn, sheet = _bank([])
+        day1, day2 = date(2025, 1, 1), date(2025, 1, 2)
+        conn.fetch = AsyncMock(return_value=[{"date": day1, "data": json.dumps({"Number": "1"})}])
+        sheet.fetch_questions_for_dates = AsyncMock(return_value={})
+
+        questions = await bank.fetch_questions_for_dates([day1, day2])
+
+        self.assertEqual({day1: Question(number="1")}, questions)
+        sheet.fetch_questions_for_dates.assert_awaited_once_with([day2])
+
+
+if __name__ == "__main__":
+    unittest.main()
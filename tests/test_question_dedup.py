@@ -0,0 +1,60 @@
+import unittest
+
+from services.question_dedup import DuplicateDetector, jaccard, shingles
+from utils.questions import Question
+
+
+BASE = (
+    "A uniform rod of mass m and length L is pivoted at one end and released "
+    "from rest in the horizontal position. Find its angular speed when vertical."
+)
+
+
+def _q(number, statement):
+    return Question(number=number, statement=statement)
+
+
+class DuplicateDetectorTests(unittest.TestCase):
+    def test_near_duplicates_are_clustered(self):
+        questions = [
+            _q("1", BASE),
+            _q("2", "Light of wavelength 500 nm passes through a double slit."),
+            _q("3", BASE.replace("vertical.", "vertical (take g = 9.8).")),
+            _q("4", BASE + " "),
+        ]
+
+        clusters = DuplicateDetector().find(questions)
+
+        self.assertEqual([("1", "3", "4")], [c.numbers for c in clusters])
+        self.assertGreaterEqual(clusters[0].similarity, 0.7)
+
+    def test_different_statements_are_not_flagged(self):
+        questions = [
+            _q("1", BASE),
+            _q("2", "A capacitor of 2 uF is charged to 10 V and connected to a resistor."),
+            _q("3", "A uniform disc of mass m rolls without slipping down an incline."),
+        ]
+
+        self.assertEqual([], DuplicateDetector().find(questions))
+
+    def test_edited_statements_are_rehashed(self):
+        detector = DuplicateDetector()
+        detector.find([_q("1", BASE), _q("2", BASE)])
+
+        clusters = detector.find([_q("1", BASE), _q("2", "Something else entirely.")])
+
+        self.assertEqual([], clusters)
+
+    def test_similar_signatures_for_similar_sets(self):
+        detector = DuplicateDetector()
+        a, b = shingles(BASE), shingles(BASE.replace("rest", "standstill"))
+
+        sig_a, sig_b = detector.signature(a), detector.signature(b)
+        estimate = sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+        self.assertEqual(64, len(sig_a))
+        self.assertAlmostEqual(jaccard(a, b), estimate, delta=0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
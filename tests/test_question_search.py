@@ -0,0 +1,82 @@
+import time
+import unittest
+
+from services.question_search import QuestionSearchIndex, tokenize
+from utils.questions import Question
+
+
+def _q(number, statement, genre="", difficulty="", curator="", date=""):
+    return Question(
+        number=number,
+        statement=statement,
+        genre=genre,
+        difficulty=difficulty,
+        curator=curator,
+        date=date,
+    )
+
+
+QUESTIONS = [
+    _q("1", "A block slides down a frictionless incline.", "Mechanics", "Easy", "Ada", "2025-01-01"),
+    _q("2", "Find the thermal efficiency of a Carnot engine.", "Thermodynamics", "Hard", "Bo", "2025-01-02"),
+    _q("3", "A pendulum on an incline oscillates; find the period.", "Mechanics", "Medium", "Bo", "2025-01-03"),
+]
+
+
+class QuestionSearchIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.index = QuestionSearchIndex()
+        self.index.update(QUESTIONS)
+
+    def test_ranks_by_relevance(self):
+        hits = self.index.search("incline block")
+
+        self.assertEqual(["1", "3"], [h.question.number for h in hits])
+        self.assertGreater(hits[0].score, hits[1].score)
+
+    def test_prefix_and_metadata_match(self):
+        self.assertEqual(["2"], [h.question.number for h in self.index.search("thermo")])
+
+    def test_filters_without_query_list_newest_first(self):
+        hits = self.index.search(genre="mechanics")
+
+        self.assertEqual(["3", "1"], [h.question.number for h in hits])
+
+    def test_filters_combine_with_query(self):
+        hits = self.index.search("incline", curator="Bo")
+
+        self.assertEqual(["3"], [h.question.number for h in hits])
+
+    def test_update_reindexes_only_changes(self):
+        edited = _q("1", "A sphere rolls without slipping.", "Mechanics", "Easy", "Ada")
+
+        indexed, removed = self.index.update([edited, QUESTIONS[1]])
+
+        self.assertEqual((1, 1), (indexed, removed))
+        self.assertEqual([], self.index.search("block"))
+        self.assertEqual(["1"], [h.question.number for h in self.index.search("rolls")])
+        self.assertEqual([], self.index.search(genre="mechanics", curator="Bo"))
+
+    def test_tokenize_drops_stopwords_and_keeps_decimals(self):
+        self.assertEqual(["g", "9.8", "m", "s"], tokenize("g is 9.8 m/s"))
+
+    def test_thousands_of_questions_search_in_milliseconds(self):
+        words = ["force", "energy", "charge", "field", "wave", "lens", "orbit", "spring"]
+        index = QuestionSearchIndex()
+        index.update(
+            [
+                _q(str(i), " ".join(words[(i + k) % len(words)] for k in range(30)) + f" item{i}")
+                for i in range(5000)
+            ]
+        )
+
+        started = time.perf_counter()
+        hits = index.search("orbit spring", limit=10)
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(10, len(hits))
+        self.assertLess(elapsed, 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from utils.questions import Question, QuestionColumns
+
+
+HEADERS = ["Date", "Number", "Problem Statement", "Hint 2", "Hint 1", "Answer"]
+
+
+class QuestionColumnsTests(unittest.TestCase):
+    def test_rows_parse_into_records(self):
+        columns = QuestionColumns.from_headers(HEADERS)
+
+        question = columns.parse([" 2025-01-01 ", "7", "Why?", "second", "first", "42"])
+
+        self.assertEqual("2025-01-01", question.date)
+        self.assertEqual(("first", "second"), question.hints)
+        self.assertEqual((("Answer", "42"),), question.extra)
+        self.assertEqual((), columns.problems)
+
+    def test_short_rows_are_not_padded(self):
+        question = QuestionColumns.from_headers(HEADERS).parse(["2025-01-01", "7"])
+
+        self.assertEqual("", question.statement)
+        self.assertEqual([], question.visible_hints)
+
+    def test_schema_problems_are_collected_once(self):
+        columns = QuestionColumns.from_headers(["Date", "Date", "Genre"])
+
+        self.assertEqual(
+            (
+                "duplicate column 'Date'; using the first",
+                "missing column 'Number'",
+                "missing column 'Problem Statement'",
+            ),
+            columns.problems,
+        )
+
+    def test_dict_round_trip(self):
+        data = {"Date": "2025-01-01", "Number": "7", "Hint 1": "h", "Answer": "42"}
+
+        question = Question.from_dict(data)
+
+        self.assertEqual(question, Question.from_dict(question.to_dict()))
+        self.assertEqual("42", question.to_dict()["Answer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,418 @@
+import asyncio
+import sys
+import types
+import unittest
+from unittest.mock import AsyncMock, Mock
+
+
+# Minimal asyncpg stub; XPService only uses it for type hints.
+if "asyncpg" not in sys.modules:
+    asyncpg = types.ModuleType("asyncpg")
+    asyncpg.Pool = object
+    asyncpg.Connection = object
+    sys.modules["asyncpg"] = asyncpg
+
+from services.xp_service import XPService
+from utils.cache import CacheNamespace
+
+
+class _AsyncCtx:
+    def __init__(self, value=None):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Pool:
+    def __init__(self, conn):
+        self._conn = conn
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+        return _AsyncCtx(self._conn)
+
+
+def _make_conn():
+    conn = Mock()
+    conn.transaction = Mock(return_value=_AsyncCtx())
+    conn.execute = AsyncMock()
+    conn.fetchrow = AsyncMock(return_value=None)
+    conn.fetch = AsyncMock(return_value=[])
+    return conn
+
+
+class WriteBehindTests(unittest.IsolatedAsyncioTestCase):
+    async def test_updates_are_buffered_until_flush(self):
+        conn = _make_conn()
+        pool = _Pool(conn)
+        svc = XPService(pool, write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 10)
+        await svc.update_xp(1, 5)
+        await svc.update_xp(2, 3)
+
+        conn.execute.assert_not_awaited()
+        conn.fetch.assert_not_awaited()
+        pool.acquired = 0
+
+        written = await svc.flush()
+
+        self.assertEqual(2, written)
+        self.assertEqual(1, pool.acquired)
+        conn.execute.assert_awaited_once()
+        conn.fetch.assert_awaited_once()
+        for call in (conn.execute.await_args, conn.fetch.await_args):
+            self.assertEqual([1, 2], call.args[1])
+            self.assertEqual([15, 3], call.args[2])
+
+    async def test_threshold_triggers_flush(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=2)
+
+        await svc.update_xp(1, 10)
+        conn.execute.assert_not_awaited()
+
+        await svc.update_xp(2, 10)
+        conn.fetch.assert_awaited_once()
+        self.assertEqual({}, svc._pending)
+
+    async def test_failed_flush_keeps_pending_deltas(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(side_effect=RuntimeError("db down"))
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 10)
+        with self.assertRaises(RuntimeError):
+            await svc.flush()
+
+        self.assertEqual({1: 10}, svc._pending)
+
+    async def test_cancelled_flush_keeps_pending_deltas(self):
+        conn = _make_conn()
+        started = asyncio.Event()
+
+        async def slow_fetch(*args):
+            started.set()
+            await asyncio.sleep(10)
+
+        conn.fetch = AsyncMock(side_effect=slow_fetch)
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 10)
+        flush = asyncio.create_task(svc.flush())
+        await started.wait()
+        await svc.update_xp(1, 5)
+        flush.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await flush
+
+        self.assertEqual({1: 15}, svc._pending)
+
+    async def test_get_xp_includes_pending_delta(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(return_value={"xp": 4})
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 10)
+
+        self.assertEqual(14, await svc.get_xp(1))
+
+    async def test_removal_is_clamped_before_later_grants(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(side_effect=[{"old_xp": 10, "new_xp": 0}, {"xp": 0}])
+        conn.fetch = AsyncMock(return_value=[{"user_id": 1, "xp": 5}])
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        # 10 XP, -20 then +5: 5 as in immediate mode, not max(0, 10 - 15)
+        self.assertEqual((10, 0), await svc.update_xp(1, -20))
+        self.assertEqual((0, 5), await svc.update_xp(1, 5))
+
+        self.assertEqual((1, -20), conn.fetchrow.await_args_list[0].args[1:])
+        self.assertEqual({1: 5}, svc._pending)
+
+        await svc.flush()
+        self.assertEqual([5], conn.fetch.await_args.args[2])
+
+    async def test_removal_folds_in_buffered_grants(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+        await svc.update_xp(1, 5)
+
+        conn.fetchrow = AsyncMock(return_value={"old_xp": 10, "new_xp": 0})
+        await svc.update_xp(1, -20)
+
+        self.assertEqual((1, -15), conn.fetchrow.await_args.args[1:])
+        self.assertEqual({}, svc._pending)
+
+    async def test_buffered_update_returns_old_and_new(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(return_value={"xp": 4})
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        self.assertEqual((4, 14), await svc.update_xp(1, 10))
+        self.assertEqual((14, 19), await svc.update_xp(1, 5))
+        conn.execute.assert_not_awaited()
+        self.assertEqual({1: 15}, svc._pending)
+
+    async def test_close_flushes_pending(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+        svc.start()
+
+        await svc.update_xp(1, 10)
+        await svc.close()
+
+        conn.fetch.assert_awaited_once()
+        self.assertIsNone(svc._flush_task)
+
+
+class AdjustXPTests(unittest.IsolatedAsyncioTestCase):
+    async def test_single_statement_returns_old_and_new(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(return_value={"old_xp": 40, "new_xp": 30})
+        pool = _Pool(conn)
+        svc = XPService(pool)
+
+        result = await svc.adjust_xp(1, -10)
+
+        self.assertEqual((40, 30), result)
+        self.assertEqual(1, pool.acquired)
+        conn.fetchrow.assert_awaited_once()
+        self.assertEqual((1, -10), conn.fetchrow.await_args.args[1:])
+        conn.transaction.assert_not_called()
+
+    async def test_folds_in_pending_write_behind_delta(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+        await svc.update_xp(1, 5)
+
+        conn.fetchrow = AsyncMock(return_value={"old_xp": 0, "new_xp": 15})
+        result = await svc.adjust_xp(1, 10)
+
+        self.assertEqual((5, 15), result)
+        self.assertEqual((1, 15), conn.fetchrow.await_args.args[1:])
+        self.assertEqual({}, svc._pending)
+
+    async def test_failed_adjust_keeps_pending_write_behind_delta(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+        await svc.update_xp(1, 5)
+
+        conn.fetchrow = AsyncMock(side_effect=RuntimeError("db down"))
+        with self.assertRaises(RuntimeError):
+            await svc.adjust_xp(1, 10)
+
+        self.assertEqual({1: 5}, svc._pending)
+
+
+class UpdateManyTests(unittest.IsolatedAsyncioTestCase):
+    async def test_single_transaction_returns_all_totals(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            return_value=[{"user_id": 1, "xp": 110}, {"user_id": 2, "xp": 10}]
+        )
+        pool = _Pool(conn)
+        svc = XPService(pool)
+
+        totals = await svc.update_xp_many({1: 10, 2: 10, 3: -5})
+
+        self.assertEqual({1: 110, 2: 10, 3: 0}, totals)
+        self.assertEqual(1, pool.acquired)
+        conn.transaction.assert_called_once()
+        self.assertEqual([1, 2, 3], conn.fetch.await_args.args[1])
+
+    async def test_folds_in_pending_deltas(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 5)
+        await svc.update_xp(2, 7)
+        await svc.update_xp_many({1: -10})
+
+        self.assertEqual([-5], conn.fetch.await_args.args[2])
+        self.assertEqual({2: 7}, svc._pending)
+
+    async def test_write_behind_buffers_grants(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(return_value=[{"user_id": 1, "xp": 100}])
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        totals = await svc.update_xp_many({1: 10, 2: 5})
+
+        self.assertEqual({1: 110, 2: 5}, totals)
+        self.assertEqual({1: 10, 2: 5}, svc._pending)
+        conn.execute.assert_not_awaited()
+
+    async def test_failed_batch_keeps_pending_deltas(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(side_effect=RuntimeError("db down"))
+        svc = XPService(_Pool(conn), write_behind=True, flush_threshold=100)
+
+        await svc.update_xp(1, 5)
+        await svc.update_xp(3, 7)
+        with self.assertRaises(RuntimeError):
+            await svc.update_xp_many({1: -10, 2: -20})
+
+        self.assertEqual({1: 5, 3: 7}, svc._pending)
+
+
+class LedgerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_adjust_appends_event_without_touching_users(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            return_value=[{"user_id": 1, "old_xp": 20, "new_xp": 30}]
+        )
+        svc = XPService(_Pool(conn), ledger=True)
+
+        self.assertEqual((20, 30), await svc.adjust_xp(1, 10))
+
+        query = conn.fetch.await_args.args[0]
+        self.assertIn("INSERT INTO xp_events", query)
+        self.assertNotIn("UPDATE users", query)
+        self.assertEqual(([1], [10]), conn.fetch.await_args.args[1:])
+
+    async def test_append_locks_the_user_before_reading_the_total(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            return_value=[{"user_id": 1, "old_xp": 10, "new_xp": 0}]
+        )
+        svc = XPService(_Pool(conn), ledger=True)
+
+        # the removal is clamped to what the user had
+        self.assertEqual((10, 0), await svc.adjust_xp(1, -20))
+
+        begin, lock, append = conn.mock_calls
+        self.assertEqual("transaction", begin[0])
+        self.assertEqual("execute", lock[0])
+        self.assertIn("pg_advisory_xact_lock", lock.args[0])
+        self.assertEqual(([1],), lock.args[1:])
+        self.assertEqual("fetch", append[0])
+        self.assertIn("GREATEST(-xp, delta)", append.args[0])
+        self.assertEqual(([1], [-20]), append.args[1:])
+
+    async def test_batch_locks_every_user_in_its_transaction(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            return_value=[
+                {"user_id": 2, "old_xp": 5, "new_xp": 0},
+                {"user_id": 1, "old_xp": 0, "new_xp": 10},
+            ]
+        )
+        svc = XPService(_Pool(conn), ledger=True)
+
+        totals = await svc.update_xp_many({2: -10, 1: 10})
+
+        self.assertEqual({2: 0, 1: 10}, totals)
+        conn.transaction.assert_called_once()
+        lock = conn.execute.await_args
+        self.assertIn("ORDER BY user_id", lock.args[0])
+        self.assertEqual(([2, 1],), lock.args[1:])
+
+    async def test_compact_folds_events_and_moves_watermark(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            side_effect=[
+                [
+                    {"user_id": 1, "delta": 15, "last_id": 7},
+                    {"user_id": 2, "delta": 0, "last_id": 9},
+                ],
+                [{"user_id": 1, "xp": 115}],
+            ]
+        )
+        svc = XPService(_Pool(conn), ledger=True)
+
+        self.assertEqual(2, await svc.compact())
+
+        lock, ensure, watermark = conn.execute.await_args_list
+        self.assertIn("LOCK TABLE xp_events", lock.args[0])
+        self.assertEqual(([1], [15]), ensure.args[1:])
+        self.assertEqual((9,), watermark.args[1:])
+
+    async def test_compact_is_noop_without_ledger(self):
+        conn = _make_conn()
+        pool = _Pool(conn)
+
+        self.assertEqual(0, await XPService(pool).compact())
+        self.assertEqual(0, pool.acquired)
+
+
+class XPCacheTests(unittest.IsolatedAsyncioTestCase):
+    async def test_get_xp_reads_through_cache(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(return_value={"xp": 25})
+        pool = _Pool(conn)
+        svc = XPService(pool, cache=CacheNamespace("xp"))
+
+        self.assertEqual(25, await svc.get_xp(1))
+        self.assertEqual(25, await svc.get_xp(1))
+        self.assertEqual(1, pool.acquired)
+
+    async def test_adjust_writes_new_total_through(self):
+        conn = _make_conn()
+        conn.fetchrow = AsyncMock(return_value={"xp": 25})
+        pool = _Pool(conn)
+        svc = XPService(pool, cache=CacheNamespace("xp"))
+        await svc.get_xp(1)
+
+        conn.fetchrow = AsyncMock(return_value={"old_xp": 25, "new_xp": 35})
+        await svc.adjust_xp(1, 10)
+
+        self.assertEqual(35, await svc.get_xp(1))
+        self.assertEqual(2, pool.acquired)
+
+    async def test_flush_writes_batch_totals_through(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(
+            return_value=[{"user_id": 1, "xp": 40}, {"user_id": 2, "xp": 5}]
+        )
+        cache = CacheNamespace("xp")
+        svc = XPService(
+            _Pool(conn), write_behind=True, flush_threshold=100, cache=cache
+        )
+
+        await svc.update_xp(1, 10)
+        await svc.update_xp(2, 5)
+        await svc.flush()
+
+        self.assertEqual(40, cache.get(1))
+        self.assertEqual(5, cache.get(2))
+
+
+class LeaderboardTests(unittest.IsolatedAsyncioTestCase):
+    async def test_first_page_has_no_cursor(self):
+        conn = _make_conn()
+        conn.fetch = AsyncMock(return_value=[{"user_id": 1, "xp": 50}])
+        svc = XPService(_Pool(conn))
+
+        rows = await svc.get_leaderboard_page(limit=5)
+
+        self.assertEqual([(1, 50)], rows)
+        self.assertEqual((5,), conn.fetch.await_args.args[1:])
+
+    async def test_next_page_uses_keyset_cursor(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn))
+
+        await svc.get_leaderboard_page(after=(50, 1), limit=5)
+
+        query = conn.fetch.await_args.args[0]
+        self.assertNotIn("OFFSET", query)
+        self.assertEqual((50, 1, 5), conn.fetch.await_args.args[1:])
+
+    async def test_rank_missing_user_returns_none(self):
+        conn = _make_conn()
+        svc = XPService(_Pool(conn))
+
+        self.assertIsNone(await svc.get_rank(1))
+
+        conn.fetchrow = AsyncMock(return_value={"rank": 3, "xp": 70})
+        self.assertEqual((3, 70), await svc.get_rank(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
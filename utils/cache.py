@@ -0,0 +1,190 @@
+"""
+Shared in-process cache with named, bounded namespaces
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class CacheNamespace:
+    """A TTL + LRU bounded key/value store.
+
+    :param name: Namespace name, used in stats.
+    :param ttl: Seconds an entry stays valid, None for no expiry.
+    :param maxsize: Max entries kept before the least recently used is
+        evicted, None for unbounded.
+    """
+
+    def __init__(
+        self, name: str, *, ttl: Optional[float] = None, maxsize: Optional[int] = 1024
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        # key -> (expires_at, value); ordered oldest -> most recently used
+        self._data: OrderedDict[Hashable, tuple[Optional[float], Any]] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING, _count=False) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None, *, _count: bool = True) -> Any:
+        """Get a cached value, or `default` if it is missing or expired."""
+
+        entry = self._data.get(key)
+
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                if _count:
+                    self.hits += 1
+                return value
+
+            del self._data[key]
+            self.expirations += 1
+
+        if _count:
+            self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, *, ttl: Optional[float] = None) -> None:
+        """Store `value`, overriding the namespace TTL if `ttl` is given."""
+
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        # a write supersedes any fetch still in flight for this key
+        self._inflight.pop(key, None)
+
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop `key`; returns whether it was present."""
+        self._inflight.pop(key, None)
+        return self._data.pop(key, _MISSING) is not _MISSING
+
+    def invalidate_many(self, keys) -> int:
+        """Drop every key in `keys`; returns how many were present."""
+        return sum(self.invalidate(key) for key in keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._inflight.clear()
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        *,
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """Return the cached value or await `fetch()` and cache its result.
+
+        Concurrent misses on the same key share one `fetch()` call. If the
+        key is set or invalidated while the fetch runs, its result is
+        returned but not cached.
+        """
+
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except BaseException as exc:
+            future.set_exception(exc)
+            # mark retrieved so an unawaited future doesn't log a warning
+            future.exception()
+            raise
+        else:
+            # only store if nothing wrote or invalidated the key meanwhile,
+            # otherwise this result may already be stale
+            if self._inflight.get(key) is future:
+                self.set(key, value, ttl=ttl)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CustomCache:
+    """Registry of named cache namespaces attached to the bot as `bot.cache`"""
+
+    def __init__(self):
+        self._namespaces: dict[str, CacheNamespace] = {}
+
+    def __getitem__(self, name: str) -> CacheNamespace:
+        return self._namespaces[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._namespaces
+
+    def namespace(
+        self, name: str, *, ttl: Optional[float] = None, maxsize: Optional[int] = 1024
+    ) -> CacheNamespace:
+        """Get or create a namespace.
+
+        An existing namespace keeps its entries (so cogs can be reloaded
+        without losing them) but takes the new limits.
+        """
+
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = self._namespaces[name] = CacheNamespace(name, ttl=ttl, maxsize=maxsize)
+        else:
+            ns.ttl = ttl
+            ns.maxsize = maxsize
+
+        return ns
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Clear one namespace, or all of them if `name` is None."""
+
+        if name is None:
+            for ns in self._namespaces.values():
+                ns.clear()
+        else:
+            self._namespaces[name].clear()
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {name: ns.stats() for name, ns in self._namespaces.items()}
@@ -1,57 +1,645 @@
-import subprocess
-import os
+import asyncio
+import hashlib
 import io
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    import resource
+except ImportError:  # Windows; renders run without rlimits there
+    resource = None
+
+logger = logging.getLogger("bot")
+
+# one command per line: mylatexformat skips the preamble line by line
+PREAMBLE = (
+    "\\documentclass[preview,border=2pt]{standalone}\n"
+    "\\usepackage[utf8]{inputenc}\n"
+    "\\usepackage{amsmath, amssymb, enumerate}\n"
+)
+# PREAMBLE precompiled by `build_format`, as <name>.fmt
+FORMAT_NAME = "preamble"
+# rasterization resolution; 300 keeps formulas crisp at Discord's preview size
+DPI = 300
+
+
+def _scratch_dir() -> str | None:
+    # tmpfs on Linux; None means the system temp directory
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK | os.X_OK):
+        return shm
+    return None
+
+
+# Where each render gets its working directory, so .tex/.aux/.log/.pdf
+# files stay in RAM where possible.
+SCRATCH_DIR = _scratch_dir()
+
+_HSPACE_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class LatexRenderError(Exception):
+    """The source did not compile or could not be rasterized"""
+
+
+class LatexTimeoutError(LatexRenderError):
+    """A TeX or rasterizer process ran past its wall-clock limit"""
+
+
+class RenderQueueFull(Exception):
+    """Every render slot and queue place is taken"""
+
+
+@dataclass(frozen=True, slots=True)
+class RenderLimits:
+    """Hard limits applied to every TeX and rasterizer process"""
+
+    # wall-clock seconds per process
+    timeout: float = 15.0
+    # CPU seconds before the kernel sends SIGXCPU
+    cpu_seconds: int = 10
+    # address space per process
+    memory_bytes: int = 512 * 1024 * 1024
+
+    def wrap(self, command: list[str]) -> list[str]:
+        """`command` run through `sh`, which sets the rlimits and execs it.
+
+        Not a `preexec_fn`: renders are started from worker threads, and
+        running Python between fork and exec is unsafe there.
+        """
+        if resource is None:
+            return command
+
+        # ulimit -v counts KiB
+        script = (
+            f"ulimit -t {self.cpu_seconds} && "
+            f"ulimit -v {self.memory_bytes // 1024} && "
+            'exec "$@"'
+        )
+        return ["/bin/sh", "-c", script, "sh", *command]
+
+
+DEFAULT_LIMITS = RenderLimits()
+
+
+def normalize_latex(source: str) -> str:
+    """Canonical form of `source` for cache keys.
+
+    Only rewrites whitespace TeX treats as equivalent: line endings,
+    runs of spaces/tabs, trailing spaces and repeated blank lines (one
+    blank line already ends a paragraph).
+    """
+    source = source.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_HSPACE_RE.sub(" ", line).strip() for line in source.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
 
+def render_options(rasterizer: str = "", dpi: int = DPI) -> dict:
+    """Everything besides the source that changes the rendered image"""
+    return {"preamble": PREAMBLE, "rasterizer": rasterizer, "dpi": dpi, "format": "png"}
 
-def render_latex_jpg(latex_content, output_name) -> io.BytesIO | None:
-    # ensure working directory exists for temporary tex/pdf/jpg files
-    tex_dir = "_tex"
-    os.makedirs(tex_dir, exist_ok=True)
 
-    # wrap the content in a valid document class
-    full_latex = (
-        r"\documentclass[preview,border=2pt]{standalone}"
-        r"\usepackage[utf8]{inputenc}"
-        r"\usepackage{amsmath, amssymb, enumerate}"
-        r"\begin{document}" + latex_content + r"\end{document}"
+def render_key(source: str, options: dict | None = None) -> str:
+    """Content address of a render: sha256 of normalized source + options."""
+    payload = json.dumps(
+        {"source": normalize_latex(source), "options": options or render_options()},
+        sort_keys=True,
+        ensure_ascii=False,
     )
+    return hashlib.sha256(payload.encode()).hexdigest()
 
-    tex_file = os.path.join(tex_dir, f"{output_name}.tex")
-    jpg_file = os.path.join(tex_dir, f"{output_name}.jpg")
 
-    with open(tex_file, "w", encoding="utf-8") as f:
-        f.write(full_latex)
+class LatexDiskCache:
+    """Size-capped on-disk store of rendered images, keyed by `render_key`.
+
+    Files are written atomically and their mtime is bumped on every hit,
+    so when the store grows past `max_bytes` the least recently used
+    images are removed first. Blocking, must be run in thread.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> size in bytes, loaded from the directory on first use
+        self._sizes: dict[str, int] | None = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.img")
+
+    def _load(self) -> dict[str, int]:
+        if self._sizes is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._sizes = {}
+            for entry in os.scandir(self.path):
+                name, ext = os.path.splitext(entry.name)
+                if ext == ".img" and entry.is_file():
+                    self._sizes[name] = entry.stat().st_size
+        return self._sizes
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._load().values())
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            sizes = self._load()
+            if key not in sizes:
+                self.misses += 1
+                return None
+
+            path = self._file(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except FileNotFoundError:
+                # removed behind our back
+                del sizes[key]
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            sizes = self._load()
+            fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.path)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self._file(key))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+            sizes[key] = len(data)
+            self._evict(sizes, keep=key)
+
+    def _evict(self, sizes: dict[str, int], keep: str) -> None:
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+
+        def mtime(key: str) -> float:
+            try:
+                return os.stat(self._file(key)).st_mtime
+            except FileNotFoundError:
+                return 0.0
+
+        for key in sorted(sizes, key=mtime):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.unlink(self._file(key))
+            except FileNotFoundError:
+                pass
+            total -= sizes.pop(key)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = self._load()
+            return {
+                "files": len(sizes),
+                "bytes": sum(sizes.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def latex_document(source: str) -> str:
+    """Wrap `source` in the standalone document every render uses."""
+    return PREAMBLE + "\\begin{document}\n" + source + "\n\\end{document}\n"
+
+
+def build_format(directory: str) -> str | None:
+    """Precompile PREAMBLE into `directory`/preamble.fmt with mylatexformat.
+
+    Renders started with this format skip loading the document class and
+    packages. Returns the format path, or None if it could not be built
+    (no pdflatex, or mylatexformat not installed).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{FORMAT_NAME}.tex"), "w", encoding="utf-8") as f:
+        f.write(latex_document(""))
 
-    # pdflatex
-    # '--interaction=nonstopmode' prevents hanging on errors
     try:
         process = subprocess.run(
-            ["pdflatex", "-interaction=nonstopmode", tex_file],
+            [
+                "pdflatex",
+                "-ini",
+                "-interaction=nonstopmode",
+                f"-jobname={FORMAT_NAME}",
+                "&pdflatex",
+                "mylatexformat.ltx",
+                f"{FORMAT_NAME}.tex",
+            ],
+            cwd=directory,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    except OSError:
+        logger.warning("pdflatex not found; LaTeX renders will not use a format.")
+        return None
+
+    fmt_path = os.path.join(os.path.abspath(directory), f"{FORMAT_NAME}.fmt")
+    if process.returncode != 0 or not os.path.exists(fmt_path):
+        logger.warning(
+            "Could not build the LaTeX preamble format; renders stay on the cold path.\n%s",
+            process.stdout[-2000:],
+        )
+        return None
+    return fmt_path
+
+
+class TexWorkerError(Exception):
+    """A warm worker could not take the render; use the cold path instead"""
+
+
+class TexWorker:
+    """A pdflatex process started ahead of time with the preamble format.
+
+    The process loads the format, then waits on a terminal `\\read` until
+    `compile()` writes the document and releases it, so a render starts
+    with the class and packages already in memory. Workers are single use.
+    """
+
+    def __init__(
+        self,
+        fmt_path: str,
+        limits: RenderLimits = DEFAULT_LIMITS,
+        base_dir: str | None = None,
+    ):
+        self.limits = limits
+        self.directory = tempfile.mkdtemp(prefix="latex-worker-", dir=base_dir or SCRATCH_DIR)
+        self.process = subprocess.Popen(
+            limits.wrap(
+                [
+                    "pdflatex",
+                    f"-fmt={os.path.splitext(fmt_path)[0]}",
+                    # scrollmode so the \read may use the terminal
+                    "-interaction=scrollmode",
+                    "-jobname=render",
+                    r"\read16 to\x \nonstopmode\input{render.tex}",
+                ]
+            ),
+            cwd=self.directory,
+            stdin=subprocess.PIPE,
+            # the transcript goes to render.log; an unread pipe could fill up
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
             text=True,
         )
 
+    def compile(self, document: str) -> bytes | None:
+        """PDF of `document`, or None if it does not compile.
+
+        Raises:
+            LatexTimeoutError: It ran past `limits.timeout`
+        """
+        if self.process.poll() is not None:
+            raise TexWorkerError(f"worker exited early with {self.process.returncode}")
+
+        with open(os.path.join(self.directory, "render.tex"), "w", encoding="utf-8") as f:
+            f.write(document)
+
+        try:
+            self.process.communicate("\n", timeout=self.limits.timeout)
+        except subprocess.TimeoutExpired as exc:
+            self.close()
+            raise LatexTimeoutError("pdflatex timed out") from exc
+
+        pdf_path = os.path.join(self.directory, "render.pdf")
+        if self.process.returncode != 0 or not os.path.exists(pdf_path):
+            return None
+        with open(pdf_path, "rb") as f:
+            return f.read()
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TexWorkerPool:
+    """Keeps `size` warm `TexWorker`s ready and replaces each one it uses.
+
+    Blocking, must be run in thread.
+    """
+
+    def __init__(
+        self,
+        fmt_path: str,
+        size: int,
+        limits: RenderLimits = DEFAULT_LIMITS,
+        base_dir: str | None = None,
+    ):
+        self.fmt_path = fmt_path
+        self.limits = limits
+        self.size = size
+        self.base_dir = base_dir
+
+        self._lock = threading.Lock()
+        self._idle: list[TexWorker] = []
+        self._closed = False
+
+        self.warm = 0
+        self.spawned = 0
+
+        for _ in range(size):
+            self._refill()
+
+    def _refill(self):
+        worker = TexWorker(self.fmt_path, self.limits, self.base_dir)
+        with self._lock:
+            if self._closed or len(self._idle) >= self.size:
+                keep = False
+            else:
+                self._idle.append(worker)
+                self.spawned += 1
+                keep = True
+        if not keep:
+            worker.close()
+
+    def compile(self, document: str) -> bytes | None:
+        """PDF of `document` from a warm worker, or None if it does not compile.
+
+        Raises:
+            TexWorkerError: No warm worker could run it
+            LatexTimeoutError: It ran past the time limit
+        """
+        with self._lock:
+            if self._closed:
+                raise TexWorkerError("pool is closed")
+            worker = self._idle.pop() if self._idle else None
+
+        if worker is None:
+            # all busy; a fresh one still skips the preamble via the format
+            worker = TexWorker(self.fmt_path, self.limits, self.base_dir)
+
+        try:
+            pdf = worker.compile(document)
+        finally:
+            worker.close()
+            try:
+                self._refill()
+            except OSError:
+                logger.warning("Could not start a LaTeX worker.", exc_info=True)
+
+        with self._lock:
+            self.warm += 1
+        return pdf
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+
+def compile_pdf(document: str, limits: RenderLimits = DEFAULT_LIMITS) -> bytes | None:
+    """Cold path: run pdflatex on `document` from scratch, in a scratch
+    directory of its own that is removed afterwards.
+
+    Raises:
+        LatexTimeoutError: It ran past `limits.timeout`
+    """
+    with tempfile.TemporaryDirectory(prefix="latex-", dir=SCRATCH_DIR) as directory:
+        with open(os.path.join(directory, "render.tex"), "w", encoding="utf-8") as f:
+            f.write(document)
+
+        # pdflatex
+        # '--interaction=nonstopmode' prevents hanging on errors
+        try:
+            process = subprocess.run(
+                limits.wrap(["pdflatex", "-interaction=nonstopmode", "render.tex"]),
+                cwd=directory,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=limits.timeout,
+            )
+        except subprocess.TimeoutExpired as exc:
+            raise LatexTimeoutError("pdflatex timed out") from exc
+
         if process.returncode != 0:
             print("LaTeX Error:", process.stdout)
             return None
 
-        # PDF --> PNG, ImageMagick
-        # density 600 for high quality
-        pdf_path = os.path.join(tex_dir, f"{output_name}.pdf")
-        magick_cmd = ["magick", "-density", "600", pdf_path, "-alpha", "remove", jpg_file]
-        subprocess.run(magick_cmd, check=True)
-
-        buf = io.BytesIO()
-        with open(jpg_file, "rb") as f:
-            buf.write(f.read())
-
-        buf.seek(0)
-        return buf
-
-    finally:
-        # clear intermediate files
-        for ext in ["aux", "log", "pdf", "tex", "jpg"]:
-            file_to_del = os.path.join(tex_dir, f"{output_name}.{ext}")
-            if os.path.exists(file_to_del):
-                os.remove(file_to_del)
+        with open(os.path.join(directory, "render.pdf"), "rb") as f:
+            return f.read()
+
+
+@dataclass(frozen=True, slots=True)
+class Rasterizer:
+    """A PDF -> PNG converter that reads the PDF on stdin and writes stdout"""
+
+    name: str
+    executable: str
+    # command line after the executable; "{dpi}" is filled in per render
+    args: tuple[str, ...]
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.executable) is not None
+
+    def command(self, dpi: int) -> list[str]:
+        return [self.executable, *(arg.format(dpi=dpi) for arg in self.args)]
+
+    def rasterize(
+        self, pdf: bytes, dpi: int = DPI, limits: RenderLimits = DEFAULT_LIMITS
+    ) -> bytes:
+        try:
+            return subprocess.run(
+                limits.wrap(self.command(dpi)),
+                input=pdf,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+                timeout=limits.timeout,
+            ).stdout
+        except subprocess.TimeoutExpired as exc:
+            raise LatexTimeoutError(f"{self.name} timed out") from exc
+        except subprocess.CalledProcessError as exc:
+            # e.g. a page too large for the memory limit
+            raise LatexRenderError(f"{self.name} failed: {exc.stderr[-500:]!r}") from exc
+
+
+# Fastest first; the first one installed is used unless configured otherwise.
+RASTERIZERS = (
+    # poppler, renders straight from the PDF
+    Rasterizer("pdftoppm", "pdftoppm", ("-png", "-r", "{dpi}", "-singlefile", "-")),
+    # ghostscript directly, without ImageMagick in front of it
+    Rasterizer(
+        "ghostscript",
+        "gs",
+        (
+            "-q", "-dSAFER", "-dBATCH", "-dNOPAUSE", "-sDEVICE=png16m", "-r{dpi}",
+            "-dTextAlphaBits=4", "-dGraphicsAlphaBits=4", "-sOutputFile=-", "-",
+        ),
+    ),
+    Rasterizer("magick", "magick", ("-density", "{dpi}", "pdf:-", "-alpha", "remove", "png:-")),
+)
+
+
+def select_rasterizer(preferred: str | None = None) -> Rasterizer | None:
+    """`preferred` if it is installed, else the fastest installed backend."""
+    available = [r for r in RASTERIZERS if r.available]
+    for rasterizer in available:
+        if rasterizer.name == preferred:
+            return rasterizer
+    if preferred:
+        logger.warning("LaTeX rasterizer %r is not installed; choosing another.", preferred)
+    return available[0] if available else None
+
+
+def render_latex(
+    latex_content,
+    pool: TexWorkerPool | None = None,
+    rasterizer: Rasterizer | None = None,
+    dpi: int = DPI,
+    limits: RenderLimits = DEFAULT_LIMITS,
+) -> io.BytesIO | None:
+    """PNG of `latex_content`, or None if it does not compile.
+
+    Raises:
+        LatexRenderError: No rasterizer, or rasterizing failed
+        LatexTimeoutError: A step ran past `limits.timeout`
+    """
+    rasterizer = rasterizer or select_rasterizer()
+    if rasterizer is None:
+        raise LatexRenderError("no PDF rasterizer installed")
+
+    document = latex_document(latex_content)
+
+    pdf = None
+    compiled = False
+    if pool is not None:
+        try:
+            pdf = pool.compile(document)
+            compiled = True
+        except (TexWorkerError, OSError):
+            logger.warning("Warm LaTeX worker failed; rendering cold.", exc_info=True)
+
+    if not compiled:
+        pdf = compile_pdf(document, limits)
+
+    if pdf is None:
+        return None
+
+    # the PNG arrives over the rasterizer's stdout; BytesIO shares that
+    # buffer rather than copying it
+    return io.BytesIO(rasterizer.rasterize(pdf, dpi, limits))
+
+
+class RenderExecutor:
+    """Thread pool reserved for renders, with a bounded wait queue.
+
+    At most `concurrency` renders run at once and `max_queue` more wait
+    for a slot; past that `run()` raises `RenderQueueFull` at once rather
+    than letting the backlog grow. Must be used from the event loop thread.
+    """
+
+    def __init__(self, concurrency: int, max_queue: int):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="latex-render"
+        )
+        # submitted and not finished yet, running or waiting
+        self._pending = 0
+
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> int:
+        return min(self._pending, self.concurrency)
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.concurrency)
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` on a render thread.
+
+        Raises:
+            RenderQueueFull: The queue is full
+        """
+        if self._pending >= self.concurrency + self.max_queue:
+            self.rejected += 1
+            raise RenderQueueFull()
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(fn, *args)
+        self._pending += 1
+        # freed when the thread is done, not when the caller stops waiting:
+        # a cancelled caller leaves the render running in its slot
+        future.add_done_callback(lambda _: self._release(loop))
+
+        try:
+            result = await asyncio.wrap_future(future)
+        except LatexTimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+
+        self.completed += 1
+        return result
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        """Done-callback of a render; runs on the render thread."""
+        try:
+            loop.call_soon_threadsafe(self._finished)
+        except RuntimeError:
+            # the loop is already closed, there is nothing left to count for
+            pass
+
+    def _finished(self):
+        self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,94 @@
+"""
+Precompiled XP level table built from `config.XP_THRESHOLDS`
+"""
+
+from bisect import bisect_right
+from dataclasses import dataclass
+
+
+UNRANKED = "Unranked"
+FIRST_LEVEL = "Quantum Newbie"
+MAX_LEVEL = "Master"
+DEFAULT_FIRST_THRESHOLD = 100
+MAX_LEVEL_STEP = 500
+
+
+@dataclass(frozen=True, slots=True)
+class LevelProgress:
+    """Where an XP total sits in the level table"""
+
+    xp: int
+    level: str
+    next_level: str
+    next_threshold: int
+    into: int  # progress towards `next_threshold`
+    remaining: int
+    percent: int
+
+
+class LevelTable:
+    """Sorted thresholds with O(log n) lookups.
+
+    :param thresholds: Mapping of `xp threshold -> (level name, role name)`.
+    """
+
+    __slots__ = ("thresholds", "level_names", "role_names", "managed_roles")
+
+    def __init__(self, thresholds: dict[int, tuple[str, str]]):
+        ordered = sorted(thresholds.items())
+
+        self.thresholds: tuple[int, ...] = tuple(t for t, _ in ordered)
+        self.level_names: tuple[str, ...] = tuple(level for _, (level, _) in ordered)
+        self.role_names: tuple[str, ...] = tuple(role for _, (_, role) in ordered)
+        self.managed_roles: frozenset[str] = frozenset(self.role_names)
+
+    @classmethod
+    def from_config(cls, config) -> "LevelTable":
+        return cls(getattr(config, "XP_THRESHOLDS", None) or {})
+
+    def __len__(self) -> int:
+        return len(self.thresholds)
+
+    def reached(self, xp: int) -> int:
+        """Number of thresholds `xp` has reached."""
+        return bisect_right(self.thresholds, xp)
+
+    def level(self, xp: int) -> str:
+        idx = self.reached(xp)
+        return self.level_names[idx - 1] if idx else UNRANKED
+
+    def next_threshold(self, xp: int) -> tuple[int, str]:
+        """`(threshold, level name)` of the next milestone above `xp`."""
+
+        idx = self.reached(xp)
+
+        if not self.thresholds:
+            return DEFAULT_FIRST_THRESHOLD, FIRST_LEVEL
+        if idx == 0:
+            return self.thresholds[0], FIRST_LEVEL
+        if idx == len(self.thresholds):
+            return self.thresholds[-1] + MAX_LEVEL_STEP, MAX_LEVEL
+
+        return self.thresholds[idx], self.level_names[idx]
+
+    def roles_for(self, xp: int) -> tuple[str, ...]:
+        """Role names `xp` is entitled to."""
+        return self.role_names[: self.reached(xp)]
+
+    def roles_above(self, xp: int) -> tuple[str, ...]:
+        """Level role names `xp` has not reached."""
+        return self.role_names[self.reached(xp) :]
+
+    def progress(self, xp: int) -> LevelProgress:
+        next_threshold, next_level = self.next_threshold(xp)
+        into = xp % next_threshold
+
+        return LevelProgress(
+            xp=xp,
+            level=self.level(xp),
+            next_level=next_level,
+            next_threshold=next_threshold,
+            into=into,
+            remaining=next_threshold - into,
+            percent=int(into / next_threshold * 100),
+        )
@@ -0,0 +1,48 @@
+"""Views for browsing the question bank."""
+
+from typing import List
+
+import discord
+
+from bot import BaseBot
+from services.question_search import SearchHit
+from utils.paginator import Paginator
+
+SNIPPET_LENGTH = 140
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SNIPPET_LENGTH:
+        return text
+    return text[: SNIPPET_LENGTH - 1].rstrip() + "…"
+
+
+class QuestionSearchPaginator(Paginator[SearchHit, BaseBot]):
+    """Pages through /qotd_search results"""
+
+    def __init__(self, *, query: str, entries: List[SearchHit], target, per_page: int = 5):
+        super().__init__(entries=entries, per_page=per_page, target=target)
+        self.query = query
+
+    def format_page(self, entries: List[SearchHit], /) -> discord.Embed:
+        embed = discord.Embed(
+            title=f"Question search: {self.query}"[:256],
+            color=0x5865F2,
+        )
+
+        for hit in entries:
+            question = hit.question
+            meta = " · ".join(
+                part for part in (question.date, question.genre, question.difficulty) if part
+            )
+            embed.add_field(
+                name=f"#{question.number}" + (f" — {meta}" if meta else ""),
+                value=_snippet(question.statement) or "No statement.",
+                inline=False,
+            )
+
+        embed.set_footer(
+            text=f"{len(self.entries)} results · page {self.current_page}/{self.total_pages}"
+        )
+        return embed
@@ -0,0 +1,149 @@
+import re
+from dataclasses import dataclass, field
+
+# Sheet headers with a dedicated Question attribute; anything else is kept
+# in `Question.extra`.
+DATE = "Date"
+NUMBER = "Number"
+STATEMENT = "Problem Statement"
+GENRE = "Genre"
+DIFFICULTY = "Difficulty"
+CURATOR = "Curator"
+
+REQUIRED_HEADERS = (DATE, NUMBER, STATEMENT)
+_HINT_RE = re.compile(r"Hint (\d+)")
+
+
+@dataclass(frozen=True, slots=True)
+class Question:
+    """One row of the question bank"""
+
+    number: str
+    date: str = ""
+    statement: str = ""
+    genre: str = ""
+    difficulty: str = ""
+    curator: str = ""
+    # one entry per Hint N column, in order; blanks included
+    hints: tuple[str, ...] = ()
+    extra: tuple[tuple[str, str], ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: dict[str, str]) -> "Question":
+        """Parse a header -> value mapping (the shape stored in Postgres)."""
+        return QuestionColumns.from_headers(list(data)).parse(list(data.values()))
+
+    def to_dict(self) -> dict[str, str]:
+        """The row as header -> value, the inverse of `from_dict`."""
+        data = {
+            DATE: self.date,
+            NUMBER: self.number,
+            STATEMENT: self.statement,
+            GENRE: self.genre,
+            DIFFICULTY: self.difficulty,
+            CURATOR: self.curator,
+        }
+        for i, hint in enumerate(self.hints, start=1):
+            data[f"Hint {i}"] = hint
+        data.update(self.extra)
+        return data
+
+    @property
+    def visible_hints(self) -> list[str]:
+        return [hint for hint in self.hints if hint]
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionColumns:
+    """Header row resolved to column positions, once per sheet read"""
+
+    date: int | None
+    number: int | None
+    statement: int | None
+    genre: int | None
+    difficulty: int | None
+    curator: int | None
+    hints: tuple[int, ...]
+    extra: tuple[tuple[str, int], ...]
+    problems: tuple[str, ...] = field(default=())
+
+    @classmethod
+    def from_headers(cls, headers: list[str]) -> "QuestionColumns":
+        positions: dict[str, int] = {}
+        problems: list[str] = []
+
+        for i, header in enumerate(headers):
+            header = header.strip()
+            if not header:
+                continue
+            if header in positions:
+                problems.append(f"duplicate column {header!r}; using the first")
+                continue
+            positions[header] = i
+
+        for header in REQUIRED_HEADERS:
+            if header not in positions:
+                problems.append(f"missing column {header!r}")
+
+        hint_numbers = {}
+        for header, i in positions.items():
+            match = _HINT_RE.fullmatch(header)
+            if match:
+                hint_numbers[int(match[1])] = i
+
+        known = {DATE, NUMBER, STATEMENT, GENRE, DIFFICULTY, CURATOR}
+        extra = tuple(
+            (header, i)
+            for header, i in positions.items()
+            if header not in known and not _HINT_RE.fullmatch(header)
+        )
+
+        return cls(
+            date=positions.get(DATE),
+            number=positions.get(NUMBER),
+            statement=positions.get(STATEMENT),
+            genre=positions.get(GENRE),
+            difficulty=positions.get(DIFFICULTY),
+            curator=positions.get(CURATOR),
+            hints=tuple(hint_numbers[n] for n in sorted(hint_numbers)),
+            extra=extra,
+            problems=tuple(problems),
+        )
+
+    def parse(self, row: list[str]) -> Question:
+        """Parse one sheet row; short rows (trailing blanks trimmed) are fine."""
+        size = len(row)
+
+        def cell(i: int | None) -> str:
+            return row[i].strip() if i is not None and i < size else ""
+
+        return Question(
+            number=cell(self.number),
+            date=cell(self.date),
+            statement=cell(self.statement),
+            genre=cell(self.genre),
+            difficulty=cell(self.difficulty),
+            curator=cell(self.curator),
+            hints=tuple(cell(i) for i in self.hints),
+            extra=tuple((header, cell(i)) for header, i in self.extra if cell(i)),
+        )
+
+    def to_row(self, question: Question, width: int) -> list[str]:
+        """Lay `question` back out as a sheet row of `width` cells."""
+        row = [""] * width
+        placed = [
+            (self.date, question.date),
+            (self.number, question.number),
+            (self.statement, question.statement),
+            (self.genre, question.genre),
+            (self.difficulty, question.difficulty),
+            (self.curator, question.curator),
+            *zip(self.hints, question.hints),
+        ]
+        extra = dict(question.extra)
+        placed += [(i, extra.get(header, "")) for header, i in self.extra]
+
+        for i, value in placed:
+            if i is not None and i < width:
+                row[i] = value
+        return row